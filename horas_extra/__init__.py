@@ -0,0 +1,58 @@
+"""
+Cálculo de horas extra a partir de las marcaciones de entrada y salida del personal.
+
+Uso como librería (sin Streamlit):
+
+    from horas_extra import procesar_marcaciones
+    df_reporte = procesar_marcaciones("marcaciones.xlsx")
+
+Uso por lotes: python -m horas_extra --help (con --almacen, solo recalcula las jornadas que cambiaron)
+Histórico en Parquet por mes: python -m horas_extra.historico --help (--ventana-dias: por ventanas de fechas)
+Reglas desde un archivo JSON/YAML versionado: variable de entorno HORAS_EXTRA_REGLAS (ver horas_extra.reglas);
+recargar_reglas_si_cambiaron() aplica los cambios del archivo sin reiniciar el proceso
+"""
+from .cache import CacheLRU, calcular_hash_archivo
+from .calculo import aplicar_filtro_primer_ultimo_dia, calcular_turnos
+from .explorador import IndiceResultados, construir_indice_resultados
+from .exportacion import exportar_reporte
+from .historico import archivar_marcaciones, calcular_reporte_historico
+from .incremental import AlmacenResultados, calcular_reporte_incremental
+from .instrumentacion import Rendimiento
+from .lectura import ErrorColumnasRequeridas
+from .preprocesamiento import preprocesar_marcaciones
+from .proceso import Configuracion, procesar_marcaciones
+from .reglas import calcular_hash_reglas, recargar_reglas_si_cambiaron
+from .reporte import COLUMNAS_REPORTE, calcular_reporte, construir_reporte_excel, formatear_reporte
+from .resumenes import calcular_resumenes
+from .trabajos import GestorTrabajos, TrabajoCancelado
+from .ventanas import calcular_reporte_por_ventanas, iterar_reporte_por_ventanas
+
+__all__ = [
+    'AlmacenResultados',
+    'COLUMNAS_REPORTE',
+    'CacheLRU',
+    'Configuracion',
+    'ErrorColumnasRequeridas',
+    'GestorTrabajos',
+    'IndiceResultados',
+    'Rendimiento',
+    'TrabajoCancelado',
+    'aplicar_filtro_primer_ultimo_dia',
+    'archivar_marcaciones',
+    'calcular_hash_archivo',
+    'calcular_hash_reglas',
+    'calcular_reporte',
+    'calcular_reporte_incremental',
+    'calcular_reporte_historico',
+    'calcular_reporte_por_ventanas',
+    'calcular_resumenes',
+    'calcular_turnos',
+    'construir_indice_resultados',
+    'construir_reporte_excel',
+    'exportar_reporte',
+    'formatear_reporte',
+    'iterar_reporte_por_ventanas',
+    'preprocesar_marcaciones',
+    'procesar_marcaciones',
+    'recargar_reglas_si_cambiaron',
+]
@@ -0,0 +1,248 @@
+"""
+Benchmark por etapas con marcaciones sintéticas:
+
+    python -m horas_extra.benchmark --tamanos 1000 10000 100000 -o resultados.jsonl
+
+Mide tiempo (mejor de N repeticiones) y memoria pico (tracemalloc, en una corrida aparte)
+de cada etapa de preprocesar_marcaciones, calcular_reporte y las exportaciones. Emite una línea
+JSON por etapa y tamaño, con la versión del código y de las librerías, para comparar resultados
+entre versiones.
+"""
+import argparse
+from datetime import datetime, timezone
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from .calculo import aplicar_filtro_primer_ultimo_dia, calcular_turnos
+from .exportacion import FORMATOS_EXPORTACION, exportar_reporte
+from .lectura import COLUMNAS_CATEGORICAS, cargar_varios_archivos, compactar_texto, preparar_bloque_marcaciones
+from .preprocesamiento import (
+    agregar_fecha_clave,
+    agregar_fecha_hora,
+    descartar_duplicados_entre_archivos,
+    descartar_marcaciones_repetidas,
+    filtrar_marcaciones_validas,
+)
+from .reglas import (
+    LUGARES_PORTERIA_NORMALIZADOS,
+    LUGARES_PUESTO_TRABAJO_NORMALIZADOS,
+    MOTOR_CALCULO,
+    TOLERANCIA_LLEGADA_TARDE_MINUTOS,
+)
+from .reporte import completar_reporte, construir_reporte_excel
+from .sintetico import MAX_FILAS_EXCEL, escribir_libro_marcaciones, generar_marcaciones
+
+TAMANOS_POR_DEFECTO = [1000, 10000, 100000]
+SOLAPAMIENTO_ARCHIVOS = 0.1 # Fracción de las marcaciones que viene en los dos archivos de entrada
+
+
+def version_codigo() -> str:
+    """Commit actual del repositorio, si se ejecuta desde un checkout de git."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def medir(etapa, preparar, repeticiones: int, memoria: bool) -> tuple:
+    """
+    Ejecuta `etapa(preparar())` `repeticiones` veces y retorna el mejor tiempo, el resultado
+    y (si `memoria`) el pico de memoria de una corrida adicional bajo tracemalloc.
+    `preparar` entrega una entrada nueva en cada corrida (las etapas modifican su entrada).
+    """
+    mejor = float('inf')
+    for _ in range(repeticiones):
+        entrada = preparar()
+        inicio = time.perf_counter()
+        resultado = etapa(entrada)
+        mejor = min(mejor, time.perf_counter() - inicio)
+
+    medicion = {'segundos': round(mejor, 6), 'memoria_pico_mb': None}
+    if memoria:
+        entrada = preparar()
+        tracemalloc.start()
+        try:
+            etapa(entrada)
+            medicion['memoria_pico_mb'] = round(tracemalloc.get_traced_memory()[1] / 1024**2, 3)
+        finally:
+            tracemalloc.stop()
+    return medicion, resultado
+
+
+def dividir_en_archivos(df: pd.DataFrame, solapamiento: float = SOLAPAMIENTO_ARCHIVOS) -> list:
+    """
+    Parte las marcaciones en dos archivos consecutivos que comparten `solapamiento` de las filas,
+    como dos exportaciones acumuladas que se suben juntas (las compartidas son duplicados entre archivos).
+    """
+    mitad, margen = len(df) // 2, int(len(df) * solapamiento / 2)
+    return [df.iloc[:mitad + margen], df.iloc[mitad - margen:]]
+
+
+def cargar_partes(partes: list) -> pd.DataFrame:
+    """Como cargar_varios_archivos, pero desde los DataFrames generados (mismo filtrado por bloque, sin openpyxl)."""
+    df_raw = pd.concat(
+        [preparar_bloque_marcaciones(parte.rename(columns=str.lower)).assign(archivo=np.int32(posicion))
+         for posicion, parte in enumerate(partes)],
+        ignore_index=True,
+    )
+    for columna in COLUMNAS_CATEGORICAS:
+        df_raw[columna] = compactar_texto(df_raw[columna])
+    return df_raw
+
+
+def exportador(formato: str):
+    """Etapa que exporta el reporte con exportar_reporte (a un archivo temporal) y entrega los bytes escritos."""
+    def exportar(df_resultado_filtrado):
+        with exportar_reporte(df_resultado_filtrado, formato) as archivo:
+            return archivo.seek(0, os.SEEK_END)
+    return exportar
+
+
+def ejecutar_benchmark(tamano: int, semilla: int = 0, repeticiones: int = 1, memoria: bool = True,
+                       excel: bool = True, motor: str = MOTOR_CALCULO):
+    """
+    Genera `tamano` marcaciones, las reparte en dos archivos que se solapan (dividir_en_archivos)
+    y mide cada etapa del proceso sobre la salida de la anterior, como preprocesar_marcaciones y
+    calcular_reporte: lectura, conversion_hora, duplicados, repetidas, fecha_clave, calculo_turnos
+    y filtro_dias. Luego mide cada exportación del mismo reporte: exportacion_excel (construir_reporte_excel),
+    exportacion_csv, exportacion_parquet y exportacion_zip; sin `excel`, solo CSV y Parquet.
+    La lectura parte de libros .xlsx si caben en una hoja y `excel` es True; si no, de los
+    DataFrames generados (cargar_partes). Entrega un dict por etapa; en las exportaciones,
+    'bytes_salida' es el tamaño del archivo.
+    """
+    partes = dividir_en_archivos(generar_marcaciones(tamano, semilla))
+    filas_leidas = sum(len(parte) for parte in partes)
+
+    if excel and filas_leidas <= MAX_FILAS_EXCEL:
+        origen = 'xlsx'
+        libros = [escribir_libro_marcaciones(parte) for parte in partes]
+        etapa_lectura = lambda contenidos: cargar_varios_archivos([io.BytesIO(contenido) for contenido in contenidos], procesos=1)
+        preparar_lectura = lambda: libros
+    else:
+        origen = 'dataframe'
+        etapa_lectura = cargar_partes
+        preparar_lectura = lambda: partes
+
+    def convertir_hora(df_raw):
+        agregar_fecha_hora(df_raw)
+        return df_raw
+
+    def descartar_duplicados(df_raw):
+        descartar_duplicados_entre_archivos(df_raw)
+        return df_raw
+
+    def descartar_repetidas(df_raw):
+        descartar_marcaciones_repetidas(df_raw)
+        return df_raw
+
+    def asignar_clave(df_raw):
+        agregar_fecha_clave(df_raw)
+        return filtrar_marcaciones_validas(df_raw)
+
+    etapas = [
+        ('lectura', etapa_lectura, preparar_lectura),
+        ('conversion_hora', convertir_hora, None),
+        ('duplicados', descartar_duplicados, None),
+        ('repetidas', descartar_repetidas, None),
+        ('fecha_clave', asignar_clave, None),
+        ('calculo_turnos', lambda d: calcular_turnos(
+            d, LUGARES_PUESTO_TRABAJO_NORMALIZADOS, LUGARES_PORTERIA_NORMALIZADOS, TOLERANCIA_LLEGADA_TARDE_MINUTOS, motor
+        ), None),
+        ('filtro_dias', aplicar_filtro_primer_ultimo_dia, None),
+    ]
+
+    resultados = []
+    anterior = None
+    for nombre, etapa, preparar in etapas:
+        if preparar is None:
+            preparar = lambda anterior=anterior: anterior.copy()
+        medicion, salida = medir(etapa, preparar, repeticiones, memoria)
+        resultados.append({
+            'etapa': nombre,
+            'tamano': tamano,
+            'filas_entrada': filas_leidas if anterior is None else len(anterior),
+            'filas_salida': len(salida),
+            'origen_lectura': origen,
+            **medicion,
+        })
+        anterior = salida
+
+    # Las exportaciones no se encadenan: todas parten del mismo reporte
+    exportaciones = [('exportacion_excel', construir_reporte_excel)] if excel else []
+    exportaciones += [
+        (f'exportacion_{formato}', exportador(formato)) for formato in FORMATOS_EXPORTACION if excel or formato != 'zip'
+    ]
+    reporte = completar_reporte(anterior.copy())
+    for nombre, etapa in exportaciones:
+        medicion, salida = medir(etapa, lambda: reporte.copy(), repeticiones, memoria)
+        resultados.append({
+            'etapa': nombre,
+            'tamano': tamano,
+            'filas_entrada': len(reporte),
+            'filas_salida': len(reporte),
+            'bytes_salida': salida if isinstance(salida, int) else len(salida),
+            'origen_lectura': origen,
+            **medicion,
+        })
+    return resultados
+
+
+def metadatos(args) -> dict:
+    return {
+        'benchmark': 'horas_extra',
+        'fecha': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': version_codigo(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'motor': args.motor,
+        'semilla': args.semilla,
+        'repeticiones': args.repeticiones,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m horas_extra.benchmark", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tamanos", type=int, nargs="+", default=TAMANOS_POR_DEFECTO, help="Cantidades de marcaciones a generar")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--repeticiones", type=int, default=1, help="Se reporta el mejor tiempo")
+    parser.add_argument("--motor", choices=["vectorizado", "iterativo"], default=MOTOR_CALCULO)
+    parser.add_argument("--sin-memoria", action="store_true", help="No medir memoria pico (más rápido)")
+    parser.add_argument("--sin-excel", action="store_true", help="Leer desde DataFrames y omitir las exportaciones a Excel (libro y ZIP)")
+    parser.add_argument("-o", "--salida", help="Archivo JSON Lines donde agregar los resultados (por defecto, salida estándar)")
+    args = parser.parse_args(argv)
+
+    base = metadatos(args)
+    salida = open(args.salida, "a", encoding="utf-8") if args.salida else sys.stdout
+    try:
+        for tamano in args.tamanos:
+            for resultado in ejecutar_benchmark(
+                tamano, args.semilla, args.repeticiones, not args.sin_memoria, not args.sin_excel, args.motor
+            ):
+                salida.write(json.dumps({**base, **resultado}, ensure_ascii=False) + "\n")
+                salida.flush()
+                print(
+                    f"{tamano:>10} {resultado['etapa']:<20} {resultado['segundos']:>10.3f} s"
+                    + (f" {resultado['memoria_pico_mb']:>10.1f} MB" if resultado['memoria_pico_mb'] is not None else ""),
+                    file=sys.stderr,
+                )
+    finally:
+        if args.salida:
+            salida.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
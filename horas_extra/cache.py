@@ -0,0 +1,95 @@
+"""
+Huellas de archivos y caché LRU en memoria para los resultados de cada etapa.
+"""
+from collections import OrderedDict
+import hashlib
+import sys
+import threading
+
+import pandas as pd
+
+# --- Caché de resultados ---
+
+LIMITE_MEMORIA_CACHE_MB = 512 # Memoria máxima compartida por todos los reportes en caché
+
+
+def calcular_hash_archivo(archivo) -> str:
+    """
+    Huella SHA-256 del contenido del archivo subido (acepta bytes o un objeto tipo archivo).
+    """
+    if isinstance(archivo, (bytes, bytearray)):
+        contenido = archivo
+    elif hasattr(archivo, 'getvalue'):
+        contenido = archivo.getvalue()
+    else:
+        posicion = archivo.tell()
+        contenido = archivo.read()
+        archivo.seek(posicion)
+    return hashlib.sha256(contenido).hexdigest()
+
+
+def estimar_tamano_bytes(valor) -> int:
+    """
+    Memoria aproximada de un valor guardado en caché (DataFrames, bytes y tuplas/dicts de ellos).
+    """
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(index=True, deep=True).sum())
+    if isinstance(valor, (bytes, bytearray)):
+        return len(valor)
+    if isinstance(valor, (tuple, list)):
+        return sum(estimar_tamano_bytes(elemento) for elemento in valor)
+    if isinstance(valor, dict):
+        return sum(estimar_tamano_bytes(elemento) for elemento in valor.values())
+    return sys.getsizeof(valor)
+
+
+class CacheLRU:
+    """
+    Caché en memoria con desalojo LRU acotado por bytes (según estimar_tamano_bytes).
+    Es segura entre hilos para compartirse entre las sesiones de Streamlit.
+    Los valores se comparten: quien los obtiene no debe modificarlos.
+    """
+
+    def __init__(self, limite_bytes: int):
+        self.limite_bytes = limite_bytes
+        self.bytes_usados = 0
+        self._entradas = OrderedDict() # clave -> (valor, tamaño)
+        self._lock = threading.Lock()
+
+    def obtener(self, clave, por_defecto=None):
+        with self._lock:
+            if clave not in self._entradas:
+                return por_defecto
+            self._entradas.move_to_end(clave)
+            return self._entradas[clave][0]
+
+    def guardar(self, clave, valor):
+        tamano = estimar_tamano_bytes(valor)
+        with self._lock:
+            if clave in self._entradas:
+                self.bytes_usados -= self._entradas.pop(clave)[1]
+            if tamano > self.limite_bytes:
+                return # No cabe: se entrega sin guardar
+            self._entradas[clave] = (valor, tamano)
+            self.bytes_usados += tamano
+            while self.bytes_usados > self.limite_bytes:
+                _, (_, tamano_desalojado) = self._entradas.popitem(last=False)
+                self.bytes_usados -= tamano_desalojado
+
+    def obtener_o_calcular(self, clave, calcular):
+        """
+        Retorna el valor en caché para `clave` o lo calcula con `calcular()` y lo guarda.
+        """
+        centinela = object()
+        valor = self.obtener(clave, centinela)
+        if valor is centinela:
+            valor = calcular()
+            self.guardar(clave, valor)
+        return valor
+
+    def __contains__(self, clave):
+        with self._lock:
+            return clave in self._entradas
+
+    def __len__(self):
+        return len(self._entradas)
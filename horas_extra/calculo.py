@@ -0,0 +1,599 @@
+"""
+Cálculo de jornadas y horas extra por trabajador y día de turno, y filtro de días extremos.
+"""
+from datetime import timedelta
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from .reglas import (
+    MAX_EXCESO_SALIDA_HRS,
+    MIN_DURACION_ACEPTABLE_REAL_SALIDA_HRS,
+    MOTOR_CALCULO,
+    UMBRAL_PAGO_ENTRADA_TEMPRANA_MINUTOS,
+)
+from .turnos import (
+    NS_POR_DIA,
+    NS_POR_HORA,
+    NS_POR_MINUTO,
+    TABLA_TURNOS,
+    asignar_turnos_calendario,
+    compilar_calendario_turnos,
+    obtener_turno_para_registro,
+    patrones_de_trabajadores,
+)
+
+# --- Columnas del resultado de calcular_turnos ---
+
+# Tipos nativos de cada columna, iguales en ambos motores. Fechas y horas quedan como datetime64
+# (NaT = sin dato); se convierten a texto solo al mostrar o exportar (reporte.formatear_reporte).
+TIPOS_RESULTADO = {
+    'NOMBRE': object,
+    'ID_TRABAJADOR': np.int64,
+    'FECHA': 'datetime64[ns]', # Medianoche del día del reporte
+    'Dia_Semana': object,
+    'TURNO': object,
+    'Tipo_Marcacion_Priorizada': object,
+    'Inicio_Turno_Programado': 'datetime64[ns]',
+    'Fin_Turno_Programado': 'datetime64[ns]',
+    'Duracion_Turno_Programado_Hrs': np.int64,
+    'ENTRADA_REAL': 'datetime64[ns]',
+    'PORTERIA_ENTRADA': object,
+    'SALIDA_REAL': 'datetime64[ns]',
+    'PORTERIA_SALIDA': object,
+    'Horas_Trabajadas_Netas': np.float32,
+    'Horas_Extra': np.float32,
+    'Horas': np.int64,
+    'Minutos': np.int64,
+    'Llegada_Tarde_Mas_40_Min': bool,
+    'Es_Nocturno': bool,
+    'Estado_Calculo': object,
+    'FECHA_CLAVE_TURNO': 'datetime64[ns]', # Grupo de origen (lo usa el modo incremental)
+}
+DECIMALES_HORAS = 2 # Las horas se redondean a 2 decimales antes de guardarlas como float32
+NAT_NS = np.iinfo(np.int64).min # NaT visto como int64
+
+
+def horas_exactas(valores) -> np.ndarray:
+    """
+    Horas float32 del resultado como float64 con DECIMALES_HORAS (0.81 y no 0.8100000262):
+    el valor calculado, para comparar con umbrales, sumar o exportar.
+    """
+    return np.round(np.asarray(valores, dtype=np.float64), DECIMALES_HORAS)
+
+
+def construir_resultado(columnas: dict) -> pd.DataFrame:
+    """DataFrame del resultado con las columnas de TIPOS_RESULTADO en su orden y con sus tipos."""
+    return pd.DataFrame({col: np.asarray(columnas[col], dtype=tipo) for col, tipo in TIPOS_RESULTADO.items()})
+
+
+def a_datetime64(valor) -> np.datetime64:
+    """Timestamp, datetime o date como datetime64[ns] (NaT si falta)."""
+    return np.datetime64('NaT', 'ns') if valor is None or pd.isna(valor) else pd.Timestamp(valor).to_datetime64()
+
+
+# --- 4. Calculo de horas (Lógica modificada para incluir Prioridad de Marcación) ---
+
+def calcular_turnos(df: pd.DataFrame, lugares_puesto: list, lugares_porteria: list, tolerancia_llegada_tarde: int, motor: str = None):
+    """
+    Agrupa por ID y FECHA_CLAVE_TURNO.
+    Aplica la prioridad: 1. Puesto de Trabajo > 2. Portería > 3. Primera Entrada Válida.
+
+    El parámetro `motor` ("vectorizado" o "iterativo") permite elegir la implementación;
+    si no se indica se usa MOTOR_CALCULO. Ambos motores producen el mismo resultado.
+    """
+    motor = motor or MOTOR_CALCULO
+    if motor == "iterativo":
+        return calcular_turnos_iterativo(df, lugares_puesto, lugares_porteria, tolerancia_llegada_tarde)
+    if motor == "vectorizado":
+        return calcular_turnos_vectorizado(df, lugares_puesto, lugares_porteria, tolerancia_llegada_tarde)
+    raise ValueError(f"Motor de cálculo desconocido: {motor}")
+
+
+def calcular_turnos_iterativo(df: pd.DataFrame, lugares_puesto: list, lugares_porteria: list, tolerancia_llegada_tarde: int):
+    """
+    Implementación original: recorre cada grupo (ID, FECHA_CLAVE_TURNO) en Python.
+    Cada jornada se escribe en su fila de arreglos tipados preasignados (una fila por grupo).
+    """
+    
+    df_filtrado = df[(df['TIPO_MARCACION'].isin(['ent', 'sal']))].copy()
+    df_filtrado.sort_values(by=['id_trabajador', 'FECHA_HORA'], inplace=True)
+
+    if df_filtrado.empty: return pd.DataFrame()
+
+    grupos = df_filtrado.groupby(['id_trabajador', 'FECHA_CLAVE_TURNO'])
+    resultados = {col: np.empty(grupos.ngroups, dtype=tipo) for col, tipo in TIPOS_RESULTADO.items()}
+    fila = 0
+
+    for (id_trabajador, clave_grupo), grupo in grupos:
+
+        # FECHA_CLAVE_TURNO llega como datetime64; el reporte trabaja con objetos date
+        fecha_clave_turno = pd.Timestamp(clave_grupo).date()
+
+        nombre = grupo['nombre'].iloc[0]
+        entradas = grupo[grupo['TIPO_MARCACION'] == 'ent']
+        salidas = grupo[grupo['TIPO_MARCACION'] == 'sal'] 
+        
+        entrada_real = pd.NaT
+        porteria_entrada = 'N/A'
+        salida_real = pd.NaT
+        porteria_salida = 'N/A'
+        turno_nombre, info_turno, inicio_turno, fin_turno, fecha_clave_final = (None, None, None, None, fecha_clave_turno)
+        horas_trabajadas = 0.0
+        horas_extra = 0.0
+        llegada_tarde_flag = False
+        estado_calculo = "Sin Marcaciones Válidas (E/S)"
+        salida_fue_real = False 
+        es_nocturno_flag = False 
+        
+        # Variables de prioridad de asignación
+        mejor_entrada_para_turno = pd.NaT
+        mejor_turno_data = (None, None, None, None, None)
+        tipo_marcacion_priorizada = 'N/A' # Nuevo campo para el reporte
+
+        # --- A. Lógica de Priorización de Entradas (Puesto > Portería) ---
+        
+        # 1. Filtro de entradas por Puesto de Trabajo (PRIORIDAD 1)
+        entradas_puesto = entradas[
+            entradas['PORTERIA_NORMALIZADA'].isin(lugares_puesto)
+        ].sort_values(by='FECHA_HORA')
+        
+        # 2. Filtro de entradas por Portería (PRIORIDAD 2)
+        entradas_porteria = entradas[
+            entradas['PORTERIA_NORMALIZADA'].isin(lugares_porteria)
+        ].sort_values(by='FECHA_HORA')
+        
+        candidatos_a_evaluar_df = pd.DataFrame()
+
+        if not entradas_puesto.empty:
+            # PRIORIDAD MÁXIMA: Puestos de Trabajo
+            candidatos_a_evaluar_df = entradas_puesto
+            tipo_marcacion_priorizada = "Puesto de Trabajo"
+        elif not entradas_porteria.empty:
+            # SEGUNDA PRIORIDAD: Porterías
+            candidatos_a_evaluar_df = entradas_porteria
+            tipo_marcacion_priorizada = "Portería"
+        else:
+            estado_calculo = "Turno No Asignado (No hay entradas válidas en Puesto/Portería)"
+            pass 
+
+        # --- B. Lógica de Selección: Primera Entrada Válida ---
+        
+        if not candidatos_a_evaluar_df.empty:
+            candidatos_a_evaluar_df = candidatos_a_evaluar_df.sort_values(by='FECHA_HORA')
+            
+            for entrada_row in candidatos_a_evaluar_df.itertuples():
+                current_entry_time = entrada_row.FECHA_HORA
+                
+                # Buscamos el turno al que esta entrada se puede asignar
+                turno_data = obtener_turno_para_registro(current_entry_time, fecha_clave_turno, id_trabajador)
+                
+                if turno_data[0] is not None:
+                    # Encontramos la PRIMERA entrada válida que asigna a un turno.
+                    mejor_entrada_para_turno = current_entry_time
+                    mejor_turno_data = turno_data
+                    # Se rompe el bucle para usar la primera entrada encontrada
+                    break 
+
+        # --- C. Asignación y Cálculo Final ---
+        if pd.notna(mejor_entrada_para_turno):
+            entrada_real = mejor_entrada_para_turno
+            turno_nombre, info_turno, inicio_turno, fin_turno, fecha_clave_final = mejor_turno_data
+            es_nocturno_flag = info_turno.get("nocturno", False)
+            
+            # Asegurar que se encuentra el lugar de marcación correcto para el reporte
+            porteria_entrada = grupo[grupo['FECHA_HORA'] == entrada_real]['porteria'].iloc[0]
+            
+            # --- Inferencia de Salida ---
+            # Se busca la última salida válida dentro del margen, INDEPENDIENTEMENTE del lugar,
+            # ya que la entrada real ya fue priorizada y seleccionada.
+            max_salida_aceptable = fin_turno + timedelta(hours=MAX_EXCESO_SALIDA_HRS)
+            
+            valid_salidas = salidas[
+                (salidas['FECHA_HORA'] > entrada_real) &
+                (salidas['FECHA_HORA'] <= max_salida_aceptable)
+            ]
+            
+            if valid_salidas.empty:
+                salida_real = fin_turno
+                porteria_salida = 'ASUMIDA (Falta Salida/Salida Inválida)'
+                estado_calculo = "ASUMIDO (Falta Salida/Salida Inválida)"
+                salida_fue_real = False
+            else:
+                salida_real = valid_salidas['FECHA_HORA'].max()
+                porteria_salida = valid_salidas[valid_salidas['FECHA_HORA'] == salida_real]['porteria'].iloc[0]
+                estado_calculo = "Calculado"
+                salida_fue_real = True
+                
+            # --- Para Micro-jornadas ---
+            if salida_fue_real:
+                duracion_check = salida_real - entrada_real
+                if duracion_check < timedelta(hours=MIN_DURACION_ACEPTABLE_REAL_SALIDA_HRS):
+                    salida_real = fin_turno
+                    porteria_salida = 'ASUMIDA (Micro-jornada detectada)'
+                    estado_calculo = "ASUMIDO (Micro-jornada detectada)"
+                    salida_fue_real = False
+
+            # --- Reglas de Cálculo de Horas ---
+            inicio_efectivo_calculo = inicio_turno
+            llegada_tarde_flag = False
+            
+            # 1. Regla para LLEGADA TARDE
+            if entrada_real > inicio_turno + timedelta(minutes=tolerancia_llegada_tarde):
+                inicio_efectivo_calculo = entrada_real
+                llegada_tarde_flag = True
+                
+            # 2. Regla para ENTRADA TEMPRANA
+            elif entrada_real < inicio_turno:
+                early_timedelta = inicio_turno - entrada_real
+                
+                if early_timedelta > timedelta(minutes=UMBRAL_PAGO_ENTRADA_TEMPRANA_MINUTOS):
+                    inicio_efectivo_calculo = entrada_real
+                else:
+                    inicio_efectivo_calculo = inicio_turno
+            
+            duracion_efectiva_calculo = salida_real - inicio_efectivo_calculo
+
+            if duracion_efectiva_calculo < timedelta(seconds=0):
+                horas_trabajadas = 0.0
+                horas_extra = 0.0
+                estado_calculo = "Error: Duración efectiva negativa"
+            else:
+                horas_trabajadas = round(duracion_efectiva_calculo.total_seconds() / 3600, 2)
+                
+                horas_turno = info_turno["duracion_hrs"]
+                horas_extra = max(0, round(horas_trabajadas - horas_turno, 2))
+
+        
+        if pd.isna(entrada_real) and not grupo[grupo['TIPO_MARCACION'] == 'sal'].empty:
+            continue
+            
+        # --- Añade los resultados a su fila (Se reporta todo) ---
+        report_date = fecha_clave_final if fecha_clave_final else fecha_clave_turno
+        horas_turno_val = info_turno["duracion_hrs"] if info_turno else 0
+
+        for col, valor in (
+            ('NOMBRE', nombre),
+            ('ID_TRABAJADOR', id_trabajador),
+            ('FECHA', a_datetime64(report_date)),
+            ('Dia_Semana', report_date.strftime('%A')),
+            ('TURNO', turno_nombre if turno_nombre else 'N/A'),
+            ('Tipo_Marcacion_Priorizada', tipo_marcacion_priorizada), # Nuevo campo de reporte
+            ('Inicio_Turno_Programado', a_datetime64(inicio_turno)),
+            ('Fin_Turno_Programado', a_datetime64(fin_turno)),
+            ('Duracion_Turno_Programado_Hrs', horas_turno_val),
+            ('ENTRADA_REAL', a_datetime64(entrada_real)),
+            ('PORTERIA_ENTRADA', porteria_entrada),
+            ('SALIDA_REAL', a_datetime64(salida_real)),
+            ('PORTERIA_SALIDA', porteria_salida),
+            ('Horas_Trabajadas_Netas', horas_trabajadas),
+            ('Horas_Extra', horas_extra),
+            ('Horas', int(horas_extra)),
+            ('Minutos', round((horas_extra - int(horas_extra)) * 60)),
+            ('Llegada_Tarde_Mas_40_Min', llegada_tarde_flag),
+            ('Es_Nocturno', es_nocturno_flag),
+            ('Estado_Calculo', estado_calculo), # Agregar este campo para el reporte
+            ('FECHA_CLAVE_TURNO', a_datetime64(clave_grupo)),
+        ):
+            resultados[col][fila] = valor
+        fila += 1
+
+    if fila == 0: return pd.DataFrame()
+    return construir_resultado({col: valores[:fila] for col, valores in resultados.items()})
+
+# --- 4.1 Motor vectorizado ---
+
+def redondear_como_python(valores: np.ndarray, decimales: int = 2) -> np.ndarray:
+    """
+    Redondea igual que round() de Python. np.round escala por 10**decimales y puede
+    resolver distinto los empates (p. ej. 0.005), así que esos casos se delegan a round().
+    """
+    valores = np.asarray(valores, dtype=np.float64)
+    redondeados = np.round(valores, decimales)
+    escalados = valores * 10**decimales
+    empates = np.abs(escalados - np.floor(escalados) - 0.5) < 1e-6
+    if empates.any():
+        redondeados[empates] = [round(valor, decimales) for valor in valores[empates].tolist()]
+    return redondeados
+
+
+def asignar_turnos_candidatos(fechas_hora_ns: np.ndarray, fechas_clave_ns: np.ndarray, patrones: np.ndarray = None):
+    """
+    Asigna el turno programado a un arreglo de entradas candidatas (ns) con su FECHA_CLAVE_TURNO (ns),
+    usando un calendario compilado para el rango de fechas recibido (incluye el día anterior al primero).
+    `patrones`: patrón de horario de cada candidata (ver asignar_turnos_calendario).
+    """
+    if len(fechas_clave_ns) == 0:
+        vacio = np.empty(0, dtype=np.int64)
+        return vacio, vacio, vacio, vacio
+
+    fechas_clave = np.asarray(fechas_clave_ns, dtype=np.int64).view('datetime64[ns]')
+    calendario = compilar_calendario_turnos(fechas_clave.min() - np.timedelta64(1, 'D'), fechas_clave.max())
+    return asignar_turnos_calendario(fechas_hora_ns, fechas_clave_ns, calendario, patrones)
+
+
+# Clase del punto de marcación (bits, por si un punto figurara en ambas listas)
+CLASE_OTRO = 0
+CLASE_PORTERIA = 1
+CLASE_PUESTO = 2
+
+
+@lru_cache(maxsize=8)
+def compilar_clases_punto(lugares_puesto: tuple, lugares_porteria: tuple) -> dict:
+    """{punto normalizado: clase (CLASE_PUESTO | CLASE_PORTERIA)}; se compila una vez por lista de puntos."""
+    clases = dict.fromkeys(lugares_porteria, CLASE_PORTERIA)
+    for punto in lugares_puesto:
+        clases[punto] = clases.get(punto, CLASE_OTRO) | CLASE_PUESTO
+    return clases
+
+
+def clasificar_puntos(porterias_normalizadas: pd.Series, lugares_puesto: list, lugares_porteria: list) -> np.ndarray:
+    """
+    Código int8 de clase (CLASE_PUESTO | CLASE_PORTERIA) por fila. Se busca cada punto distinto
+    una sola vez en el mapa compilado y el resultado se reparte a las filas por su código.
+    """
+    codigos, puntos = pd.factorize(porterias_normalizadas)
+    clases = compilar_clases_punto(tuple(lugares_puesto), tuple(lugares_porteria))
+    clase_por_punto = np.array(
+        [clases.get(punto, CLASE_OTRO) for punto in puntos] + [CLASE_OTRO], # posición -1: nulos
+        dtype=np.int8,
+    )
+    return clase_por_punto[codigos]
+
+
+def calcular_turnos_vectorizado(df: pd.DataFrame, lugares_puesto: list, lugares_porteria: list, tolerancia_llegada_tarde: int):
+    """
+    Misma lógica que calcular_turnos_iterativo, pero calculada sobre columnas completas:
+    cada regla (prioridad, inferencia de salida, micro-jornada, llegada tarde/temprana)
+    se evalúa como una operación sobre arreglos NumPy en lugar de un bucle por grupo.
+    """
+    df_filtrado = df[df['TIPO_MARCACION'].isin(['ent', 'sal'])]
+    if df_filtrado.empty: return pd.DataFrame()
+
+    # --- A. Orden (trabajador, fecha clave, hora): equivale al sort + groupby del motor iterativo ---
+    codigos_id, ids_unicos = pd.factorize(df_filtrado['id_trabajador'], sort=True)
+    claves_ns = pd.to_datetime(df_filtrado['FECHA_CLAVE_TURNO']).to_numpy(dtype='datetime64[ns]').view(np.int64)
+    tiempos_ns = df_filtrado['FECHA_HORA'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+    # groupby descarta las claves nulas
+    validos = (codigos_id >= 0) & (claves_ns != np.iinfo(np.int64).min)
+    orden = np.flatnonzero(validos)[np.lexsort((tiempos_ns[validos], claves_ns[validos], codigos_id[validos]))]
+    if len(orden) == 0: return pd.DataFrame()
+
+    id_codigo = codigos_id[orden]
+    clave = claves_ns[orden]
+    tiempo = tiempos_ns[orden]
+    es_ent = df_filtrado['TIPO_MARCACION'].eq('ent').to_numpy()[orden]
+    es_sal = ~es_ent
+    clase_punto = clasificar_puntos(df_filtrado['PORTERIA_NORMALIZADA'], lugares_puesto, lugares_porteria)[orden]
+    es_puesto = (clase_punto & CLASE_PUESTO) != 0
+    es_porteria = (clase_punto & CLASE_PORTERIA) != 0
+    porterias = df_filtrado['porteria'].to_numpy(dtype=object)[orden]
+    nombres = df_filtrado['nombre'].to_numpy(dtype=object)[orden]
+
+    n = len(orden)
+    posiciones = np.arange(n)
+    nuevo_grupo = np.ones(n, dtype=bool)
+    nuevo_grupo[1:] = (id_codigo[1:] != id_codigo[:-1]) | (clave[1:] != clave[:-1])
+    inicio_grupo = np.flatnonzero(nuevo_grupo)
+    grupo = np.cumsum(nuevo_grupo) - 1
+    n_grupos = len(inicio_grupo)
+
+    # Primera fila de cada racha de marcaciones con la misma hora dentro del grupo
+    nuevo_instante = nuevo_grupo.copy()
+    nuevo_instante[1:] |= tiempo[1:] != tiempo[:-1]
+    primera_del_instante = np.maximum.accumulate(np.where(nuevo_instante, posiciones, 0))
+
+    # --- B. Prioridad de entradas: Puesto de Trabajo > Portería ---
+    ent_puesto = es_ent & es_puesto
+    ent_porteria = es_ent & es_porteria
+    tiene_puesto = np.logical_or.reduceat(ent_puesto, inicio_grupo)
+    tiene_porteria = np.logical_or.reduceat(ent_porteria, inicio_grupo)
+    tiene_salidas = np.logical_or.reduceat(es_sal, inicio_grupo)
+    es_candidata = np.where(tiene_puesto[grupo], ent_puesto, ent_porteria)
+
+    # --- C. Primera entrada candidata que se puede asignar a un turno (de su horario, si tiene) ---
+    pos_candidatas = np.flatnonzero(es_candidata)
+    patron_por_codigo = patrones_de_trabajadores(ids_unicos)
+    patrones = patron_por_codigo[id_codigo[pos_candidatas]] if (patron_por_codigo >= 0).any() else None
+    turno_cand, inicio_cand, fin_cand, clave_final_cand = asignar_turnos_candidatos(
+        tiempo[pos_candidatas], clave[pos_candidatas], patrones
+    )
+    asignables = turno_cand >= 0
+    grupos_con_entrada, primera = np.unique(grupo[pos_candidatas[asignables]], return_index=True)
+
+    tiene_entrada = np.zeros(n_grupos, dtype=bool)
+    tiene_entrada[grupos_con_entrada] = True
+    pos_entrada = pos_candidatas[asignables][primera]
+    indice_turno = np.full(n_grupos, -1, dtype=np.int64)
+    indice_turno[grupos_con_entrada] = turno_cand[asignables][primera]
+    inicio_turno = np.zeros(n_grupos, dtype=np.int64)
+    inicio_turno[grupos_con_entrada] = inicio_cand[asignables][primera]
+    fin_turno = np.zeros(n_grupos, dtype=np.int64)
+    fin_turno[grupos_con_entrada] = fin_cand[asignables][primera]
+    fecha_reporte = clave[inicio_grupo].copy()
+    fecha_reporte[grupos_con_entrada] = clave_final_cand[asignables][primera]
+    entrada = np.zeros(n_grupos, dtype=np.int64)
+    entrada[grupos_con_entrada] = tiempo[pos_entrada]
+
+    porteria_entrada = np.full(n_grupos, 'N/A', dtype=object)
+    porteria_entrada[grupos_con_entrada] = porterias[primera_del_instante[pos_entrada]]
+
+    nombres_turno = np.array([turno[1] for turno in TABLA_TURNOS], dtype=object)
+    duraciones_turno = np.array([turno[2]["duracion_hrs"] for turno in TABLA_TURNOS])
+    nocturnos_turno = np.array([turno[5] for turno in TABLA_TURNOS], dtype=bool)
+    duracion_turno = np.where(tiene_entrada, duraciones_turno[indice_turno], 0)
+    es_nocturno = tiene_entrada & nocturnos_turno[indice_turno]
+
+    # --- D. Inferencia de salida: última salida dentro de fin_turno + MAX_EXCESO_SALIDA_HRS ---
+    max_salida_aceptable = fin_turno + MAX_EXCESO_SALIDA_HRS * NS_POR_HORA
+    salida_valida = (
+        es_sal & tiene_entrada[grupo]
+        & (tiempo > entrada[grupo])
+        & (tiempo <= max_salida_aceptable[grupo])
+    )
+    pos_salidas = np.flatnonzero(salida_valida)
+    grupo_salida = grupo[pos_salidas]
+    tiempo_salida = tiempo[pos_salidas]
+    # Las filas están ordenadas por hora: la última salida válida del grupo es la máxima
+    es_ultima = np.ones(len(pos_salidas), dtype=bool)
+    es_ultima[:-1] = grupo_salida[1:] != grupo_salida[:-1]
+    # Como en el original, la portería es la de la primera salida con esa misma hora
+    nueva_hora_salida = np.ones(len(pos_salidas), dtype=bool)
+    nueva_hora_salida[1:] = (grupo_salida[1:] != grupo_salida[:-1]) | (tiempo_salida[1:] != tiempo_salida[:-1])
+    primera_misma_hora = np.maximum.accumulate(np.where(nueva_hora_salida, np.arange(len(pos_salidas)), 0))
+
+    grupos_con_salida = grupo_salida[es_ultima]
+    tiene_salida = np.zeros(n_grupos, dtype=bool)
+    tiene_salida[grupos_con_salida] = True
+    salida = fin_turno.copy()
+    salida[grupos_con_salida] = tiempo_salida[es_ultima]
+
+    porteria_salida = np.where(tiene_entrada, 'ASUMIDA (Falta Salida/Salida Inválida)', 'N/A').astype(object)
+    porteria_salida[grupos_con_salida] = porterias[pos_salidas[primera_misma_hora[es_ultima]]]
+
+    estado_calculo = np.where(
+        tiene_puesto | tiene_porteria,
+        "Sin Marcaciones Válidas (E/S)",
+        "Turno No Asignado (No hay entradas válidas en Puesto/Portería)",
+    ).astype(object)
+    estado_calculo[tiene_entrada] = "ASUMIDO (Falta Salida/Salida Inválida)"
+    estado_calculo[tiene_salida] = "Calculado"
+
+    # --- Para Micro-jornadas ---
+    micro_jornada = tiene_salida & (salida - entrada < MIN_DURACION_ACEPTABLE_REAL_SALIDA_HRS * NS_POR_HORA)
+    salida[micro_jornada] = fin_turno[micro_jornada]
+    porteria_salida[micro_jornada] = 'ASUMIDA (Micro-jornada detectada)'
+    estado_calculo[micro_jornada] = "ASUMIDO (Micro-jornada detectada)"
+
+    # --- E. Reglas de Cálculo de Horas (llegada tarde / entrada temprana) ---
+    llegada_tarde = tiene_entrada & (entrada > inicio_turno + tolerancia_llegada_tarde * NS_POR_MINUTO)
+    entrada_temprana_pagada = (
+        tiene_entrada & ~llegada_tarde
+        & (entrada < inicio_turno)
+        & (inicio_turno - entrada > UMBRAL_PAGO_ENTRADA_TEMPRANA_MINUTOS * NS_POR_MINUTO)
+    )
+    inicio_efectivo = np.where(llegada_tarde | entrada_temprana_pagada, entrada, inicio_turno)
+    duracion_efectiva = salida - inicio_efectivo
+
+    duracion_negativa = tiene_entrada & (duracion_efectiva < 0)
+    estado_calculo[duracion_negativa] = "Error: Duración efectiva negativa"
+    con_horas = tiene_entrada & ~duracion_negativa
+
+    horas_trabajadas = np.zeros(n_grupos, dtype=np.float64)
+    horas_trabajadas[con_horas] = redondear_como_python(duracion_efectiva[con_horas] / 1e9 / 3600)
+    horas_extra = np.zeros(n_grupos, dtype=np.float64)
+    horas_extra[con_horas] = redondear_como_python(horas_trabajadas[con_horas] - duracion_turno[con_horas])
+    horas_extra = np.where(horas_extra > 0, horas_extra, 0.0)
+    horas_enteras = np.trunc(horas_extra)
+
+    # Grupos sin entrada asignada pero con salidas no se reportan
+    reportar = tiene_entrada | ~tiene_salidas
+    if not reportar.any(): return pd.DataFrame()
+
+    # --- F. Construcción del resultado (tipos de TIPOS_RESULTADO, sin convertir a texto) ---
+    def fechas_hora(valores_ns):
+        return np.where(tiene_entrada, valores_ns, NAT_NS)[reportar].view('datetime64[ns]')
+
+    ids_reporte = ids_unicos[id_codigo[inicio_grupo][reportar]]
+    dias_reporte = fecha_reporte[reportar]
+    dias_reporte = (dias_reporte - dias_reporte % NS_POR_DIA).view('datetime64[ns]')
+
+    return construir_resultado({
+        'NOMBRE': nombres[inicio_grupo][reportar],
+        'ID_TRABAJADOR': ids_reporte,
+        'FECHA': dias_reporte,
+        'Dia_Semana': pd.DatetimeIndex(dias_reporte).strftime('%A').to_numpy(dtype=object),
+        'TURNO': np.where(tiene_entrada, nombres_turno[indice_turno], 'N/A')[reportar],
+        'Tipo_Marcacion_Priorizada': np.where(
+            tiene_puesto, "Puesto de Trabajo", np.where(tiene_porteria, "Portería", 'N/A')
+        ).astype(object)[reportar],
+        'Inicio_Turno_Programado': fechas_hora(inicio_turno),
+        'Fin_Turno_Programado': fechas_hora(fin_turno),
+        'Duracion_Turno_Programado_Hrs': duracion_turno[reportar],
+        'ENTRADA_REAL': fechas_hora(entrada),
+        'PORTERIA_ENTRADA': porteria_entrada[reportar],
+        'SALIDA_REAL': fechas_hora(salida),
+        'PORTERIA_SALIDA': porteria_salida[reportar],
+        'Horas_Trabajadas_Netas': horas_trabajadas[reportar],
+        'Horas_Extra': horas_extra[reportar],
+        'Horas': horas_enteras[reportar].astype(np.int64),
+        'Minutos': np.rint((horas_extra - horas_enteras) * 60)[reportar].astype(np.int64),
+        'Llegada_Tarde_Mas_40_Min': llegada_tarde[reportar],
+        'Es_Nocturno': es_nocturno[reportar],
+        'Estado_Calculo': estado_calculo[reportar],
+        'FECHA_CLAVE_TURNO': clave[inicio_grupo][reportar].view('datetime64[ns]'),
+    })
+
+# -----------------------------------------------------------------------------
+# --- 5. Nueva Función de Filtrado Post-Cálculo (Filtro de Días Extremos) ---
+
+# Ventanas de marcación de un turno nocturno, en ns desde la medianoche de FECHA
+VENTANA_ENTRADA_PRIMER_DIA_NS = (21 * NS_POR_HORA, 24 * NS_POR_HORA - 10**9) # 21:00:00 - 23:59:59
+VENTANA_SALIDA_ULTIMO_DIA_NS = (5 * NS_POR_HORA, 7 * NS_POR_HORA) # 05:00:00 - 07:00:00
+
+
+def aplicar_filtro_primer_ultimo_dia(df_resultado, dias_extremos: pd.DataFrame = None):
+    """
+    Aplica el filtro para conservar el primer y último día solo si cumplen
+    con la condición horaria de marcación de un turno nocturno (entrada ~22:40, salida ~5:40).
+    Los días intermedios siempre se conservan.
+
+    - Primer día: se conserva si alguna jornada nocturna de ese día entra entre 21:00 y 23:59:59.
+    - Último día (distinto del primero): se conserva si alguna jornada nocturna sale entre 05:00 y 07:00.
+    Se evalúa de una vez para todos los trabajadores; las filas quedan ordenadas por
+    ID_TRABAJADOR y FECHA (estable).
+
+    Por defecto el primer y último día de cada trabajador son los de df_resultado. El cálculo
+    por ventanas entrega `dias_extremos`: DataFrame indexado por ID_TRABAJADOR con los días
+    'primero' y 'ultimo' (datetime64) de todo el reporte; NaT en 'ultimo' si aún no se conoce.
+    """
+    if df_resultado.empty:
+        return df_resultado
+
+    def a_ns(valores):
+        return valores.to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+    dia = a_ns(df_resultado['FECHA'])
+    dia = dia - dia % NS_POR_DIA
+    entrada = a_ns(df_resultado['ENTRADA_REAL'])
+    salida = a_ns(df_resultado['SALIDA_REAL'])
+    nocturno = df_resultado['Es_Nocturno'].eq(True).to_numpy()
+
+    hora_entrada = entrada - dia
+    hora_salida = salida - dia
+    entrada_valida = nocturno & (entrada != NAT_NS) & (
+        (hora_entrada >= VENTANA_ENTRADA_PRIMER_DIA_NS[0]) & (hora_entrada <= VENTANA_ENTRADA_PRIMER_DIA_NS[1])
+    )
+    salida_valida = nocturno & (salida != NAT_NS) & (
+        (hora_salida >= VENTANA_SALIDA_ULTIMO_DIA_NS[0]) & (hora_salida <= VENTANA_SALIDA_ULTIMO_DIA_NS[1])
+    )
+
+    claves = pd.DataFrame({
+        'ID_TRABAJADOR': df_resultado['ID_TRABAJADOR'].to_numpy(),
+        'DIA': dia,
+        'ENTRADA_VALIDA': entrada_valida,
+        'SALIDA_VALIDA': salida_valida,
+    })
+    if dias_extremos is None:
+        por_trabajador = claves.groupby('ID_TRABAJADOR', sort=False)['DIA']
+        es_primero = (dia == por_trabajador.transform('min').to_numpy())
+        es_ultimo = (dia == por_trabajador.transform('max').to_numpy())
+    else:
+        extremos = dias_extremos.reindex(claves['ID_TRABAJADOR'])
+        es_primero = (dia == a_ns(extremos['primero']))
+        es_ultimo = (dia == a_ns(extremos['ultimo'])) # NaT nunca coincide
+    # Basta una jornada que cumpla para conservar todo el día del trabajador
+    por_dia = claves.groupby(['ID_TRABAJADOR', 'DIA'], sort=False)
+    dia_entrada_valida = por_dia['ENTRADA_VALIDA'].transform('any').to_numpy()
+    dia_salida_valida = por_dia['SALIDA_VALIDA'].transform('any').to_numpy()
+
+    conservar = (
+        (~es_primero & ~es_ultimo)
+        | (es_primero & dia_entrada_valida)
+        | (es_ultimo & ~es_primero & dia_salida_valida)
+    )
+    orden = np.lexsort((dia, claves['ID_TRABAJADOR'].to_numpy()))
+    orden = orden[conservar[orden]]
+    return df_resultado.iloc[orden].drop(columns=['Es_Nocturno', 'FECHA_CLAVE_TURNO'], errors='ignore')
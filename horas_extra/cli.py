@@ -0,0 +1,139 @@
+"""
+Modo por lotes sin interfaz gráfica:
+
+    python -m horas_extra marcaciones.xlsx [otro.csv | otro.parquet | carpeta ...] -o reportes/
+
+Genera un reporte por archivo de entrada en la carpeta de salida; con --unir NOMBRE, un solo
+reporte de todos los archivos (leídos en paralelo, sin las marcaciones repetidas entre ellos),
+por ejemplo las exportaciones por portería o por semana de un mes. El reporte se escribe como
+Excel con formato, CSV o Parquet (con los resaltados como columnas) o un ZIP con un Excel por
+trabajador (--formato). Por la salida de error
+emite una línea JSON por etapa ("evento": "etapa") y un resumen por archivo ("evento": "archivo").
+"""
+import argparse
+import json
+import logging
+from pathlib import Path
+import sys
+
+from .exportacion import FORMATOS_EXPORTACION, exportar_reporte
+from .instrumentacion import Rendimiento
+from .lectura import FORMATOS_MARCACIONES, ErrorColumnasRequeridas, TAMANO_BLOQUE_LECTURA
+from .proceso import Configuracion, procesar_marcaciones
+from .reglas import MOTOR_CALCULO, PROCESOS_CALCULO
+from .reporte import construir_reporte_excel
+
+SUFIJO_REPORTE = "_Reporte_Horas_Extra"
+
+logger = logging.getLogger("horas_extra")
+
+
+def registrar_json(evento: str, **datos):
+    logger.info(json.dumps({'evento': evento, **datos}, ensure_ascii=False, default=str))
+
+
+def expandir_entradas(rutas: list) -> list:
+    """Las carpetas se reemplazan por los .xlsx, .csv y .parquet que contienen (en orden alfabético)."""
+    archivos = []
+    for ruta in map(Path, rutas):
+        if ruta.is_dir():
+            archivos.extend(sorted(
+                p for p in ruta.iterdir()
+                if p.suffix.lower().lstrip(".") in FORMATOS_MARCACIONES and not p.name.startswith("~$")
+            ))
+        else:
+            archivos.append(ruta)
+    return archivos
+
+
+def escribir_reporte(df_resultado_filtrado, destino: Path, formato: str, rendimiento: Rendimiento = None):
+    if formato in FORMATOS_EXPORTACION:
+        exportar_reporte(df_resultado_filtrado, formato, destino, rendimiento)
+    else:
+        destino.write_bytes(construir_reporte_excel(df_resultado_filtrado, rendimiento))
+
+
+def procesar_archivo(archivo, carpeta_salida: Path, config: Configuracion, formato: str,
+                     memoria_detallada: bool = False, nombre: str = None) -> bool:
+    """
+    Procesa un archivo (o una lista de archivos, unidos en un solo reporte llamado `nombre`) y
+    escribe su reporte. Retorna False si no se pudo procesar.
+    """
+    rendimiento = Rendimiento(memoria_detallada)
+    if isinstance(archivo, list):
+        descripcion = f"{nombre} ({len(archivo)} archivos)"
+        resumen = {'archivo': [str(ruta) for ruta in archivo], 'estado': 'ok', 'jornadas': 0, 'salida': None}
+    else:
+        descripcion, nombre = archivo, nombre or archivo.stem
+        resumen = {'archivo': str(archivo), 'estado': 'ok', 'jornadas': 0, 'salida': None}
+    try:
+        df_resultado_filtrado = procesar_marcaciones(archivo, config, rendimiento)
+        if df_resultado_filtrado.empty:
+            resumen['estado'] = 'sin_jornadas'
+            print(f"{descripcion}: no se encontraron jornadas válidas; no se genera reporte.")
+        else:
+            destino = carpeta_salida / f"{nombre}{SUFIJO_REPORTE}.{formato}"
+            escribir_reporte(df_resultado_filtrado, destino, formato, rendimiento)
+            resumen.update(jornadas=len(df_resultado_filtrado), salida=str(destino))
+            print(f"{descripcion}: {len(df_resultado_filtrado)} jornadas -> {destino}")
+    except ErrorColumnasRequeridas:
+        resumen.update(estado='error', error='columnas_requeridas')
+        print(f"ERROR {descripcion}: faltan columnas requeridas (Cc, CodTrabajador, Nombre, Fecha, Hora, Porteria, PuntoMarcacion).", file=sys.stderr)
+    except KeyError as e:
+        resumen.update(estado='error', error=str(e))
+        print(f"ERROR {descripcion}: hoja 'data' o 'BaseDatos Modificada' no encontrada, o columna faltante: {e}", file=sys.stderr)
+    except Exception as e:
+        resumen.update(estado='error', error=str(e))
+        print(f"ERROR {descripcion}: {e}", file=sys.stderr)
+
+    for medicion in rendimiento.etapas:
+        registrar_json('etapa', archivo=resumen['archivo'], **medicion)
+    registrar_json('archivo', **resumen, segundos=rendimiento.segundos_totales, estados=rendimiento.estados)
+    return resumen['estado'] != 'error'
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m horas_extra",
+        description="Calcula el reporte de horas extra de uno o varios archivos de marcaciones.",
+    )
+    parser.add_argument("entradas", nargs="+", help="Archivos .xlsx, .csv o .parquet, o carpetas que los contienen")
+    parser.add_argument("-o", "--salida", default=".", help="Carpeta de salida (se crea si no existe)")
+    parser.add_argument(
+        "--formato", choices=["xlsx", *FORMATOS_EXPORTACION], default="xlsx",
+        help="Formato del reporte (zip = un Excel por trabajador)",
+    )
+    parser.add_argument("--procesos", type=int, default=PROCESOS_CALCULO, help="Procesos para el cálculo (1 = en serie)")
+    parser.add_argument("--motor", choices=["vectorizado", "iterativo"], default=MOTOR_CALCULO)
+    parser.add_argument(
+        "--almacen", metavar="ARCHIVO.sqlite",
+        help="Modo incremental: solo recalcula las jornadas cuyas marcaciones cambiaron desde la última ejecución con este almacén",
+    )
+    parser.add_argument(
+        "--unir", metavar="NOMBRE",
+        help="Une todos los archivos en un solo reporte NOMBRE (se leen en paralelo y se descartan las marcaciones repetidas entre archivos)",
+    )
+    parser.add_argument("--tamano-bloque", type=int, default=TAMANO_BLOQUE_LECTURA, help="Filas por bloque al leer un Excel")
+    parser.add_argument("--memoria-detallada", action="store_true", help="Medir memoria pico por etapa con tracemalloc (más lento)")
+    parser.add_argument("--sin-log", action="store_true", help="No emitir las líneas JSON de rendimiento")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING if args.sin_log else logging.INFO, format="%(message)s", stream=sys.stderr)
+
+    config = Configuracion(motor=args.motor, procesos=args.procesos, tamano_bloque=args.tamano_bloque, almacen=args.almacen)
+    carpeta_salida = Path(args.salida)
+    carpeta_salida.mkdir(parents=True, exist_ok=True)
+
+    archivos = expandir_entradas(args.entradas)
+    if not archivos:
+        print("No se encontraron archivos .xlsx, .csv ni .parquet para procesar.", file=sys.stderr)
+        return 1
+
+    if args.unir:
+        return 0 if procesar_archivo(archivos, carpeta_salida, config, args.formato, args.memoria_detallada, args.unir) else 1
+
+    fallidos = sum(
+        not procesar_archivo(archivo, carpeta_salida, config, args.formato, args.memoria_detallada)
+        for archivo in archivos
+    )
+    return 1 if fallidos else 0
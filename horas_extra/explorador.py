@@ -0,0 +1,105 @@
+"""
+Explorador del reporte: índices en memoria para filtrar y paginar las jornadas en el servidor,
+así la interfaz solo envía al navegador la página visible.
+"""
+import numpy as np
+import pandas as pd
+
+from .calculo import horas_exactas
+from .instrumentacion import Rendimiento
+from .reglas import UMBRAL_HORAS_EXTRA_RESALTAR
+
+FILAS_POR_PAGINA = 100
+
+
+def indexar_posiciones(valores: pd.Series) -> dict:
+    """{valor: posiciones (ordenadas) de las filas con ese valor}. Los nulos no se indexan."""
+    codigos, unicos = pd.factorize(valores)
+    validos = codigos >= 0
+    orden = np.flatnonzero(validos)[np.argsort(codigos[validos], kind='stable')]
+    limites = np.cumsum(np.bincount(codigos[validos], minlength=len(unicos)))[:-1]
+    return dict(zip(unicos.tolist(), np.split(orden, limites)))
+
+
+class IndiceResultados:
+    """
+    Índices sobre el reporte (el DataFrame de calcular_reporte, ya ordenado): posiciones por
+    ID_TRABAJADOR, TURNO y Estado_Calculo, FECHA ordenada para rangos por búsqueda binaria y
+    las marcas de horas extra altas (> UMBRAL_HORAS_EXTRA_RESALTAR) y de salidas ASUMIDAS.
+    filtrar() combina los filtros sin recorrer el reporte y pagina() arma solo la página pedida.
+    El reporte no se copia: no debe modificarse mientras se use el índice.
+    """
+
+    def __init__(self, df_reporte: pd.DataFrame):
+        self.df_reporte = df_reporte
+        self.por_trabajador = indexar_posiciones(df_reporte['ID_TRABAJADOR'])
+        self.por_turno = indexar_posiciones(df_reporte['TURNO'].astype(str))
+        self.por_estado = indexar_posiciones(df_reporte['Estado_Calculo'].astype(str))
+        fechas = df_reporte['FECHA'].to_numpy(dtype='datetime64[D]')
+        self.orden_fecha = np.argsort(fechas, kind='stable')
+        self.fechas_ordenadas = fechas[self.orden_fecha]
+        self.horas_extra_altas = np.flatnonzero(horas_exactas(df_reporte['Horas_Extra']) > UMBRAL_HORAS_EXTRA_RESALTAR)
+        asumidas = [posiciones for estado, posiciones in self.por_estado.items() if estado.startswith("ASUMIDO")]
+        self.asumidas = np.sort(np.concatenate(asumidas)) if asumidas else np.empty(0, dtype=np.int64)
+        self.nombres = dict(zip(df_reporte['ID_TRABAJADOR'].tolist(), df_reporte['NOMBRE'].astype(str).tolist()))
+
+    def __len__(self):
+        return len(self.df_reporte)
+
+    def __sizeof__(self):
+        """Memoria propia de los índices (para CacheLRU); el reporte se cuenta aparte."""
+        arreglos = [self.orden_fecha, self.fechas_ordenadas, self.horas_extra_altas, self.asumidas]
+        for indice in (self.por_trabajador, self.por_turno, self.por_estado):
+            arreglos.extend(indice.values())
+        return object.__sizeof__(self) + sum(arreglo.nbytes for arreglo in arreglos)
+
+    @property
+    def fecha_minima(self):
+        return pd.Timestamp(self.fechas_ordenadas[0]).date() if len(self) else None
+
+    @property
+    def fecha_maxima(self):
+        return pd.Timestamp(self.fechas_ordenadas[-1]).date() if len(self) else None
+
+    def filtrar(self, trabajadores: list = None, fecha_desde=None, fecha_hasta=None, turnos: list = None,
+                estados: list = None, solo_horas_extra: bool = False, solo_asumidas: bool = False) -> np.ndarray:
+        """
+        Posiciones (en el orden del reporte) de las jornadas que cumplen todos los filtros
+        indicados; None o una lista vacía no filtran. Las fechas son inclusivas.
+        """
+        seleccion = np.ones(len(self), dtype=bool)
+
+        def restringir(posiciones):
+            marcadas = np.zeros(len(self), dtype=bool)
+            marcadas[posiciones] = True
+            seleccion[:] &= marcadas
+
+        for valores, indice in ((trabajadores, self.por_trabajador), (turnos, self.por_turno), (estados, self.por_estado)):
+            if valores:
+                partes = [indice[valor] for valor in valores if valor in indice]
+                restringir(np.concatenate(partes) if partes else np.empty(0, dtype=np.int64))
+        if fecha_desde is not None or fecha_hasta is not None:
+            inicio = 0 if fecha_desde is None else np.searchsorted(self.fechas_ordenadas, np.datetime64(fecha_desde, 'D'), side='left')
+            fin = len(self) if fecha_hasta is None else np.searchsorted(self.fechas_ordenadas, np.datetime64(fecha_hasta, 'D'), side='right')
+            restringir(self.orden_fecha[inicio:fin])
+        if solo_horas_extra:
+            restringir(self.horas_extra_altas)
+        if solo_asumidas:
+            restringir(self.asumidas)
+        return np.flatnonzero(seleccion)
+
+    def pagina(self, posiciones: np.ndarray, numero: int, filas_por_pagina: int = FILAS_POR_PAGINA,
+               columnas: list = None) -> pd.DataFrame:
+        """Filas de la página `numero` (desde 1) de `posiciones`, con las `columnas` indicadas (tipos nativos)."""
+        inicio = (numero - 1) * filas_por_pagina
+        filas = self.df_reporte.iloc[posiciones[inicio:inicio + filas_por_pagina]]
+        return filas if columnas is None else filas[columnas]
+
+
+def construir_indice_resultados(df_reporte: pd.DataFrame, rendimiento: Rendimiento = None) -> IndiceResultados:
+    """IndiceResultados del reporte; si se entrega `rendimiento`, registra la etapa indice_resultados."""
+    rendimiento = rendimiento or Rendimiento()
+    with rendimiento.etapa('indice_resultados', len(df_reporte)) as medicion:
+        indice = IndiceResultados(df_reporte)
+        medicion['filas_salida'] = len(indice)
+    return indice
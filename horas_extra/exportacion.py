@@ -0,0 +1,128 @@
+"""
+Exportación del reporte en otros formatos además del Excel con formato: CSV y Parquet escritos
+por bloques y un ZIP con un libro por trabajador. En los formatos sin colores, los resaltados
+del Excel van como columnas (COLUMNAS_RESALTADO). El CSV lleva las fechas como en el Excel;
+el Parquet conserva los tipos nativos (fechas-hora como timestamp).
+"""
+from contextlib import contextmanager
+import os
+import re
+import tempfile
+import zipfile
+
+import pandas as pd
+
+from .instrumentacion import Rendimiento
+from .reporte import COLUMNAS_REPORTE, COLUMNAS_RESALTADO, calcular_resaltados, escribir_reporte_excel, formatear_reporte
+
+TAMANO_BLOQUE_EXPORTACION = 50000 # Filas por bloque al escribir CSV o Parquet
+FORMATOS_EXPORTACION = { # formato: (descripción, tipo MIME)
+    'csv': ("CSV con columnas de resaltado (.csv)", "text/csv"),
+    'parquet': ("Parquet con columnas de resaltado (.parquet)", "application/vnd.apache.parquet"),
+    'zip': ("Un Excel por trabajador (.zip)", "application/zip"),
+}
+
+
+@contextmanager
+def abrir_destino(destino):
+    """Las rutas se abren para escribir en binario; los archivos abiertos se usan tal cual (sin cerrarlos)."""
+    if isinstance(destino, (str, os.PathLike)):
+        with open(destino, 'wb') as archivo:
+            yield archivo
+    else:
+        yield destino
+
+
+def iterar_bloques_reporte(df_resultado_filtrado: pd.DataFrame, tamano_bloque: int = TAMANO_BLOQUE_EXPORTACION,
+                           fechas_como_texto: bool = True):
+    """
+    Bloques consecutivos del reporte con COLUMNAS_REPORTE (formatear_reporte) + COLUMNAS_RESALTADO;
+    solo se copia y formatea un bloque a la vez.
+    """
+    resaltados = calcular_resaltados(df_resultado_filtrado)
+    for inicio in range(0, len(df_resultado_filtrado), tamano_bloque):
+        fin = inicio + tamano_bloque
+        bloque = formatear_reporte(df_resultado_filtrado.iloc[inicio:fin], fechas_como_texto)
+        yield bloque.assign(**{columna: resaltados[columna][inicio:fin] for columna in COLUMNAS_RESALTADO})
+
+
+def escribir_reporte_csv(df_resultado_filtrado: pd.DataFrame, destino, tamano_bloque: int = TAMANO_BLOQUE_EXPORTACION):
+    """CSV (UTF-8) del reporte con las columnas de resaltado, escrito bloque por bloque en `destino`."""
+    with abrir_destino(destino) as archivo:
+        archivo.write((','.join(COLUMNAS_REPORTE + COLUMNAS_RESALTADO) + '\n').encode('utf-8'))
+        for bloque in iterar_bloques_reporte(df_resultado_filtrado, tamano_bloque):
+            archivo.write(bloque.to_csv(index=False, header=False).encode('utf-8'))
+
+
+def esquema_reporte(df_resultado_filtrado: pd.DataFrame):
+    """
+    Esquema Arrow de la exportación a Parquet, común a todos los bloques: cada columna del
+    reporte toma el tipo de su primer valor no nulo ya formateado (así un bloque con una columna
+    toda nula no cambia el tipo) y las columnas sin valores quedan como texto. Las de resaltado
+    son booleanas.
+    """
+    import pyarrow as pa # Solo se carga al exportar a Parquet
+
+    campos = []
+    for columna in COLUMNAS_REPORTE:
+        validos = df_resultado_filtrado[columna].notna().to_numpy()
+        primero = validos.argmax() if validos.any() else len(validos)
+        muestra = formatear_reporte(df_resultado_filtrado.iloc[primero:primero + 1], fechas_como_texto=False)
+        tipo = pa.Array.from_pandas(muestra[columna]).type
+        campos.append(pa.field(columna, pa.string() if pa.types.is_null(tipo) else tipo))
+    campos.extend(pa.field(columna, pa.bool_()) for columna in COLUMNAS_RESALTADO)
+    return pa.schema(campos)
+
+
+def escribir_reporte_parquet(df_resultado_filtrado: pd.DataFrame, destino, tamano_bloque: int = TAMANO_BLOQUE_EXPORTACION):
+    """Parquet del reporte con las columnas de resaltado; cada bloque se escribe como un grupo de filas."""
+    import pyarrow as pa # Solo se carga al exportar a Parquet
+    import pyarrow.parquet as pq
+
+    esquema = esquema_reporte(df_resultado_filtrado)
+    with abrir_destino(destino) as archivo, pq.ParquetWriter(archivo, esquema) as escritor:
+        for bloque in iterar_bloques_reporte(df_resultado_filtrado, tamano_bloque, fechas_como_texto=False):
+            escritor.write_table(pa.Table.from_pandas(bloque, schema=esquema, preserve_index=False))
+
+
+def nombre_libro_trabajador(id_trabajador, nombre) -> str:
+    """Nombre del libro de un trabajador dentro del ZIP: '<ID>_<NOMBRE>.xlsx', sin caracteres problemáticos."""
+    nombre = re.sub(r'[^\w\- ]+', '_', str(nombre)).strip(' _')
+    return f"{id_trabajador}_{nombre}.xlsx" if nombre else f"{id_trabajador}.xlsx"
+
+
+def escribir_reporte_por_trabajador(df_resultado_filtrado: pd.DataFrame, destino):
+    """
+    ZIP con un libro por trabajador (escribir_reporte_excel de sus jornadas, mismos resaltados).
+    Cada libro se genera justo antes de agregarlo al ZIP, así en memoria hay uno solo a la vez.
+    """
+    # Un .xlsx ya está comprimido: se guarda sin volver a comprimir
+    with abrir_destino(destino) as archivo, zipfile.ZipFile(archivo, 'w', zipfile.ZIP_STORED) as archivo_zip:
+        for id_trabajador, jornadas in df_resultado_filtrado.groupby('ID_TRABAJADOR', sort=False):
+            archivo_zip.writestr(
+                nombre_libro_trabajador(id_trabajador, jornadas['NOMBRE'].iloc[0]), escribir_reporte_excel(jornadas)
+            )
+
+
+EXPORTADORES = {
+    'csv': escribir_reporte_csv,
+    'parquet': escribir_reporte_parquet,
+    'zip': escribir_reporte_por_trabajador,
+}
+
+
+def exportar_reporte(df_resultado_filtrado: pd.DataFrame, formato: str, destino=None, rendimiento: Rendimiento = None):
+    """
+    Escribe el reporte en uno de los FORMATOS_EXPORTACION en `destino` (ruta o archivo binario
+    abierto). Sin `destino`, escribe en un archivo temporal en disco (no en memoria) y lo entrega
+    abierto y al inicio, listo para leer. Si se entrega `rendimiento`, registra la etapa exportacion_<formato>.
+    """
+    rendimiento = rendimiento or Rendimiento()
+    if destino is None:
+        destino = tempfile.TemporaryFile()
+    with rendimiento.etapa(f'exportacion_{formato}', len(df_resultado_filtrado)) as medicion:
+        EXPORTADORES[formato](df_resultado_filtrado, destino)
+        medicion['filas_salida'] = len(df_resultado_filtrado)
+    if not isinstance(destino, (str, os.PathLike)):
+        destino.seek(0)
+    return destino
@@ -0,0 +1,251 @@
+"""
+Histórico de marcaciones procesadas en Parquet, particionado por mes (carpetas mes=AAAA-MM):
+
+    python -m horas_extra.historico archivar marcaciones.xlsx [...] --historico historico/
+    python -m horas_extra.historico reporte --historico historico/ --desde 2024-01-01 --hasta 2024-06-30 \
+        [--trabajadores 81169 ...] -o reporte.xlsx
+
+Las consultas por rango de fechas y trabajadores solo leen las particiones (meses) y grupos
+de filas que pueden contener marcaciones del filtro. Con --ventana-dias, el reporte se calcula
+por ventanas de fechas (ver horas_extra.ventanas). Requiere pyarrow.
+"""
+import argparse
+from datetime import date, timedelta
+import os
+from pathlib import Path
+import sys
+
+import numpy as np
+import pandas as pd
+
+from .calculo import calcular_turnos
+from .instrumentacion import Rendimiento
+from .lectura import TAMANO_BLOQUE_LECTURA, cargar_marcaciones, compactar_texto
+from .preprocesamiento import (
+    agregar_fecha_clave,
+    agregar_fecha_hora,
+    asignar_fecha_clave_turno,
+    descartar_marcaciones_repetidas,
+    filtrar_marcaciones_validas,
+    marcar_entrada_nocturna_dia_anterior,
+)
+from .reglas import LUGARES_PORTERIA_NORMALIZADOS, LUGARES_PUESTO_TRABAJO_NORMALIZADOS, TOLERANCIA_LLEGADA_TARDE_MINUTOS
+from .reporte import completar_reporte, construir_reporte_excel, formatear_reporte
+
+# Columnas guardadas: las que usa calcular_turnos, salvo FECHA_CLAVE_TURNO, que depende de
+# las marcaciones del día anterior y se recalcula al leer. Se guardan todas las marcaciones
+# (no solo las de puntos conocidos): una entrada nocturna en cualquier punto mueve las
+# entradas de la madrugada siguiente al día anterior.
+COLUMNAS_HISTORICO = ['id_trabajador', 'nombre', 'FECHA_HORA', 'TIPO_MARCACION', 'porteria', 'PORTERIA_NORMALIZADA']
+COLUMNAS_TEXTO_HISTORICO = ['nombre', 'TIPO_MARCACION', 'porteria', 'PORTERIA_NORMALIZADA']
+CAMPO_PARTICION = 'mes'
+ARCHIVO_PARTICION = 'marcaciones.parquet'
+TAMANO_GRUPO_FILAS = 50000 # Filas por grupo de filas de Parquet (unidad mínima de lectura)
+
+
+def ruta_particion(historico, mes: str) -> Path:
+    return Path(historico) / f"{CAMPO_PARTICION}={mes}" / ARCHIVO_PARTICION
+
+
+def meses_marcaciones(fechas_hora: pd.Series) -> np.ndarray:
+    """Mes 'AAAA-MM' de cada marcación."""
+    return fechas_hora.to_numpy(dtype='datetime64[ns]').astype('datetime64[M]').astype(str)
+
+
+def archivar_marcaciones(df_raw: pd.DataFrame, historico) -> dict:
+    """
+    Agrega al histórico las marcaciones procesadas con agregar_fecha_hora, descartar_marcaciones_repetidas y agregar_fecha_clave,
+    antes de filtrar_marcaciones_validas. Cada mes afectado se reescribe completo: se une con lo ya guardado, se descartan las
+    marcaciones idénticas (las exportaciones acumuladas se repiten) y se ordena por
+    trabajador y hora, así cada grupo de filas cubre pocos trabajadores.
+    Retorna {'meses': [...], 'filas_nuevas': n}.
+    """
+    resumen = {'meses': [], 'filas_nuevas': 0}
+    if df_raw.empty:
+        return resumen
+
+    df = df_raw[COLUMNAS_HISTORICO]
+    meses = meses_marcaciones(df['FECHA_HORA'])
+    for mes in np.unique(meses):
+        destino = ruta_particion(historico, mes)
+        nuevas = df[meses == mes]
+        anteriores = pd.read_parquet(destino) if destino.exists() else nuevas.iloc[:0]
+        combinadas = pd.concat(
+            [anteriores.astype({col: object for col in COLUMNAS_TEXTO_HISTORICO}),
+             nuevas.astype({col: object for col in COLUMNAS_TEXTO_HISTORICO})],
+            ignore_index=True,
+        ).drop_duplicates()
+        combinadas = combinadas.sort_values(['id_trabajador', 'FECHA_HORA'], kind='stable', ignore_index=True)
+        for col in COLUMNAS_TEXTO_HISTORICO:
+            combinadas[col] = compactar_texto(combinadas[col])
+
+        # Se escribe a un temporal y se reemplaza: una lectura concurrente nunca ve un archivo a medias
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        temporal = destino.with_suffix('.tmp')
+        combinadas.to_parquet(temporal, index=False, row_group_size=TAMANO_GRUPO_FILAS)
+        os.replace(temporal, destino)
+        resumen['meses'].append(str(mes))
+        resumen['filas_nuevas'] += len(combinadas) - len(anteriores)
+    return resumen
+
+
+def archivar_archivo(archivo, historico, tamano_bloque: int = TAMANO_BLOQUE_LECTURA) -> dict:
+    """Lee un archivo de marcaciones (.xlsx, .csv o .parquet), lo procesa como preprocesar_marcaciones y lo agrega al histórico."""
+    df_raw = cargar_marcaciones(archivo, tamano_bloque)
+    if not df_raw.empty:
+        agregar_fecha_hora(df_raw)
+        descartar_marcaciones_repetidas(df_raw)
+        agregar_fecha_clave(df_raw)
+    return archivar_marcaciones(df_raw, historico)
+
+
+def leer_marcaciones_historico(historico, fecha_inicio: date, fecha_fin: date, trabajadores: list = None) -> pd.DataFrame:
+    """
+    Marcaciones del histórico con FECHA_HORA entre fecha_inicio y fecha_fin (días completos,
+    inclusive) y, si se entrega, de los `trabajadores` indicados. El filtro se resuelve en
+    pyarrow: descarta meses por la partición y grupos de filas por sus estadísticas.
+    """
+    import pyarrow.dataset as ds # Solo se carga al usar el histórico
+
+    if not Path(historico).exists():
+        return pd.DataFrame(columns=COLUMNAS_HISTORICO)
+    dataset = ds.dataset(historico, format='parquet', partitioning='hive')
+    inicio = pd.Timestamp(fecha_inicio)
+    fin = pd.Timestamp(fecha_fin) + pd.Timedelta(days=1)
+    filtro = (
+        (ds.field(CAMPO_PARTICION) >= inicio.strftime('%Y-%m'))
+        & (ds.field(CAMPO_PARTICION) <= fecha_fin.strftime('%Y-%m'))
+        & (ds.field('FECHA_HORA') >= inicio.to_pydatetime())
+        & (ds.field('FECHA_HORA') < fin.to_pydatetime())
+    )
+    if trabajadores is not None:
+        filtro &= ds.field('id_trabajador').isin([int(t) for t in trabajadores])
+
+    df = dataset.to_table(columns=COLUMNAS_HISTORICO, filter=filtro).to_pandas()
+    df['FECHA_HORA'] = df['FECHA_HORA'].astype('datetime64[ns]')
+    for col in COLUMNAS_TEXTO_HISTORICO:
+        df[col] = compactar_texto(df[col])
+    return df
+
+
+def calcular_turnos_historico(historico, fecha_inicio: date, fecha_fin: date, trabajadores: list = None,
+                              motor: str = None, rendimiento: Rendimiento = None) -> pd.DataFrame:
+    """
+    Resultado de calcular_turnos (con Es_Nocturno y FECHA_CLAVE_TURNO) de las jornadas con
+    FECHA_CLAVE_TURNO entre fecha_inicio y fecha_fin, calculado desde el histórico.
+    Se lee además el día anterior (entradas nocturnas que mueven la madrugada siguiente) y el
+    día siguiente (salidas de los turnos nocturnos), así que las jornadas de los extremos están
+    completas. Si se entrega `rendimiento`, registra las etapas lectura_historico, fecha_clave
+    y calculo_turnos.
+    """
+    rendimiento = rendimiento or Rendimiento()
+    with rendimiento.etapa('lectura_historico') as medicion:
+        df = leer_marcaciones_historico(
+            historico, fecha_inicio - timedelta(days=1), fecha_fin + timedelta(days=1), trabajadores
+        )
+        medicion['filas_salida'] = len(df)
+    if df.empty:
+        return pd.DataFrame()
+
+    with rendimiento.etapa('fecha_clave', len(df)) as medicion:
+        df['Entrada_Nocturna_Dia_Anterior'] = marcar_entrada_nocturna_dia_anterior(df)
+        df['FECHA_CLAVE_TURNO'] = asignar_fecha_clave_turno(df)
+        df = filtrar_marcaciones_validas(df)
+        medicion['filas_salida'] = len(df)
+
+    with rendimiento.etapa('calculo_turnos', len(df)) as medicion:
+        df_resultado = calcular_turnos(
+            df,
+            LUGARES_PUESTO_TRABAJO_NORMALIZADOS,
+            LUGARES_PORTERIA_NORMALIZADOS,
+            TOLERANCIA_LLEGADA_TARDE_MINUTOS,
+            motor
+        )
+        if not df_resultado.empty:
+            claves = df_resultado['FECHA_CLAVE_TURNO']
+            en_rango = (claves >= pd.Timestamp(fecha_inicio)) & (claves <= pd.Timestamp(fecha_fin))
+            df_resultado = df_resultado[en_rango].reset_index(drop=True)
+        medicion['filas_salida'] = len(df_resultado)
+    return df_resultado
+
+
+def calcular_reporte_historico(historico, fecha_inicio: date, fecha_fin: date, trabajadores: list = None,
+                               motor: str = None, rendimiento: Rendimiento = None) -> pd.DataFrame:
+    """
+    Reporte de las jornadas con FECHA_CLAVE_TURNO entre fecha_inicio y fecha_fin calculado
+    desde el histórico, con las mismas columnas y orden que procesar_marcaciones.
+    Las jornadas de los extremos del rango están completas (ver calcular_turnos_historico),
+    así que no se aplica el filtro de primer/último día. Si se entrega `rendimiento`,
+    registra las etapas lectura_historico, fecha_clave y calculo_turnos.
+    """
+    rendimiento = rendimiento or Rendimiento()
+    df_resultado = calcular_turnos_historico(historico, fecha_inicio, fecha_fin, trabajadores, motor, rendimiento)
+    if not df_resultado.empty:
+        df_resultado = df_resultado.drop(columns=['Es_Nocturno', 'FECHA_CLAVE_TURNO'])
+    rendimiento.registrar_estados(df_resultado)
+    if df_resultado.empty:
+        return pd.DataFrame()
+    return completar_reporte(df_resultado)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m horas_extra.historico", description=__doc__.strip().splitlines()[0])
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+
+    archivar = subcomandos.add_parser("archivar", help="Agrega archivos de marcaciones (.xlsx, .csv o .parquet) al histórico")
+    archivar.add_argument("entradas", nargs="+")
+    archivar.add_argument("--historico", required=True, help="Carpeta del histórico (se crea si no existe)")
+
+    reporte = subcomandos.add_parser("reporte", help="Calcula el reporte de un rango de fechas desde el histórico")
+    reporte.add_argument("--historico", required=True)
+    reporte.add_argument("--desde", required=True, type=date.fromisoformat, help="AAAA-MM-DD")
+    reporte.add_argument("--hasta", required=True, type=date.fromisoformat, help="AAAA-MM-DD (inclusive)")
+    reporte.add_argument("--trabajadores", type=int, nargs="+", help="Códigos de trabajador (por defecto, todos)")
+    reporte.add_argument("-o", "--salida", required=True, help="Archivo .xlsx o .csv")
+    reporte.add_argument(
+        "--ventana-dias", type=int,
+        help="Calcula por ventanas de N días con memoria acotada; con salida .csv, escribe cada ventana al terminarla",
+    )
+    reporte.add_argument(
+        "--filtro-extremos", action="store_true",
+        help="Aplica el filtro de primer/último día de cada trabajador, como el reporte de un archivo",
+    )
+    args = parser.parse_args(argv)
+
+    if args.comando == "archivar":
+        for entrada in args.entradas:
+            resumen = archivar_archivo(entrada, args.historico)
+            print(f"{entrada}: {resumen['filas_nuevas']} marcaciones nuevas en {', '.join(resumen['meses']) or 'ningún mes'}")
+        return 0
+
+    rendimiento = Rendimiento()
+    salida = Path(args.salida)
+    if args.ventana_dias or args.filtro_extremos:
+        from .ventanas import DIAS_VENTANA, calcular_reporte_por_ventanas, iterar_reporte_por_ventanas # ventanas importa este módulo
+        opciones = dict(dias_ventana=args.ventana_dias or DIAS_VENTANA, filtrar_extremos=args.filtro_extremos, rendimiento=rendimiento)
+        if salida.suffix.lower() == ".csv":
+            jornadas = 0
+            for df_parte in iterar_reporte_por_ventanas(args.historico, args.desde, args.hasta, args.trabajadores, **opciones):
+                formatear_reporte(df_parte).to_csv(salida, index=False, mode="a" if jornadas else "w", header=not jornadas)
+                jornadas += len(df_parte)
+            if not jornadas:
+                print("No se encontraron jornadas en el rango indicado.", file=sys.stderr)
+                return 1
+            print(f"{jornadas} jornadas -> {salida} ({rendimiento.segundos_totales:.2f} s)")
+            return 0
+        df_reporte = calcular_reporte_por_ventanas(args.historico, args.desde, args.hasta, args.trabajadores, **opciones)
+    else:
+        df_reporte = calcular_reporte_historico(args.historico, args.desde, args.hasta, args.trabajadores, rendimiento=rendimiento)
+    if df_reporte.empty:
+        print("No se encontraron jornadas en el rango indicado.", file=sys.stderr)
+        return 1
+    if salida.suffix.lower() == ".csv":
+        formatear_reporte(df_reporte).to_csv(salida, index=False)
+    else:
+        salida.write_bytes(construir_reporte_excel(df_reporte, rendimiento))
+    print(f"{len(df_reporte)} jornadas -> {salida} ({rendimiento.segundos_totales:.2f} s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,298 @@
+"""
+Modo incremental: los resultados de calcular_turnos se guardan por jornada
+(ID_TRABAJADOR, FECHA_CLAVE_TURNO) en un archivo SQLite, junto con una huella de las
+marcaciones que los produjeron. En la siguiente carga (por ejemplo, la exportación
+acumulada del mes con un día más) solo se recalculan las jornadas cuya huella cambió
+y sus días vecinos; el resto se lee del almacén.
+"""
+import json
+import os
+from pathlib import Path
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from .calculo import aplicar_filtro_primer_ultimo_dia
+from .instrumentacion import Rendimiento
+from .reglas import calcular_hash_reglas
+from .reporte import calcular_turnos_con_avance, completar_reporte
+from .turnos import NS_POR_DIA
+
+# Almacén por defecto de la interfaz: la variable de entorno HORAS_EXTRA_ALMACEN o, sin ella, la carpeta
+# .horas_extra del usuario. Siempre absoluta: no depende del directorio desde donde se lanzó Streamlit.
+RUTA_ALMACEN_RESULTADOS = str(
+    Path(os.environ.get("HORAS_EXTRA_ALMACEN") or Path.home() / ".horas_extra" / "resultados_jornadas.sqlite").expanduser().resolve()
+)
+VERSION_ALMACEN = 2 # Cambiarla descarta los almacenes existentes (2: FECHA y horas como datetime64)
+TIEMPO_ESPERA_BLOQUEO_S = 30 # Otra sesión o proceso puede estar escribiendo
+
+# Columnas de las marcaciones que usa calcular_turnos (además de la clave de la jornada)
+COLUMNAS_HUELLA = ['id_trabajador', 'nombre', 'FECHA_HORA', 'TIPO_MARCACION', 'porteria', 'PORTERIA_NORMALIZADA']
+NAT_NS = np.iinfo(np.int64).min
+
+
+def calcular_huellas(df_raw_filtrado: pd.DataFrame) -> pd.DataFrame:
+    """
+    Huella de 64 bits de las marcaciones de cada jornada (ID_TRABAJADOR, FECHA_CLAVE_TURNO).
+    Cada fila se resume con hash_pandas_object (COLUMNAS_HUELLA y su posición dentro de la
+    jornada en orden de hora, que decide los empates) y las filas de una jornada se suman.
+    Retorna ID_TRABAJADOR, FECHA_CLAVE_TURNO (int64 ns) y HUELLA (int64), ordenado por jornada.
+    """
+    ids = df_raw_filtrado['id_trabajador'].to_numpy(dtype=np.int64)
+    claves = df_raw_filtrado['FECHA_CLAVE_TURNO'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    tiempos = df_raw_filtrado['FECHA_HORA'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+    # Mismo orden que el motor vectorizado (estable); calcular_turnos descarta las claves nulas
+    validos = np.flatnonzero(claves != NAT_NS)
+    orden = validos[np.lexsort((tiempos[validos], claves[validos], ids[validos]))]
+    if len(orden) == 0:
+        return pd.DataFrame({'ID_TRABAJADOR': ids[:0], 'FECHA_CLAVE_TURNO': claves[:0], 'HUELLA': ids[:0]})
+
+    ids, claves = ids[orden], claves[orden]
+    nueva_jornada = np.ones(len(orden), dtype=bool)
+    nueva_jornada[1:] = (ids[1:] != ids[:-1]) | (claves[1:] != claves[:-1])
+    inicio = np.flatnonzero(nueva_jornada)
+    posicion = np.arange(len(orden)) - np.repeat(inicio, np.diff(np.append(inicio, len(orden))))
+
+    filas = df_raw_filtrado[COLUMNAS_HUELLA].iloc[orden].reset_index(drop=True)
+    filas['posicion'] = posicion
+    hash_filas = pd.util.hash_pandas_object(filas, index=False).to_numpy()
+    return pd.DataFrame({
+        'ID_TRABAJADOR': ids[inicio],
+        'FECHA_CLAVE_TURNO': claves[inicio],
+        'HUELLA': np.add.reduceat(hash_filas, inicio).view(np.int64), # La suma da la vuelta en 64 bits
+    })
+
+
+def jornadas_a_recalcular(huellas: pd.DataFrame, huellas_guardadas: pd.DataFrame) -> np.ndarray:
+    """
+    Máscara sobre `huellas` de las jornadas que hay que recalcular: las nuevas, las que cambiaron
+    y el día anterior y siguiente de cada una (una entrada nocturna mueve marcaciones de la
+    madrugada siguiente al día anterior en asignar_fecha_clave_turno).
+    """
+    guardadas = huellas.merge(huellas_guardadas, on=['ID_TRABAJADOR', 'FECHA_CLAVE_TURNO'], how='left',
+                              suffixes=('', '_GUARDADA'))
+    cambiadas = (guardadas['HUELLA'] != guardadas['HUELLA_GUARDADA']).to_numpy() # NaN: jornada nueva
+
+    ids = huellas['ID_TRABAJADOR'].to_numpy()
+    claves = huellas['FECHA_CLAVE_TURNO'].to_numpy()
+    vecinas = pd.MultiIndex.from_arrays([
+        np.tile(ids[cambiadas], 2),
+        np.concatenate([claves[cambiadas] - NS_POR_DIA, claves[cambiadas] + NS_POR_DIA]),
+    ])
+    return cambiadas | pd.MultiIndex.from_arrays([ids, claves]).isin(vecinas)
+
+
+class AlmacenResultados:
+    """
+    Archivo SQLite con la huella y los resultados de calcular_turnos de cada jornada
+    (una columna por columna del resultado). Si cambian las reglas (calcular_hash_reglas)
+    o VERSION_ALMACEN, el contenido se descarta. Se usa como context manager:
+
+        with AlmacenResultados("resultados.sqlite") as almacen: ...
+    """
+
+    def __init__(self, ruta):
+        self.ruta = str(ruta)
+        Path(self.ruta).parent.mkdir(parents=True, exist_ok=True)
+        self.conexion = sqlite3.connect(self.ruta, timeout=TIEMPO_ESPERA_BLOQUEO_S)
+        self._preparar()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def cerrar(self):
+        self.conexion.close()
+
+    def _preparar(self):
+        with self.conexion:
+            self.conexion.execute("CREATE TABLE IF NOT EXISTS metadatos (clave TEXT PRIMARY KEY, valor TEXT)")
+            version = {'version': str(VERSION_ALMACEN), 'reglas': calcular_hash_reglas()}
+            guardada = dict(self.conexion.execute("SELECT clave, valor FROM metadatos WHERE clave IN ('version', 'reglas')"))
+            if guardada != version:
+                self.conexion.execute("DROP TABLE IF EXISTS jornadas")
+                self.conexion.execute("DROP TABLE IF EXISTS resultados")
+                self.conexion.execute("DELETE FROM metadatos")
+                self.conexion.executemany("INSERT INTO metadatos VALUES (?, ?)", version.items())
+            self.conexion.execute(
+                "CREATE TABLE IF NOT EXISTS jornadas (id_trabajador INTEGER, fecha_clave INTEGER, huella INTEGER, "
+                "PRIMARY KEY (id_trabajador, fecha_clave)) WITHOUT ROWID"
+            )
+
+    def _esquema(self):
+        """[[columna, dtype], ...] del resultado guardado, o None si aún no hay resultados."""
+        fila = self.conexion.execute("SELECT valor FROM metadatos WHERE clave = 'esquema'").fetchone()
+        return json.loads(fila[0]) if fila else None
+
+    def obtener_huellas(self, fecha_min_ns: int, fecha_max_ns: int) -> pd.DataFrame:
+        """Huellas guardadas de las jornadas entre las dos fechas clave (ns, inclusive)."""
+        filas = self.conexion.execute(
+            "SELECT id_trabajador, fecha_clave, huella FROM jornadas WHERE fecha_clave BETWEEN ? AND ?",
+            (int(fecha_min_ns), int(fecha_max_ns)),
+        ).fetchall()
+        return pd.DataFrame(
+            np.array(filas, dtype=np.int64).reshape(-1, 3), columns=['ID_TRABAJADOR', 'FECHA_CLAVE_TURNO', 'HUELLA']
+        )
+
+    def leer_jornadas(self, huellas: pd.DataFrame) -> tuple:
+        """
+        (huellas guardadas, resultados guardados) de las jornadas en el rango de fechas de `huellas`,
+        leídos en una sola transacción: aunque otra sesión o proceso guarde jornadas al mismo tiempo,
+        los resultados corresponden a esas huellas.
+        """
+        self.conexion.execute("BEGIN")
+        try:
+            huellas_guardadas = self.obtener_huellas(huellas['FECHA_CLAVE_TURNO'].min(), huellas['FECHA_CLAVE_TURNO'].max())
+            return huellas_guardadas, self.obtener_resultados(huellas)
+        finally:
+            self.conexion.rollback()
+
+    def guardar(self, huellas: pd.DataFrame, df_resultado: pd.DataFrame):
+        """
+        Reemplaza, en una sola transacción, la huella y el resultado de las jornadas de `huellas`
+        por los recién calculados en `df_resultado` (una jornada puede no tener resultado).
+        """
+        esquema = [[col, str(tipo)] for col, tipo in df_resultado.dtypes.items()]
+        esquema_guardado = self._esquema()
+        if len(df_resultado.columns) and esquema_guardado not in (None, esquema):
+            raise ValueError(
+                f"Las columnas del resultado no coinciden con las del almacén {self.ruta}; "
+                "incremente VERSION_ALMACEN para descartarlo."
+            )
+        jornadas = list(zip(huellas['ID_TRABAJADOR'].tolist(), huellas['FECHA_CLAVE_TURNO'].tolist()))
+        with self.conexion:
+            if esquema_guardado is not None:
+                self.conexion.executemany(
+                    'DELETE FROM resultados WHERE "ID_TRABAJADOR" = ? AND "FECHA_CLAVE_TURNO" = ?', jornadas
+                )
+            self.conexion.executemany(
+                "INSERT OR REPLACE INTO jornadas VALUES (?, ?, ?)",
+                zip(huellas['ID_TRABAJADOR'].tolist(), huellas['FECHA_CLAVE_TURNO'].tolist(), huellas['HUELLA'].tolist()),
+            )
+            if df_resultado.empty:
+                return
+            if esquema_guardado is None:
+                columnas = ", ".join(f'"{col}"' for col, _ in esquema)
+                self.conexion.execute(
+                    f'CREATE TABLE resultados ({columnas}, PRIMARY KEY ("ID_TRABAJADOR", "FECHA_CLAVE_TURNO")) WITHOUT ROWID'
+                )
+                self.conexion.execute("INSERT INTO metadatos VALUES ('esquema', ?)", (json.dumps(esquema),))
+            self.conexion.executemany(
+                f"INSERT INTO resultados VALUES ({', '.join('?' * len(esquema))})",
+                zip(*columnas_a_sql(df_resultado)),
+            )
+
+    def obtener_resultados(self, huellas: pd.DataFrame) -> pd.DataFrame:
+        """
+        Resultados guardados de las jornadas de `huellas`, ordenados por (ID_TRABAJADOR,
+        FECHA_CLAVE_TURNO) como los entrega calcular_turnos, con los tipos de columna originales.
+        """
+        esquema = self._esquema()
+        if esquema is None or huellas.empty:
+            return pd.DataFrame()
+        columnas = ", ".join(f'"{col}"' for col, _ in esquema)
+        filas = self.conexion.execute(
+            f"SELECT {columnas} FROM resultados "
+            'WHERE "FECHA_CLAVE_TURNO" BETWEEN ? AND ? ORDER BY "ID_TRABAJADOR", "FECHA_CLAVE_TURNO"',
+            (int(huellas['FECHA_CLAVE_TURNO'].min()), int(huellas['FECHA_CLAVE_TURNO'].max())),
+        ).fetchall()
+        df_resultado = columnas_desde_sql(list(zip(*filas)), esquema)
+        if df_resultado.empty:
+            return df_resultado
+
+        # En el rango de fechas puede haber jornadas de otros trabajadores u otros archivos
+        incluir = pd.MultiIndex.from_arrays([
+            df_resultado['ID_TRABAJADOR'].to_numpy(dtype=np.int64),
+            df_resultado['FECHA_CLAVE_TURNO'].to_numpy(dtype='datetime64[ns]').view(np.int64),
+        ]).isin(pd.MultiIndex.from_arrays([huellas['ID_TRABAJADOR'], huellas['FECHA_CLAVE_TURNO']]))
+        return df_resultado[incluir].reset_index(drop=True)
+
+
+def columnas_a_sql(df_resultado: pd.DataFrame) -> list:
+    """Columnas del resultado como listas de valores para SQLite (fechas-hora en ns, nulos como None)."""
+    columnas = []
+    for col, tipo in df_resultado.dtypes.items():
+        serie = df_resultado[col]
+        if tipo.kind == 'M':
+            ns = serie.to_numpy(dtype='datetime64[ns]').view(np.int64)
+            columnas.append(np.where(ns == NAT_NS, None, ns).tolist())
+        else:
+            columnas.append(serie.astype(object).where(serie.notna(), None).tolist())
+    return columnas
+
+
+def columnas_desde_sql(columnas: list, esquema: list) -> pd.DataFrame:
+    """Inverso de columnas_a_sql: reconstruye el DataFrame con los tipos guardados en `esquema`."""
+    if not columnas:
+        return pd.DataFrame({col: pd.Series(dtype=tipo) for col, tipo in esquema})
+    datos = {}
+    for (col, tipo), valores in zip(esquema, columnas):
+        if tipo.startswith('datetime64'):
+            datos[col] = np.array([NAT_NS if v is None else v for v in valores], dtype=np.int64).view('datetime64[ns]')
+        else:
+            datos[col] = pd.Series(valores, dtype=object).astype(tipo).to_numpy()
+    return pd.DataFrame(datos)
+
+
+def calcular_reporte_incremental(df_raw_filtrado: pd.DataFrame, ruta_almacen=RUTA_ALMACEN_RESULTADOS,
+                                 motor: str = None, rendimiento: Rendimiento = None):
+    """
+    Como calcular_reporte, pero recalcula solo las jornadas nuevas o con marcaciones distintas
+    (y sus días vecinos) respecto al almacén en `ruta_almacen`; el resto se lee del almacén.
+    El resultado es el mismo que el del cálculo completo. Retorna (df_resultado_filtrado, hubo_jornadas).
+    Si se entrega `rendimiento`, registra las etapas huellas, calculo_turnos, almacen y filtro_dias.
+
+    Las jornadas que no se recalculan se toman de la misma lectura del almacén que sus huellas, no
+    de una lectura posterior: otra sesión puede guardar sus propias jornadas mientras esta calcula.
+    """
+    rendimiento = rendimiento or Rendimiento()
+    with AlmacenResultados(ruta_almacen) as almacen:
+        with rendimiento.etapa('huellas', len(df_raw_filtrado)) as medicion:
+            huellas = calcular_huellas(df_raw_filtrado)
+            recalcular = np.zeros(0, dtype=bool)
+            df_guardado = pd.DataFrame()
+            if not huellas.empty:
+                huellas_guardadas, df_guardado = almacen.leer_jornadas(huellas)
+                recalcular = jornadas_a_recalcular(huellas, huellas_guardadas)
+            medicion['filas_salida'] = int(recalcular.sum())
+
+        jornadas = huellas[recalcular]
+        filas_recalcular = pd.MultiIndex.from_arrays([
+            df_raw_filtrado['id_trabajador'].to_numpy(dtype=np.int64),
+            df_raw_filtrado['FECHA_CLAVE_TURNO'].to_numpy(dtype='datetime64[ns]').view(np.int64),
+        ]).isin(pd.MultiIndex.from_arrays([jornadas['ID_TRABAJADOR'], jornadas['FECHA_CLAVE_TURNO']]))
+        with rendimiento.etapa('calculo_turnos', int(filas_recalcular.sum())) as medicion:
+            df_nuevo = pd.DataFrame()
+            if filas_recalcular.any():
+                df_nuevo = calcular_turnos_con_avance(df_raw_filtrado[filas_recalcular], motor, rendimiento)
+            medicion['filas_salida'] = len(df_nuevo)
+
+        with rendimiento.etapa('almacen', len(huellas)) as medicion:
+            if not jornadas.empty:
+                almacen.guardar(jornadas, df_nuevo)
+            if not df_guardado.empty:
+                df_guardado = df_guardado[~pd.MultiIndex.from_arrays([
+                    df_guardado['ID_TRABAJADOR'].to_numpy(dtype=np.int64),
+                    df_guardado['FECHA_CLAVE_TURNO'].to_numpy(dtype='datetime64[ns]').view(np.int64),
+                ]).isin(pd.MultiIndex.from_arrays([jornadas['ID_TRABAJADOR'], jornadas['FECHA_CLAVE_TURNO']]))]
+            partes = [df for df in (df_guardado, df_nuevo) if not df.empty]
+            df_resultado = pd.DataFrame()
+            if partes:
+                df_resultado = pd.concat(partes, ignore_index=True).sort_values(
+                    ['ID_TRABAJADOR', 'FECHA_CLAVE_TURNO'], kind='stable', ignore_index=True
+                )
+            medicion['filas_salida'] = len(df_resultado)
+    if df_resultado.empty:
+        return df_resultado, False
+
+    with rendimiento.etapa('filtro_dias', len(df_resultado)) as medicion:
+        df_resultado_filtrado = aplicar_filtro_primer_ultimo_dia(df_resultado)
+        medicion['filas_salida'] = len(df_resultado_filtrado)
+    rendimiento.registrar_estados(df_resultado_filtrado)
+    if df_resultado_filtrado.empty:
+        return df_resultado_filtrado, True
+    return completar_reporte(df_resultado_filtrado), True
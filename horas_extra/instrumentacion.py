@@ -0,0 +1,91 @@
+"""
+Mediciones de rendimiento por etapa del proceso (tiempo, filas y memoria).
+
+Por defecto solo se toma el reloj y el pico de memoria del proceso (RSS), que cuestan
+microsegundos por etapa. tracemalloc es opcional (memoria_detallada=True) porque hace
+más lenta cada asignación de memoria mientras está activo.
+
+Con `al_avanzar`, cada etapa informa además su avance (por ejemplo, a una barra de progreso).
+"""
+from contextlib import contextmanager
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource # No existe en Windows
+except ImportError:
+    resource = None
+
+
+def rss_pico_mb():
+    """Máximo de memoria residente que ha usado el proceso hasta ahora (MB), o None si no se puede medir."""
+    if resource is None:
+        return None
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo reporta en KB y macOS en bytes
+    return round(maximo / 1024**2 if sys.platform == 'darwin' else maximo / 1024, 1)
+
+
+class Rendimiento:
+    """
+    Acumula una medición por etapa: {'etapa', 'filas_entrada', 'filas_salida', 'segundos',
+    'rss_pico_mb'} y, con memoria_detallada, 'memoria_pico_mb' (tracemalloc). `estados`
+    guarda la cantidad de jornadas por Estado_Calculo del reporte final.
+
+    `al_avanzar(etapa, fraccion, detalle)` se llama al iniciar (0.0) y terminar (1.0) cada etapa
+    y en cada llamada a avanzar(). Si lanza una excepción, la etapa en curso se interrumpe.
+    """
+
+    def __init__(self, memoria_detallada: bool = False, al_avanzar=None):
+        self.memoria_detallada = memoria_detallada
+        self.al_avanzar = al_avanzar
+        self.etapas = []
+        self.estados = {}
+        self._etapa_actual = None
+
+    @contextmanager
+    def etapa(self, nombre: str, filas_entrada: int = None):
+        """
+        Mide el bloque `with`. El bloque puede completar la medición entregada,
+        por ejemplo medicion['filas_salida'] = len(df).
+        """
+        medicion = {'etapa': nombre, 'filas_entrada': filas_entrada, 'filas_salida': None}
+        self._etapa_actual = nombre
+        self.avanzar(0.0)
+        detener_tracemalloc = False
+        if self.memoria_detallada:
+            if tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.start()
+                detener_tracemalloc = True
+        inicio = time.perf_counter()
+        try:
+            yield medicion
+            self.avanzar(1.0)
+        finally:
+            medicion['segundos'] = round(time.perf_counter() - inicio, 4)
+            medicion['rss_pico_mb'] = rss_pico_mb()
+            if self.memoria_detallada:
+                medicion['memoria_pico_mb'] = round(tracemalloc.get_traced_memory()[1] / 1024**2, 1)
+                if detener_tracemalloc:
+                    tracemalloc.stop()
+            self.etapas.append(medicion)
+
+    def avanzar(self, fraccion: float, detalle: str = None):
+        """Informa el avance (0 a 1) de la etapa en curso a `al_avanzar`, si se entregó."""
+        if self.al_avanzar is not None:
+            self.al_avanzar(self._etapa_actual, fraccion, detalle)
+
+    def registrar_estados(self, df_resultado, acumular: bool = False):
+        """Cuenta las jornadas del reporte por Estado_Calculo; con `acumular`, suma a los conteos previos (reporte por partes)."""
+        if 'Estado_Calculo' in df_resultado:
+            conteos = {str(k): int(v) for k, v in df_resultado['Estado_Calculo'].value_counts().items()}
+            if acumular:
+                conteos = {k: self.estados.get(k, 0) + conteos.get(k, 0) for k in {**self.estados, **conteos}}
+            self.estados = conteos
+
+    @property
+    def segundos_totales(self) -> float:
+        return round(sum(medicion['segundos'] for medicion in self.etapas), 4)
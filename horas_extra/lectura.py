@@ -0,0 +1,459 @@
+"""
+Lectura del archivo de marcaciones (.xlsx por bloques, .csv y .parquet con pyarrow) y
+conversión de FECHA/HORA.
+"""
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import csv
+from datetime import time
+import io
+import os
+
+from openpyxl import load_workbook
+import numpy as np
+import pandas as pd
+
+from .paralelo import CONTEXTO_PROCESOS
+from .reglas import (
+    CODIGOS_TRABAJADORES_FILTRO,
+    HORA_FIN_ENTRADA_NOCTURNA,
+    HORA_INICIO_ENTRADA_NOCTURNA,
+    LUGARES_COMBINADOS_NORMALIZADOS,
+)
+from .turnos import hora_a_ns
+
+# --- Conversión de FECHA y HORA a FECHA_HORA ---
+
+# 'HH:MM', 'HH:MM:SS' o 'HH:MM:SS.ffffff' (como str() de un datetime.time)
+PATRON_HORA_TEXTO = r'^\s*(\d{1,2}):(\d{1,2})(?::(\d{1,2})(?:\.(\d{1,9}))?)?\s*$'
+# Fechas como texto (CSV), probadas en orden: ISO ('2024-03-05', con o sin hora) y día/mes/año
+FORMATOS_FECHA_TEXTO = ['ISO8601', '%d/%m/%Y']
+
+
+def convertir_fraccion_dia_a_ns(valores: np.ndarray) -> np.ndarray:
+    """
+    Convierte fracciones de día de Excel (0 <= valor < 1) en nanosegundos desde la medianoche.
+    Igual que antes, se truncan a segundos enteros. Los valores fuera de rango quedan en -1.
+    """
+    valores = np.asarray(valores, dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        segundos = np.trunc(valores * 86400)
+        validos = (valores <= 1.0) & (segundos >= 0) & (segundos < 86400)
+    return np.where(validos, np.nan_to_num(segundos).astype(np.int64) * 10**9, -1)
+
+
+def convertir_textos_hora_a_ns(textos: pd.Series) -> np.ndarray:
+    """
+    Convierte textos 'HH:MM' / 'HH:MM:SS[.ffffff]' en nanosegundos desde la medianoche (-1 si no son válidos).
+    """
+    partes = textos.str.extract(PATRON_HORA_TEXTO)
+    horas = pd.to_numeric(partes[0]).fillna(-1).to_numpy(dtype=np.int64)
+    minutos = pd.to_numeric(partes[1]).fillna(-1).to_numpy(dtype=np.int64)
+    segundos = pd.to_numeric(partes[2]).fillna(0).to_numpy(dtype=np.int64)
+    fraccion_ns = pd.to_numeric(partes[3].str.ljust(9, '0')).fillna(0).to_numpy(dtype=np.int64)
+
+    validos = (horas >= 0) & (horas < 24) & (minutos >= 0) & (minutos < 60) & (segundos < 60)
+    hora_ns = ((horas * 60 + minutos) * 60 + segundos) * 10**9 + fraccion_ns
+    return np.where(validos, hora_ns, -1)
+
+
+def convertir_horas_a_ns(horas: pd.Series) -> np.ndarray:
+    """
+    Convierte la columna 'hora' en nanosegundos desde la medianoche, sin construir cadenas por fila.
+    Formatos aceptados: fracción de día de Excel (float), 'HH:MM', 'HH:MM:SS' y datetime.time.
+    Los valores no reconocidos quedan en -1.
+    """
+    if pd.api.types.is_float_dtype(horas.dtype):
+        return convertir_fraccion_dia_a_ns(horas.to_numpy(dtype=np.float64, na_value=np.nan))
+
+    # Las horas se repiten mucho: se convierte cada valor distinto una sola vez
+    codigos, unicos = pd.factorize(horas)
+    if len(unicos) == 0: # Todas nulas
+        return np.full(len(horas), -1, dtype=np.int64)
+    unicos = np.asarray(unicos, dtype=object)
+    hora_ns_unicos = np.full(len(unicos), -1, dtype=np.int64)
+
+    es_fraccion = np.array([isinstance(valor, (float, np.floating)) for valor in unicos], dtype=bool)
+    es_time = np.array([isinstance(valor, time) for valor in unicos], dtype=bool)
+    es_texto = np.array([isinstance(valor, str) for valor in unicos], dtype=bool)
+
+    if es_fraccion.any():
+        hora_ns_unicos[es_fraccion] = convertir_fraccion_dia_a_ns(unicos[es_fraccion].astype(np.float64))
+    if es_time.any():
+        hora_ns_unicos[es_time] = [hora_a_ns(valor) for valor in unicos[es_time]]
+    if es_texto.any():
+        hora_ns_unicos[es_texto] = convertir_textos_hora_a_ns(pd.Series(unicos[es_texto], dtype=object))
+
+    return np.where(codigos >= 0, hora_ns_unicos[codigos], -1)
+
+
+def convertir_fechas(fechas: pd.Series) -> pd.Series:
+    """
+    Convierte la columna 'fecha' a datetime64 (NaT si no se reconoce). Las fechas de Excel y
+    Parquet ya llegan como fecha; los textos solo se aceptan en FORMATOS_FECHA_TEXTO, de modo que
+    '05/03/2024' es siempre el 5 de marzo (pd.to_datetime lo leería como 3 de mayo y descartaría
+    '15/03/2024').
+    """
+    if pd.api.types.is_datetime64_any_dtype(fechas.dtype):
+        return fechas
+
+    # Como en convertir_horas_a_ns: cada valor distinto se convierte una sola vez
+    codigos, unicos = pd.factorize(fechas)
+    unicos = pd.Series(np.asarray(unicos, dtype=object), dtype=object)
+    fechas_unicas = pd.Series(pd.NaT, index=unicos.index, dtype='datetime64[ns]')
+    es_texto = unicos.map(lambda valor: isinstance(valor, str)).to_numpy(dtype=bool)
+
+    if (~es_texto).any():
+        fechas_unicas[~es_texto] = pd.to_datetime(unicos[~es_texto], errors='coerce')
+    for formato in FORMATOS_FECHA_TEXTO:
+        pendientes = es_texto & fechas_unicas.isna().to_numpy()
+        if not pendientes.any():
+            break
+        fechas_unicas[pendientes] = pd.to_datetime(unicos[pendientes].str.strip(), format=formato, errors='coerce')
+
+    fechas_ns = fechas_unicas.to_numpy(dtype='datetime64[ns]')
+    return pd.Series(np.where(codigos >= 0, fechas_ns[codigos], np.datetime64('NaT')), index=fechas.index)
+
+
+def combinar_fecha_hora(fechas: pd.Series, horas: pd.Series):
+    """
+    Suma la hora (en ns) a la fecha normalizada para construir FECHA_HORA.
+    Retorna: (FECHA_HORA con NaT en las filas rechazadas, cantidad de filas con hora no reconocida)
+    """
+    hora_ns = convertir_horas_a_ns(horas)
+    rechazadas = hora_ns < 0
+    fechas_ns = fechas.dt.normalize().to_numpy(dtype='datetime64[ns]').view(np.int64)
+    fecha_hora = (fechas_ns + np.where(rechazadas, 0, hora_ns)).view('datetime64[ns]')
+    fecha_hora[rechazadas] = np.datetime64('NaT')
+    return pd.Series(fecha_hora, index=fechas.index), int(rechazadas.sum())
+
+
+
+# --- Lectura por bloques del archivo de marcaciones ---
+
+HOJAS_MARCACIONES = ['data', 'BaseDatos Modificada'] # En orden de preferencia
+COLUMNAS_REQUERIDAS = ['cc', 'codtrabajador', 'nombre', 'fecha', 'hora', 'porteria', 'puntomarcacion']
+TAMANO_BLOQUE_LECTURA = 50000 # Filas por bloque
+MAX_PROCESOS_LECTURA = os.cpu_count() or 1 # Archivos que se leen a la vez (uno por proceso)
+INTERVALO_AVANCE_LECTURA_S = 0.5 # Cada cuánto se informa el avance mientras se leen archivos en otros procesos
+COLUMNAS_CATEGORICAS = ['cc', 'nombre', 'hora', 'porteria', 'puntomarcacion'] # Valores muy repetidos
+# Los códigos de trabajador caben en int32 (la mitad de memoria que Int64)
+TIPO_ID_TRABAJADOR = np.int32 if max(CODIGOS_TRABAJADORES_FILTRO) <= np.iinfo(np.int32).max else np.int64
+REEMPLAZOS_TIPO_MARCACION = {'entrada': 'ent', 'salida': 'sal'}
+
+
+def compactar_texto(serie: pd.Series) -> pd.Series:
+    """
+    Convierte una columna de textos (u objetos) repetidos en categórica, sin alterar los valores.
+    Las categorías quedan en orden de aparición (no se ordenan, admiten tipos mezclados).
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie
+    codigos, unicos = pd.factorize(serie)
+    return pd.Series(pd.Categorical.from_codes(codigos, categories=pd.Index(unicos)), index=serie.index, name=serie.name)
+
+
+def normalizar_texto(serie: pd.Series, reemplazos: dict = None) -> pd.Series:
+    """
+    Equivale a serie.astype(str).str.strip().str.lower() (más .replace(reemplazos)), pero se
+    calcula una vez por valor distinto y retorna una serie categórica. Los nulos se mantienen nulos.
+    """
+    codigos, unicos = pd.factorize(serie)
+    normalizados = pd.Index(np.asarray(unicos, dtype=object)).astype(str).str.strip().str.lower()
+    if reemplazos:
+        normalizados = pd.Index([reemplazos.get(valor, valor) for valor in normalizados], dtype=normalizados.dtype)
+    # Valores distintos pueden coincidir al normalizarse (' Entrada' y 'entrada')
+    codigos_normalizados, categorias = pd.factorize(normalizados)
+    codigos = np.where(codigos >= 0, codigos_normalizados[codigos] if len(codigos_normalizados) else -1, -1)
+    return pd.Series(pd.Categorical.from_codes(codigos, categories=categorias), index=serie.index, name=serie.name)
+
+
+class ErrorColumnasRequeridas(KeyError):
+    """La hoja de marcaciones no contiene todas las COLUMNAS_REQUERIDAS."""
+
+
+def filtrar_bloque_marcaciones(bloque: pd.DataFrame) -> pd.DataFrame:
+    """
+    Conserva solo las marcaciones de CODIGOS_TRABAJADORES_FILTRO en puntos conocidos (LUGARES_*).
+    Las entradas nocturnas (21:00 a 23:59) se conservan en cualquier punto, porque determinan
+    'Entrada_Nocturna_Dia_Anterior' antes del filtrado final por punto de marcación.
+    """
+    ids = pd.to_numeric(bloque['codtrabajador'], errors='coerce')
+    trabajador_valido = ids.isin(CODIGOS_TRABAJADORES_FILTRO)
+
+    tipo_marcacion = normalizar_texto(bloque['puntomarcacion'], REEMPLAZOS_TIPO_MARCACION)
+    lugar_conocido = normalizar_texto(bloque['porteria']).isin(LUGARES_COMBINADOS_NORMALIZADOS)
+    conservar = trabajador_valido & tipo_marcacion.isin(['ent', 'sal']) & lugar_conocido
+
+    candidatas_nocturnas = trabajador_valido & tipo_marcacion.eq('ent') & ~lugar_conocido
+    if candidatas_nocturnas.any():
+        hora_ns = convertir_horas_a_ns(bloque.loc[candidatas_nocturnas, 'hora'])
+        conservar[candidatas_nocturnas] = (
+            (hora_ns >= hora_a_ns(HORA_INICIO_ENTRADA_NOCTURNA))
+            & (hora_ns <= hora_a_ns(HORA_FIN_ENTRADA_NOCTURNA))
+        )
+
+    bloque = bloque[conservar.to_numpy()].copy()
+    bloque['codtrabajador'] = ids[conservar].astype(TIPO_ID_TRABAJADOR)
+    return bloque.rename(columns={'codtrabajador': 'id_trabajador'})
+
+
+def preparar_bloque_marcaciones(bloque: pd.DataFrame) -> pd.DataFrame:
+    """
+    Filtra un bloque con las COLUMNAS_REQUERIDAS y convierte 'fecha' a datetime64 (convertir_fechas),
+    dejándolo como lo entrega leer_marcaciones_excel.
+    """
+    bloque = filtrar_bloque_marcaciones(bloque)
+    bloque['fecha'] = convertir_fechas(bloque['fecha'])
+    return bloque
+
+
+def leer_marcaciones_excel(archivo, tamano_bloque: int = TAMANO_BLOQUE_LECTURA, avance=None):
+    """
+    Lee la hoja de marcaciones con openpyxl en modo read_only y entrega DataFrames por bloques.
+    La hoja ('data' o 'BaseDatos Modificada') se detecta una sola vez, solo se extraen las
+    COLUMNAS_REQUERIDAS y cada bloque llega filtrado (filtrar_bloque_marcaciones) y tipado:
+    id_trabajador como TIPO_ID_TRABAJADOR y fecha como datetime64.
+    Con `avance(fraccion, detalle)` (como Rendimiento.avanzar) informa cada bloque leído; si
+    lanza una excepción (trabajo cancelado), la lectura se detiene en ese bloque.
+    """
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        nombre_hoja = next((hoja for hoja in HOJAS_MARCACIONES if hoja in libro.sheetnames), None)
+        if nombre_hoja is None:
+            raise KeyError("El archivo no contiene la hoja 'data' ni 'BaseDatos Modificada'")
+
+        hoja = libro[nombre_hoja]
+        filas_hoja = hoja.max_row # Dimensión guardada en el archivo; puede faltar
+        filas = hoja.iter_rows(values_only=True)
+        encabezado = [str(columna).lower() if columna is not None else '' for columna in next(filas, ())]
+        faltantes = [columna for columna in COLUMNAS_REQUERIDAS if columna not in encabezado]
+        if faltantes:
+            raise ErrorColumnasRequeridas(faltantes)
+        indices = [encabezado.index(columna) for columna in COLUMNAS_REQUERIDAS]
+
+        def construir_bloque(filas_bloque):
+            return preparar_bloque_marcaciones(pd.DataFrame({
+                columna: [fila[indice] if indice < len(fila) else None for fila in filas_bloque]
+                for columna, indice in zip(COLUMNAS_REQUERIDAS, indices)
+            }))
+
+        filas_bloque = []
+        filas_leidas = 0
+        for fila in filas:
+            filas_bloque.append(fila)
+            if len(filas_bloque) >= tamano_bloque:
+                filas_leidas += len(filas_bloque)
+                if avance is not None:
+                    avance(filas_leidas / filas_hoja if filas_hoja else 0.0, f"{filas_leidas} filas leídas")
+                yield construir_bloque(filas_bloque)
+                filas_bloque = []
+        if filas_bloque:
+            yield construir_bloque(filas_bloque)
+    finally:
+        libro.close()
+
+
+def cargar_marcaciones_excel(archivo, tamano_bloque: int = TAMANO_BLOQUE_LECTURA, avance=None) -> pd.DataFrame:
+    """
+    Une los bloques de leer_marcaciones_excel en un solo DataFrame (ya filtrado), con las
+    COLUMNAS_CATEGORICAS como categóricas.
+    """
+    bloques = list(leer_marcaciones_excel(archivo, tamano_bloque, avance))
+    if not bloques:
+        return pd.DataFrame(columns=['cc', 'id_trabajador', 'nombre', 'fecha', 'hora', 'porteria', 'puntomarcacion'])
+    df_raw = pd.concat(bloques, ignore_index=True)
+    for columna in COLUMNAS_CATEGORICAS:
+        df_raw[columna] = compactar_texto(df_raw[columna])
+    return df_raw
+
+
+# --- Lectura de CSV y Parquet con pyarrow ---
+
+FORMATOS_MARCACIONES = ['xlsx', 'csv', 'parquet'] # Extensiones aceptadas
+FIRMA_XLSX = b'PK\x03\x04' # Un .xlsx es un ZIP
+FIRMA_PARQUET = b'PAR1'
+BYTES_ENCABEZADO_CSV = 64 * 1024 # Suficiente para la primera línea del CSV
+
+
+def leer_inicio(archivo, cantidad: int) -> bytes:
+    """Primeros `cantidad` bytes de una ruta o buffer, sin mover la posición del buffer."""
+    if isinstance(archivo, (str, os.PathLike)):
+        with open(archivo, 'rb') as f:
+            return f.read(cantidad)
+    posicion = archivo.tell()
+    try:
+        return archivo.read(cantidad)
+    finally:
+        archivo.seek(posicion)
+
+
+def detectar_formato(archivo) -> str:
+    """'xlsx', 'parquet' o 'csv' según los primeros bytes (los archivos subidos no siempre traen extensión)."""
+    inicio = leer_inicio(archivo, 4)
+    if inicio == FIRMA_XLSX:
+        return 'xlsx'
+    if inicio == FIRMA_PARQUET:
+        return 'parquet'
+    return 'csv'
+
+
+def columnas_requeridas(nombres: list) -> list:
+    """
+    Nombres originales (en el orden de COLUMNAS_REQUERIDAS) de las columnas requeridas, que se
+    buscan sin distinguir mayúsculas como en el Excel. Lanza ErrorColumnasRequeridas si falta alguna.
+    """
+    por_nombre = {}
+    for nombre in nombres:
+        por_nombre.setdefault(str(nombre).lower(), nombre)
+    faltantes = [columna for columna in COLUMNAS_REQUERIDAS if columna not in por_nombre]
+    if faltantes:
+        raise ErrorColumnasRequeridas(faltantes)
+    return [por_nombre[columna] for columna in COLUMNAS_REQUERIDAS]
+
+
+def tabla_a_marcaciones(tabla) -> pd.DataFrame:
+    """
+    Convierte una tabla Arrow con las COLUMNAS_REQUERIDAS (ya en minúsculas) en el mismo DataFrame
+    que cargar_marcaciones_excel. Los trabajadores se filtran en Arrow cuando el código es entero
+    y los textos pasan a pandas codificados como diccionario, es decir, directo a categóricas
+    sin crear un objeto de Python por fila.
+    """
+    import pyarrow as pa # Solo se carga al leer CSV o Parquet
+    import pyarrow.compute as pc
+
+    codigos = tabla.column('codtrabajador')
+    if pa.types.is_integer(codigos.type):
+        tabla = tabla.filter(pc.is_in(codigos, value_set=pa.array(CODIGOS_TRABAJADORES_FILTRO, type=codigos.type)))
+    for columna in COLUMNAS_CATEGORICAS:
+        posicion = tabla.schema.get_field_index(columna)
+        valores = tabla.column(posicion)
+        if not pa.types.is_dictionary(valores.type):
+            tabla = tabla.set_column(posicion, columna, pc.dictionary_encode(valores))
+    df_raw = preparar_bloque_marcaciones(tabla.to_pandas())
+    if df_raw.empty:
+        return pd.DataFrame(columns=['cc', 'id_trabajador', 'nombre', 'fecha', 'hora', 'porteria', 'puntomarcacion'])
+    df_raw = df_raw.reset_index(drop=True)
+    for columna in COLUMNAS_CATEGORICAS:
+        df_raw[columna] = df_raw[columna].cat.remove_unused_categories()
+    return df_raw
+
+
+def cargar_marcaciones_csv(archivo) -> pd.DataFrame:
+    """
+    Lee un CSV de marcaciones (separado por ',' o ';', UTF-8) con el lector de pyarrow, que solo
+    convierte las COLUMNAS_REQUERIDAS. Los tipos se infieren como lo haría el Excel, salvo 'fecha' y
+    'hora', que se leen como texto: convertir_fechas acepta solo FORMATOS_FECHA_TEXTO (pyarrow no
+    reconoce '15/03/2024') y convertir_horas_a_ns acepta 'HH:MM' y 'HH:MM:SS' por igual.
+    """
+    import pyarrow as pa # Solo se carga al leer CSV o Parquet
+    import pyarrow.csv as pa_csv
+
+    primera_linea = leer_inicio(archivo, BYTES_ENCABEZADO_CSV).split(b'\n', 1)[0].decode('utf-8-sig').rstrip('\r')
+    separador = ';' if primera_linea.count(';') > primera_linea.count(',') else ','
+    nombres = columnas_requeridas(next(csv.reader([primera_linea], delimiter=separador), []))
+    como_texto = {nombres[COLUMNAS_REQUERIDAS.index(columna)]: pa.string() for columna in ['fecha', 'hora']}
+    tabla = pa_csv.read_csv(
+        archivo,
+        parse_options=pa_csv.ParseOptions(delimiter=separador),
+        convert_options=pa_csv.ConvertOptions(include_columns=nombres, column_types=como_texto),
+    )
+    return tabla_a_marcaciones(tabla.rename_columns(COLUMNAS_REQUERIDAS))
+
+
+def cargar_marcaciones_parquet(archivo) -> pd.DataFrame:
+    """Lee de un Parquet de marcaciones solo las COLUMNAS_REQUERIDAS (ver tabla_a_marcaciones)."""
+    import pyarrow.parquet as pq # Solo se carga al leer CSV o Parquet
+
+    archivo_parquet = pq.ParquetFile(archivo)
+    nombres = columnas_requeridas(archivo_parquet.schema_arrow.names)
+    tabla = archivo_parquet.read(columns=nombres)
+    return tabla_a_marcaciones(tabla.rename_columns(COLUMNAS_REQUERIDAS))
+
+
+def cargar_marcaciones(archivo, tamano_bloque: int = TAMANO_BLOQUE_LECTURA, avance=None) -> pd.DataFrame:
+    """
+    Carga un archivo de marcaciones .xlsx, .csv o .parquet (ruta o buffer; el formato se detecta
+    por su contenido) en el DataFrame de cargar_marcaciones_excel: ya filtrado, id_trabajador
+    como TIPO_ID_TRABAJADOR, fecha como datetime64 y las COLUMNAS_CATEGORICAS como categóricas.
+    `avance` se informa por bloque solo en los .xlsx: CSV y Parquet se leen en una sola llamada
+    de pyarrow (rápida), así que una cancelación se atiende al terminar esa lectura.
+    """
+    formato = detectar_formato(archivo)
+    if formato == 'csv':
+        return cargar_marcaciones_csv(archivo)
+    if formato == 'parquet':
+        return cargar_marcaciones_parquet(archivo)
+    return cargar_marcaciones_excel(archivo, tamano_bloque, avance)
+
+
+def contenido_archivo(archivo):
+    """Las rutas se entregan tal cual; los buffers (BytesIO, archivos subidos) como bytes, para enviarlos a otro proceso."""
+    if isinstance(archivo, (str, os.PathLike, bytes)):
+        return archivo
+    if hasattr(archivo, 'getvalue'):
+        return archivo.getvalue()
+    return archivo.read()
+
+
+def cargar_contenido(contenido, tamano_bloque: int = TAMANO_BLOQUE_LECTURA) -> pd.DataFrame:
+    """cargar_marcaciones de una ruta o de los bytes de un archivo (lo que entrega contenido_archivo)."""
+    return cargar_marcaciones(io.BytesIO(contenido) if isinstance(contenido, bytes) else contenido, tamano_bloque)
+
+
+def avance_de_archivo(avance, posicion: int, total: int):
+    """`avance` de la lectura de un archivo (el número `posicion` de `total`) como avance de toda la lectura."""
+    if avance is None:
+        return None
+    return lambda fraccion, detalle: avance((posicion + fraccion) / total, f"archivo {posicion + 1} de {total}: {detalle}")
+
+
+def cargar_varios_archivos(archivos: list, tamano_bloque: int = TAMANO_BLOQUE_LECTURA,
+                           procesos: int = MAX_PROCESOS_LECTURA, avance=None) -> pd.DataFrame:
+    """
+    Lee varios archivos de marcaciones (rutas o buffers, de cualquiera de los FORMATOS_MARCACIONES)
+    y los une en un solo DataFrame, como cargar_marcaciones, con la columna 'archivo' (posición
+    del archivo en la lista) para descartar después las marcaciones repetidas entre archivos.
+    Cada archivo pasa por la misma detección de formato y validación de columnas; con más de un
+    archivo se leen en hasta `procesos` procesos a la vez (leer un .xlsx usa un núcleo por
+    completo), así el tiempo total se acerca al del archivo más grande. Un error en cualquier
+    archivo se propaga.
+    `avance(fraccion, detalle)` se informa por bloque en un solo proceso y, con varios, por archivo
+    terminado y cada INTERVALO_AVANCE_LECTURA_S; si lanza una excepción (trabajo cancelado), la
+    lectura se abandona sin esperar a los archivos pendientes (los que ya se están leyendo
+    terminan en su proceso y se descartan).
+    """
+    contenidos = [contenido_archivo(archivo) for archivo in archivos]
+    total = len(contenidos)
+    procesos = max(1, min(procesos, total))
+    if procesos == 1:
+        partes = []
+        for posicion, contenido in enumerate(contenidos):
+            partes.append(cargar_marcaciones(
+                io.BytesIO(contenido) if isinstance(contenido, bytes) else contenido, tamano_bloque,
+                avance_de_archivo(avance, posicion, total),
+            ))
+    else:
+        pool = ProcessPoolExecutor(max_workers=procesos, mp_context=CONTEXTO_PROCESOS)
+        terminado = False
+        try:
+            futuros = [pool.submit(cargar_contenido, contenido, tamano_bloque) for contenido in contenidos]
+            pendientes = set(futuros)
+            while pendientes:
+                hechos, pendientes = wait(pendientes, INTERVALO_AVANCE_LECTURA_S, return_when=FIRST_COMPLETED)
+                for futuro in hechos:
+                    futuro.result() # Propaga el error de un archivo sin esperar a los demás
+                if avance is not None:
+                    avance((total - len(pendientes)) / total, f"{total - len(pendientes)} de {total} archivos leídos")
+            partes = [futuro.result() for futuro in futuros]
+            terminado = True
+        finally:
+            pool.shutdown(wait=terminado, cancel_futures=not terminado)
+
+    partes = [parte.assign(archivo=np.int32(posicion)) for posicion, parte in enumerate(partes) if not parte.empty]
+    if not partes:
+        return pd.DataFrame(columns=['cc', 'id_trabajador', 'nombre', 'fecha', 'hora', 'porteria', 'puntomarcacion', 'archivo'])
+    # Las categorías difieren entre archivos: se unen como objetos y se vuelven a compactar
+    df_raw = pd.concat(partes, ignore_index=True)
+    for columna in COLUMNAS_CATEGORICAS:
+        df_raw[columna] = compactar_texto(df_raw[columna])
+    return df_raw
@@ -0,0 +1,116 @@
+"""
+Ejecución de calcular_turnos y del filtro de días extremos en varios procesos, repartiendo por trabajador.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+import numpy as np
+import pandas as pd
+
+from .calculo import aplicar_filtro_primer_ultimo_dia, calcular_turnos
+from .reglas import (
+    LUGARES_PORTERIA_NORMALIZADOS,
+    LUGARES_PUESTO_TRABAJO_NORMALIZADOS,
+    TOLERANCIA_LLEGADA_TARDE_MINUTOS,
+)
+
+# --- 5.1 Ejecución paralela por trabajador ---
+
+# Los procesos de cálculo y de lectura no se crean con fork: el servidor de Streamlit tiene hilos
+# (sesiones, GestorTrabajos) y un fork copia sus bloqueos tal como estén en ese momento.
+# forkserver no existe en Windows; ahí se usa spawn.
+CONTEXTO_PROCESOS = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+)
+# Columnas de las marcaciones que usan calcular_turnos y el filtro de días extremos
+COLUMNAS_CALCULO = ['id_trabajador', 'nombre', 'FECHA_HORA', 'FECHA_CLAVE_TURNO', 'TIPO_MARCACION', 'porteria', 'PORTERIA_NORMALIZADA']
+
+
+def empaquetar_columnas(df: pd.DataFrame, columnas: list) -> dict:
+    """
+    Convierte las columnas en arreglos compactos para enviarlos a otro proceso:
+    los textos viajan como códigos enteros + valores únicos, el resto como arreglo tal cual.
+    """
+    paquete = {}
+    for col in columnas:
+        serie = df[col]
+        if pd.api.types.is_object_dtype(serie.dtype) or pd.api.types.is_string_dtype(serie.dtype):
+            codigos, unicos = pd.factorize(serie)
+            paquete[col] = ('codigos', codigos.astype(np.int32), np.asarray(unicos, dtype=object))
+        else:
+            paquete[col] = ('valores', serie.array if isinstance(serie.dtype, pd.api.extensions.ExtensionDtype) else serie.to_numpy())
+    return paquete
+
+
+def desempaquetar_columnas(paquete: dict) -> pd.DataFrame:
+    """Reconstruye el DataFrame a partir de empaquetar_columnas."""
+    columnas = {}
+    for col, (tipo, *datos) in paquete.items():
+        if tipo == 'codigos':
+            codigos, unicos = datos
+            columnas[col] = np.append(unicos, np.nan)[codigos] # el código -1 apunta al nulo agregado al final
+        else:
+            columnas[col] = datos[0]
+    return pd.DataFrame(columnas)
+
+
+def calcular_particion(paquete: dict, motor: str = None):
+    """
+    Tarea de cada proceso: calcula los turnos de un grupo de trabajadores y aplica el
+    filtro de días extremos. Retorna None si no hubo jornadas, o un dict con las columnas
+    del resultado (arreglos) y las filas que conserva el filtro, en el orden del filtro.
+    """
+    df_resultado = calcular_turnos(
+        desempaquetar_columnas(paquete),
+        LUGARES_PUESTO_TRABAJO_NORMALIZADOS,
+        LUGARES_PORTERIA_NORMALIZADOS,
+        TOLERANCIA_LLEGADA_TARDE_MINUTOS,
+        motor
+    )
+    if df_resultado.empty:
+        return None
+    filas_filtro = aplicar_filtro_primer_ultimo_dia(df_resultado).index.to_numpy(dtype=np.int64)
+    return {
+        'columnas': {col: df_resultado[col].to_numpy() for col in df_resultado.columns},
+        'filas_filtro': filas_filtro,
+    }
+
+
+def calcular_turnos_paralelo(df_raw_filtrado: pd.DataFrame, procesos: int, motor: str = None):
+    """
+    Ejecuta calcular_turnos + aplicar_filtro_primer_ultimo_dia repartiendo a los trabajadores
+    por hash de id_trabajador entre `procesos` procesos. Cada jornada depende solo de las
+    marcaciones de su trabajador, así que los resultados parciales se vuelven a ordenar
+    por ID_TRABAJADOR (orden estable) para reproducir exactamente el resultado en serie,
+    incluido el índice.
+
+    Retorna: (df_resultado, df_resultado_filtrado), como las dos llamadas en serie.
+    """
+    particion = pd.util.hash_pandas_object(df_raw_filtrado['id_trabajador'], index=False).to_numpy() % procesos
+    paquetes = [
+        empaquetar_columnas(df_raw_filtrado[particion == i], COLUMNAS_CALCULO)
+        for i in range(procesos)
+    ]
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=CONTEXTO_PROCESOS) as pool:
+        parciales = [r for r in pool.map(calcular_particion, paquetes, [motor] * procesos) if r is not None]
+    if not parciales:
+        return pd.DataFrame(), pd.DataFrame()
+
+    # Resultado completo: mismas filas que en serie, ordenadas por trabajador como lo hace el motor
+    columnas = list(parciales[0]['columnas'])
+    valores = {col: np.concatenate([r['columnas'][col] for r in parciales]) for col in columnas}
+    orden = np.argsort(valores['ID_TRABAJADOR'], kind='stable')
+    df_resultado = pd.DataFrame({col: valores[col][orden] for col in columnas})
+
+    # Filas conservadas por el filtro, traducidas a posiciones del resultado completo.
+    # En cada partición el filtro recorre a los trabajadores en orden de ID, así que basta
+    # un orden estable por ID para intercalar las particiones como en serie.
+    posicion_global = np.empty(len(orden), dtype=np.int64)
+    posicion_global[orden] = np.arange(len(orden))
+    desplazamientos = np.cumsum([0] + [len(r['columnas'][columnas[0]]) for r in parciales[:-1]])
+    filas = np.concatenate([posicion_global[r['filas_filtro'] + d] for r, d in zip(parciales, desplazamientos)])
+    filas = filas[np.argsort(df_resultado['ID_TRABAJADOR'].to_numpy()[filas], kind='stable')]
+
+    df_resultado_filtrado = df_resultado.loc[filas].copy()
+    df_resultado_filtrado.drop(columns=['Es_Nocturno', 'FECHA_CLAVE_TURNO'], inplace=True, errors='ignore')
+    return df_resultado, df_resultado_filtrado
@@ -0,0 +1,299 @@
+"""
+Etapa 1 del proceso: del archivo de marcaciones al dataset crudo con FECHA_CLAVE_TURNO.
+"""
+import numpy as np
+import pandas as pd
+
+from .instrumentacion import Rendimiento
+from .lectura import (
+    MAX_PROCESOS_LECTURA,
+    REEMPLAZOS_TIPO_MARCACION,
+    TAMANO_BLOQUE_LECTURA,
+    cargar_marcaciones,
+    cargar_varios_archivos,
+    combinar_fecha_hora,
+    normalizar_texto,
+)
+from .reglas import (
+    HORA_CORTE_NOCTURNO,
+    HORA_FIN_ENTRADA_NOCTURNA,
+    HORA_INICIO_ENTRADA_NOCTURNA,
+    HORA_INICIO_T1,
+    LUGARES_COMBINADOS_NORMALIZADOS,
+    MAX_EXCESO_SALIDA_HRS,
+    TOLERANCIA_ASIGNACION_TARDE_MINUTOS,
+    TOLERANCIA_ENTRADA_TEMPRANA_MINUTOS,
+    VENTANA_REPETIDAS_SEGUNDOS,
+)
+from .turnos import NS_POR_DIA, NS_POR_HORA, NS_POR_MINUTO, TABLA_TURNOS, hora_a_ns
+
+# --- Funciones para asignar Fecha Clave de Turno (CORREGIDA A REGLA ESTRICTA) ---
+
+def separar_dia_y_hora_ns(fechas_hora: pd.Series):
+    """
+    Retorna (medianoche del día, hora del día) de cada marcación como arreglos int64 en nanosegundos.
+    """
+    fechas_hora_ns = fechas_hora.to_numpy(dtype='datetime64[ns]').view(np.int64)
+    hora_ns = np.mod(fechas_hora_ns, NS_POR_DIA)
+    return fechas_hora_ns - hora_ns, hora_ns
+
+
+def marcar_entrada_nocturna_dia_anterior(df: pd.DataFrame) -> np.ndarray:
+    """
+    Marca las marcaciones cuyo trabajador tiene una entrada nocturna (21:00:00 a 23:59:59) el día anterior.
+    Busca cada (trabajador, día) en el arreglo ordenado de días afectados por una entrada nocturna,
+    sin unir (merge) el DataFrame completo.
+    """
+    dia_ns, hora_ns = separar_dia_y_hora_ns(df['FECHA_HORA'])
+    codigos_id, _ = pd.factorize(df['id_trabajador'])
+    entrada_nocturna = (
+        df['TIPO_MARCACION'].eq('ent').to_numpy()
+        & (hora_ns >= hora_a_ns(HORA_INICIO_ENTRADA_NOCTURNA))
+        & (hora_ns <= hora_a_ns(HORA_FIN_ENTRADA_NOCTURNA))
+        & (codigos_id >= 0)
+    )
+    if not entrada_nocturna.any():
+        return np.zeros(len(df), dtype=bool)
+
+    # Clave entera (trabajador, día) para ordenar y buscar
+    dia = dia_ns // NS_POR_DIA
+    dia_min = dia.min()
+    dias_rango = dia.max() - dia_min + 2
+    clave_fila = codigos_id * dias_rango + (dia - dia_min)
+    # Días afectados: el día siguiente a cada entrada nocturna
+    claves_afectadas = np.unique(clave_fila[entrada_nocturna] + 1)
+
+    posicion = np.minimum(np.searchsorted(claves_afectadas, clave_fila), len(claves_afectadas) - 1)
+    return (claves_afectadas[posicion] == clave_fila) & (codigos_id >= 0)
+
+
+def asignar_fecha_clave_turno(df: pd.DataFrame) -> pd.Series:
+    """
+    Regla estricta de agrupamiento, evaluada sobre la columna completa:
+    - Entradas antes de HORA_INICIO_T1 con 'Entrada_Nocturna_Dia_Anterior': se agrupan al DÍA ANTERIOR
+      (continuidad del T3); sin ese flag son entradas tempranas del T1 del DÍA ACTUAL.
+    - Salidas antes de HORA_CORTE_NOCTURNO: se agrupan al DÍA ANTERIOR.
+    - El resto se agrupa al día de la marcación.
+    """
+    dia_ns, hora_ns = separar_dia_y_hora_ns(df['FECHA_HORA'])
+    tipo_marcacion = df['TIPO_MARCACION']
+
+    agrupar_dia_anterior = (
+        tipo_marcacion.eq('ent').to_numpy()
+        & (hora_ns < hora_a_ns(HORA_INICIO_T1))
+        & df['Entrada_Nocturna_Dia_Anterior'].to_numpy(dtype=bool)
+    ) | (
+        tipo_marcacion.eq('sal').to_numpy()
+        & (hora_ns < hora_a_ns(HORA_CORTE_NOCTURNO))
+    )
+
+    fecha_clave_ns = dia_ns - np.where(agrupar_dia_anterior, NS_POR_DIA, 0)
+    return pd.Series(fecha_clave_ns.view('datetime64[ns]'), index=df.index)
+
+
+def agregar_fecha_hora(df_raw: pd.DataFrame) -> tuple:
+    """
+    Agrega FECHA_HORA (in place) y descarta las filas sin fecha reconocida o con hora no reconocida.
+    Retorna (filas descartadas por la fecha, filas descartadas por la hora).
+    """
+    registros_fecha_invalida = int(df_raw['fecha'].isna().sum())
+    df_raw.dropna(subset=['fecha'], inplace=True)
+
+    # Combinar FECHA y HORA (la hora se suma directamente en nanosegundos)
+    df_raw['FECHA_HORA'], registros_hora_invalida = combinar_fecha_hora(df_raw['fecha'], df_raw['hora'])
+    df_raw.dropna(subset=['FECHA_HORA'], inplace=True)
+    return registros_fecha_invalida, registros_hora_invalida
+
+
+def descartar_duplicados_entre_archivos(df_raw: pd.DataFrame) -> int:
+    """
+    Descarta (in place) las marcaciones que ya venían en un archivo anterior de la lista: mismo
+    trabajador, FECHA_HORA, punto y tipo de marcación (normalizados). Las repeticiones dentro de
+    un mismo archivo no se tocan (de esas se ocupa descartar_marcaciones_repetidas). Quita la
+    columna 'archivo' de cargar_varios_archivos; sin ella no hace nada. Retorna las filas descartadas.
+    """
+    if 'archivo' not in df_raw.columns:
+        return 0
+    archivos = df_raw.pop('archivo').to_numpy()
+    if df_raw.empty or archivos.min() == archivos.max():
+        return 0
+
+    claves = pd.DataFrame({
+        'id': df_raw['id_trabajador'].to_numpy(),
+        'fecha_hora': df_raw['FECHA_HORA'].to_numpy(dtype='datetime64[ns]').view(np.int64),
+        'punto': normalizar_texto(df_raw['porteria']).cat.codes.to_numpy(),
+        'tipo': normalizar_texto(df_raw['puntomarcacion'], REEMPLAZOS_TIPO_MARCACION).cat.codes.to_numpy(),
+    })
+    grupo = claves.groupby(list(claves.columns), sort=False).ngroup().to_numpy()
+    primer_archivo = pd.Series(archivos).groupby(grupo).transform('min').to_numpy()
+    descartar = df_raw.index[archivos > primer_archivo]
+    df_raw.drop(index=descartar, inplace=True)
+    return len(descartar)
+
+
+def calcular_cortes_horarios_ns() -> np.ndarray:
+    """
+    Horas del día (ns desde la medianoche, ordenadas) en que cambia alguna regla que se aplica
+    a cada marcación: HORA_CORTE_NOCTURNO, HORA_INICIO_T1, el rango de entradas nocturnas y,
+    por turno, la ventana de asignación de la entrada y la salida máxima aceptable. Los límites
+    inclusivos se corren 1 ns para que la marcación justo en el límite quede del lado de adentro.
+    """
+    cortes = [
+        0,
+        hora_a_ns(HORA_CORTE_NOCTURNO),
+        hora_a_ns(HORA_INICIO_T1),
+        hora_a_ns(HORA_INICIO_ENTRADA_NOCTURNA),
+        hora_a_ns(HORA_FIN_ENTRADA_NOCTURNA) + 1,
+    ]
+    for _, _, _, hora_inicio, hora_fin, _ in TABLA_TURNOS:
+        inicio = hora_a_ns(hora_inicio)
+        cortes.append(inicio - TOLERANCIA_ENTRADA_TEMPRANA_MINUTOS * NS_POR_MINUTO)
+        cortes.append(inicio + (TOLERANCIA_ASIGNACION_TARDE_MINUTOS + 5) * NS_POR_MINUTO + 1)
+        cortes.append(hora_a_ns(hora_fin) + MAX_EXCESO_SALIDA_HRS * NS_POR_HORA + 1)
+    return np.unique(np.mod(np.array(cortes, dtype=np.int64), NS_POR_DIA))
+
+
+def comparte_hora_con_otro_punto(codigos_id: np.ndarray, fechas_hora_ns: np.ndarray, codigos_punto: np.ndarray) -> np.ndarray:
+    """Marca las filas cuyo trabajador tiene otra fila con la misma hora exacta en otro punto (codigos_punto)."""
+    orden = np.lexsort((fechas_hora_ns, codigos_id))
+    mismo_grupo = (np.diff(codigos_id[orden]) == 0) & (np.diff(fechas_hora_ns[orden]) == 0)
+    inicio_grupo = np.flatnonzero(np.concatenate(([True], ~mismo_grupo)))
+    punto_ordenado = codigos_punto[orden]
+    grupo = np.cumsum(np.concatenate(([True], ~mismo_grupo))) - 1
+    distinto = (np.minimum.reduceat(punto_ordenado, inicio_grupo) != np.maximum.reduceat(punto_ordenado, inicio_grupo))[grupo]
+    resultado = np.empty(len(orden), dtype=bool)
+    resultado[orden] = distinto
+    return resultado
+
+
+def descartar_marcaciones_repetidas(df_raw: pd.DataFrame, ventana_segundos: int = VENTANA_REPETIDAS_SEGUNDOS) -> int:
+    """
+    Descarta (in place) las marcaciones repetidas en ráfaga: entradas o salidas del mismo
+    trabajador en el mismo punto normalizado, cada una a no más de `ventana_segundos` de la
+    anterior. De cada ráfaga queda la primera entrada o la última salida (la primera fila con
+    la hora máxima), que son las que puede elegir calcular_turnos. Una ráfaga nunca cruza un
+    corte de calcular_cortes_horarios_ns, así que las marcaciones descartadas no cambian la
+    FECHA_CLAVE_TURNO, el turno asignado ni la salida elegida. Tampoco cambian las porterías ni
+    el NOMBRE de la jornada (el de su primera marcación): ver los comentarios de `conservar`.
+    Retorna las filas descartadas.
+    """
+    if df_raw.empty or ventana_segundos <= 0:
+        return 0
+
+    tipo = normalizar_texto(df_raw['puntomarcacion'], REEMPLAZOS_TIPO_MARCACION)
+    es_entrada = tipo.eq('ent').to_numpy()
+    es_salida = tipo.eq('sal').to_numpy()
+    fechas_hora_ns = df_raw['FECHA_HORA'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    dia_ns, hora_ns = separar_dia_y_hora_ns(df_raw['FECHA_HORA'])
+    claves = (
+        pd.factorize(df_raw['id_trabajador'])[0],
+        tipo.cat.codes.to_numpy(),
+        normalizar_texto(df_raw['porteria']).cat.codes.to_numpy(),
+        dia_ns,
+        np.searchsorted(calcular_cortes_horarios_ns(), hora_ns, side='right'),
+    )
+
+    # Orden estable por clave y hora: las filas con la misma hora mantienen su orden original
+    orden = np.lexsort((fechas_hora_ns,) + claves[::-1])
+    hora_ordenada = fechas_hora_ns[orden]
+    continua = np.zeros(len(orden), dtype=bool)
+    continua[1:] = (hora_ordenada[1:] - hora_ordenada[:-1]) <= ventana_segundos * 10**9
+    for clave in claves:
+        clave_ordenada = clave[orden]
+        continua[1:] &= clave_ordenada[1:] == clave_ordenada[:-1]
+    inicio_rafaga = ~continua
+
+    # Salidas: la primera fila con la hora máxima de su ráfaga
+    rafaga = np.cumsum(inicio_rafaga) - 1
+    hora_maxima = np.maximum.reduceat(hora_ordenada, np.flatnonzero(inicio_rafaga))[rafaga]
+    es_maxima = hora_ordenada == hora_maxima
+    primera_maxima = es_maxima.copy()
+    primera_maxima[1:] &= ~(es_maxima[:-1] & continua[1:])
+
+    conservar = ~(es_entrada | es_salida)[orden] | np.where(es_entrada[orden], inicio_rafaga, primera_maxima)
+    # El lugar de la entrada y de la salida elegidas se toma de la primera fila del trabajador con
+    # esa misma hora: se conservan las filas que comparten hora con otro tipo o punto (entre filas
+    # con la misma hora y el mismo punto, la que queda es la primera en el orden original)
+    conservar |= comparte_hora_con_otro_punto(claves[0], fechas_hora_ns, claves[1] * (claves[2].max() + 2) + claves[2] + 1)[orden]
+    # El NOMBRE de la jornada es el de su primera marcación, que puede ser una salida descartada.
+    # Si todas las filas del trabajador traen el mismo nombre da igual cuál quede primera; si trae
+    # más de uno (por ejemplo, archivos con distinta ortografía), sus marcaciones no se descartan
+    codigos_nombre = pd.factorize(df_raw['nombre'], use_na_sentinel=False)[0]
+    varios_nombres = pd.Series(codigos_nombre).groupby(claves[0]).transform('nunique').to_numpy() > 1
+    conservar |= varios_nombres[orden]
+    descartar = df_raw.index[orden[~conservar]]
+    df_raw.drop(index=descartar, inplace=True)
+    return len(descartar)
+
+
+def agregar_fecha_clave(df_raw: pd.DataFrame):
+    """
+    Agrega (in place) PORTERIA_NORMALIZADA, TIPO_MARCACION, Entrada_Nocturna_Dia_Anterior y FECHA_CLAVE_TURNO.
+    """
+    # Normalización y Tipo de Marcación (sobre los valores distintos; columnas categóricas)
+    df_raw['PORTERIA_NORMALIZADA'] = normalizar_texto(df_raw['porteria'])
+    df_raw['TIPO_MARCACION'] = normalizar_texto(df_raw['puntomarcacion'], REEMPLAZOS_TIPO_MARCACION)
+
+    # --- ENTRADAS NOCTURNAS DEL DÍA ANTERIOR Y FECHA CLAVE DEL TURNO ---
+    # Una entrada nocturna (21:00 a 23:59) desplaza al día anterior las entradas de madrugada del día siguiente.
+    df_raw['Entrada_Nocturna_Dia_Anterior'] = marcar_entrada_nocturna_dia_anterior(df_raw)
+    df_raw['FECHA_CLAVE_TURNO'] = asignar_fecha_clave_turno(df_raw)
+
+
+def filtrar_marcaciones_validas(df_raw: pd.DataFrame) -> pd.DataFrame:
+    """
+    Filtrado final del dataset crudo: entradas y salidas en puntos de marcación conocidos.
+    Se descartan 'fecha' y 'hora' (ya contenidas en FECHA_HORA) y el índice queda 0..n-1.
+    """
+    conservar = (
+        (df_raw['PORTERIA_NORMALIZADA'].isin(LUGARES_COMBINADOS_NORMALIZADOS)) & 
+        (df_raw['TIPO_MARCACION'].isin(['ent', 'sal']))
+    )
+    return df_raw.loc[conservar, df_raw.columns.difference(['fecha', 'hora'], sort=False)].reset_index(drop=True)
+
+
+def preprocesar_marcaciones(archivo, tamano_bloque: int = TAMANO_BLOQUE_LECTURA, rendimiento: Rendimiento = None,
+                            procesos_lectura: int = MAX_PROCESOS_LECTURA):
+    """
+    Etapa 1: lectura, FECHA_HORA, normalización, FECHA_CLAVE_TURNO y filtrado final del dataset crudo.
+    `archivo` es una ruta o buffer de un .xlsx, .csv o .parquet, o una lista de ellos: se leen en
+    paralelo (cargar_varios_archivos) y se unen descartando las marcaciones repetidas entre archivos.
+    Retorna (df_raw_filtrado, resumen); resumen incluye 'registros_leidos', 'registros_fecha_invalida',
+    'registros_hora_invalida', 'registros_duplicados_archivos' y 'registros_repetidos'
+    (descartar_marcaciones_repetidas).
+    Si se entrega `rendimiento`, registra las etapas lectura, conversion_hora, duplicados (solo con
+    una lista), repetidas y fecha_clave. La lectura informa su avance por bloque de filas (.xlsx)
+    o por archivo; las demás etapas son vectorizadas y solo informan al empezar y al terminar,
+    así que una cancelación (Rendimiento.al_avanzar) se atiende entre bloques o entre etapas.
+    """
+    rendimiento = rendimiento or Rendimiento()
+    varios_archivos = isinstance(archivo, (list, tuple))
+    with rendimiento.etapa('lectura') as medicion:
+        if varios_archivos:
+            df_raw = cargar_varios_archivos(archivo, tamano_bloque, procesos_lectura, rendimiento.avanzar)
+        else:
+            df_raw = cargar_marcaciones(archivo, tamano_bloque, rendimiento.avanzar)
+        medicion['filas_salida'] = len(df_raw)
+    resumen = {
+        'registros_leidos': len(df_raw), 'registros_fecha_invalida': 0, 'registros_hora_invalida': 0,
+        'registros_duplicados_archivos': 0, 'registros_repetidos': 0,
+    }
+    if df_raw.empty:
+        return df_raw.drop(columns=['archivo'], errors='ignore'), resumen
+
+    with rendimiento.etapa('conversion_hora', len(df_raw)) as medicion:
+        resumen['registros_fecha_invalida'], resumen['registros_hora_invalida'] = agregar_fecha_hora(df_raw)
+        medicion['filas_salida'] = len(df_raw)
+    if varios_archivos:
+        # Antes de FECHA_CLAVE_TURNO: una marcación repetida en dos archivos no debe abrir otro turno
+        with rendimiento.etapa('duplicados', len(df_raw)) as medicion:
+            resumen['registros_duplicados_archivos'] = descartar_duplicados_entre_archivos(df_raw)
+            medicion['filas_salida'] = len(df_raw)
+    with rendimiento.etapa('repetidas', len(df_raw)) as medicion:
+        resumen['registros_repetidos'] = descartar_marcaciones_repetidas(df_raw)
+        medicion['filas_salida'] = len(df_raw)
+    with rendimiento.etapa('fecha_clave', len(df_raw)) as medicion:
+        agregar_fecha_clave(df_raw)
+        df_raw_filtrado = filtrar_marcaciones_validas(df_raw)
+        medicion['filas_salida'] = len(df_raw_filtrado)
+    return df_raw_filtrado, resumen
@@ -0,0 +1,47 @@
+"""
+Punto de entrada único del cálculo, sin interfaz: archivo de marcaciones -> reporte de horas extra.
+"""
+from dataclasses import dataclass
+
+import pandas as pd
+
+from .incremental import calcular_reporte_incremental
+from .instrumentacion import Rendimiento
+from .lectura import MAX_PROCESOS_LECTURA, TAMANO_BLOQUE_LECTURA
+from .preprocesamiento import preprocesar_marcaciones
+from .reglas import MOTOR_CALCULO, PROCESOS_CALCULO
+from .reporte import calcular_reporte
+
+
+@dataclass
+class Configuracion:
+    """
+    Opciones de ejecución del proceso. No cambian el resultado, solo cómo se calcula.
+    """
+    motor: str = MOTOR_CALCULO # "vectorizado" o "iterativo"
+    procesos: int = PROCESOS_CALCULO # 1 = en serie
+    tamano_bloque: int = TAMANO_BLOQUE_LECTURA # Filas por bloque al leer el Excel
+    procesos_lectura: int = MAX_PROCESOS_LECTURA # Archivos que se leen a la vez cuando son varios
+    almacen: str = None # Archivo SQLite del modo incremental (None = recalcular todas las jornadas)
+
+
+def procesar_marcaciones(archivo, config: Configuracion = None, rendimiento: Rendimiento = None) -> pd.DataFrame:
+    """
+    Lee el archivo de marcaciones (ruta o buffer de un .xlsx, .csv o .parquet, o una lista de ellos que se unen
+    en un solo reporte) y retorna el reporte de horas extra ya filtrado por primer/último día y
+    ordenado, como se muestra en la interfaz.
+    Retorna un DataFrame vacío si no quedan registros o jornadas válidas.
+
+    Lanza ErrorColumnasRequeridas si faltan columnas, y KeyError si no existe la hoja 'data'
+    ni 'BaseDatos Modificada'. Si se entrega `rendimiento`, acumula en él las mediciones de cada etapa.
+    """
+    config = config or Configuracion()
+    df_raw_filtrado, _ = preprocesar_marcaciones(archivo, config.tamano_bloque, rendimiento, config.procesos_lectura)
+    if df_raw_filtrado.empty:
+        return pd.DataFrame()
+
+    if config.almacen:
+        df_resultado_filtrado, _ = calcular_reporte_incremental(df_raw_filtrado, config.almacen, config.motor, rendimiento)
+    else:
+        df_resultado_filtrado, _ = calcular_reporte(df_raw_filtrado, config.procesos, config.motor, rendimiento)
+    return df_resultado_filtrado
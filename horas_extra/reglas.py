@@ -0,0 +1,298 @@
+"""
+Reglas del cálculo: trabajadores, turnos, puntos de marcación, tolerancias y opciones del motor.
+
+Las reglas se pueden reemplazar con un archivo de configuración externo (JSON, o YAML con
+PyYAML instalado) indicado en la variable de entorno HORAS_EXTRA_REGLAS. Sus claves son los
+nombres de las constantes de CLAVES_CONFIG_REGLAS más "version" (VERSION_CONFIG_REGLAS); las
+horas se escriben 'HH:MM:SS'. Lo que el archivo no define conserva el valor de este módulo.
+El archivo se lee al importar el paquete; recargar_reglas_si_cambiaron() aplica un cambio del
+archivo sin reiniciar el proceso (la interfaz lo revisa en cada rerun).
+"""
+from datetime import datetime
+import hashlib
+import importlib
+import json
+import os
+from pathlib import Path
+import sys
+
+# --- CONFIGURACIÓN EXTERNA ---
+
+RUTA_CONFIG_REGLAS = os.environ.get("HORAS_EXTRA_REGLAS") # None = reglas de este módulo
+VERSION_CONFIG_REGLAS = 1
+CLAVES_CONFIG_REGLAS = [
+    'CODIGOS_TRABAJADORES_FILTRO', 'TURNOS', 'LUGARES_PUESTO_TRABAJO', 'LUGARES_PORTERIA',
+    'PATRONES_HORARIO', 'HORARIO_TRABAJADORES', 'MAX_EXCESO_SALIDA_HRS', 'HORA_CORTE_NOCTURNO',
+    'HORA_INICIO_T1', 'HORA_INICIO_ENTRADA_NOCTURNA', 'HORA_FIN_ENTRADA_NOCTURNA',
+    'TOLERANCIA_LLEGADA_TARDE_MINUTOS', 'TOLERANCIA_ENTRADA_TEMPRANA_MINUTOS', 'TOLERANCIA_ASIGNACION_TARDE_MINUTOS',
+    'UMBRAL_PAGO_ENTRADA_TEMPRANA_MINUTOS', 'MIN_DURACION_ACEPTABLE_REAL_SALIDA_HRS', 'UMBRAL_HORAS_EXTRA_RESALTAR',
+    'VENTANA_REPETIDAS_SEGUNDOS',
+]
+
+
+def cargar_config_reglas(ruta) -> dict:
+    """
+    Lee un archivo de reglas (.json, .yaml o .yml) y valida su versión y sus claves.
+    Lanza ValueError si el archivo no corresponde a VERSION_CONFIG_REGLAS o trae claves desconocidas.
+    """
+    ruta = Path(ruta)
+    with open(ruta, encoding='utf-8') as archivo:
+        if ruta.suffix.lower() in ('.yaml', '.yml'):
+            import yaml # Solo se necesita con archivos YAML (pip install pyyaml)
+            config = yaml.safe_load(archivo) or {}
+        else:
+            config = json.load(archivo)
+    if config.get('version') != VERSION_CONFIG_REGLAS:
+        raise ValueError(f"{ruta}: se esperaba \"version\": {VERSION_CONFIG_REGLAS} y se encontró {config.get('version')!r}")
+    desconocidas = sorted(set(config) - set(CLAVES_CONFIG_REGLAS) - {'version'})
+    if desconocidas:
+        raise ValueError(f"{ruta}: claves de reglas desconocidas: {desconocidas}")
+    return config
+
+
+def firma_config_reglas(ruta):
+    """(ruta absoluta, fecha de modificación en ns, tamaño) del archivo de reglas, o None sin archivo."""
+    if not ruta:
+        return None
+    estado = os.stat(ruta)
+    return (str(Path(ruta).resolve()), estado.st_mtime_ns, estado.st_size)
+
+
+def leer_hora(texto: str):
+    """'HH:MM:SS' -> datetime.time"""
+    return datetime.strptime(texto, "%H:%M:%S").time()
+
+
+# La firma se toma antes de leer: si el archivo cambia mientras se lee, la siguiente revisión lo recarga
+FIRMA_CONFIG_REGLAS = firma_config_reglas(RUTA_CONFIG_REGLAS) # Del archivo con que se compilaron estas reglas
+CONFIG_REGLAS = cargar_config_reglas(RUTA_CONFIG_REGLAS) if RUTA_CONFIG_REGLAS else {}
+
+# --- CÓDIGOS DE TRABAJADORES PERMITIDOS (ACTUALIZADO) ---
+# Se filtra el DataFrame de entrada para incluir SOLAMENTE los registros con estos ID.
+CODIGOS_TRABAJADORES_FILTRO = CONFIG_REGLAS.get('CODIGOS_TRABAJADORES_FILTRO', [
+    81169, 82911, 81515, 81744, 82728, 83617, 81594, 81215, 79114, 80531,
+    71329, 82383, 79143, 80796, 80795, 79830, 80584, 81131, 79110, 80530,
+    82236, 82645, 80532, 71332, 82441, 79030, 81020, 82724, 82406, 81953,
+    81164, 81024, 81328, 81957, 80577, 14042, 82803, 80233, 83521, 82226,
+    71337381, 82631, 82725, 83309, 81947, 82385, 80765, 82642, 1128268115,
+    80526, 82979, 81240, 81873, 83320, 82617, 82243, 81948, 82954, 83858, 
+])
+
+# --- 1. Definición de los Turnos ---
+
+TURNOS = CONFIG_REGLAS.get('TURNOS', {
+    "LV": { # Lunes a Viernes (0-4)
+        "Turno 1 LV": {"inicio": "05:40:00", "fin": "13:40:00", "duracion_hrs": 8},
+        "Turno 2 LV": {"inicio": "13:40:00", "fin": "21:40:00", "duracion_hrs": 8},
+        # Turno nocturno: Inicia un día y termina al día siguiente
+        "Turno 3 LV": {"inicio": "21:40:00", "fin": "05:40:00", "duracion_hrs": 8, "nocturno": True},
+        
+    },
+    "SAB": { # Sábado (5)
+        "Turno 1 SAB": {"inicio": "05:40:00", "fin": "11:40:00", "duracion_hrs": 6},
+        "Turno 2 SAB": {"inicio": "11:40:00", "fin": "17:40:00", "duracion_hrs": 6},
+        "Turno 3 SAB": {"inicio": "21:40:00", "fin": "05:40:00", "duracion_hrs": 8, "nocturno": True},
+    },
+    "DOM": { # Domingo (6)
+        "Turno 1 DOM": {"inicio": "05:40:00", "fin": "11:40:00", "duracion_hrs": 6},
+        "Turno 2 DOM": {"inicio": "11:40:00", "fin": "17:40:00", "duracion_hrs": 6},
+        # Turno nocturno de Domingo: Ligeramente más tarde que los días de semana
+        "Turno 3 DOM": {"inicio": "22:40:00", "fin": "05:40:00", "duracion_hrs": 7, "nocturno": True},
+    }
+})
+
+# --- 1.1 Horarios por trabajador ---
+# Patrón -> {"turnos": [nombres de TURNOS]} (fijo) o {"rotacion": [[turnos del paso 1], [paso 2], ...],
+# "inicio": "AAAA-MM-DD" (primer día del paso 1), "dias_por_paso": 7} (rotativo). Un trabajador con
+# patrón solo se asigna a los turnos de su paso vigente en el día del turno; los demás, a cualquiera.
+PATRONES_HORARIO = CONFIG_REGLAS.get('PATRONES_HORARIO', {})
+HORARIO_TRABAJADORES = { # ID del trabajador -> patrón (las claves de un JSON llegan como texto)
+    int(id_trabajador): patron for id_trabajador, patron in CONFIG_REGLAS.get('HORARIO_TRABAJADORES', {}).items()
+}
+
+# --- 2. Configuración de Puntos de Marcación ---
+
+# PRIORITY 1: Puestos de Trabajo
+LUGARES_PUESTO_TRABAJO = CONFIG_REGLAS.get('LUGARES_PUESTO_TRABAJO', [
+    "NOEL_MDE_CONTROL_BUHLER_ENT", "NOEL_MDE_CONTROL_BUHLER_SAL",
+    "NOEL_MDE_CONTROL_BUHLER_SAL", "NOEL_MDE_CONTROL_BUHLER_ENT",
+    "NOEL_MDE_ESENCIAS_1_ENT", "NOEL_MDE_ESENCIAS_1_SAL",
+    "NOEL_MDE_ESENCIAS_1_SAL", "NOEL_MDE_ESENCIAS_1_ENT",
+    "NOEL_MDE_ESENCIAS_2_SAL", "NOEL_MDE_ESENCIAS_2_ENT",
+    "NOEL_MDE_ING_MENORES_1_ENT", "NOEL_MDE_ING_MENORES_1_SAL",
+    "NOEL_MDE_ING_MENORES_1_SAL", "NOEL_MDE_ING_MENORES_1_ENT",
+    "NOEL_MDE_ING_MENORES_2_ENT", "NOEL_MDE_ING_MENORES_2_SAL",
+    "NOEL_MDE_ING_MENORES_2_SAL", "NOEL_MDE_ING_MENORES_2_ENT",
+    "NOEL_MDE_ING_MEN_ALERGENOS_ENT", "NOEL_MDE_ING_MEN_ALERGENOS_SAL",
+    "NOEL_MDE_ING_MEN_ALERGENOS_SAL", "NOEL_MDE_ING_MEN_ALERGENOS_ENT",
+    "NOEL_MDE_ING_MEN_CREMAS_ENT", "NOEL_MDE_ING_MEN_CREMAS_SAL",
+    "NOEL_MDE_ING_MEN_CREMAS_SAL", "NOEL_MDE_ING_MEN_CREMAS_ENT",
+    "NOEL_MDE_MOLINETE_BODEGA_EXT_SAL", "NOEL_MDE_MOLINETE_BODEGA_EXT_ENT",
+    "NOEL_MDE_MR_ASPIRACION_ENT", "NOEL_MDE_MR_ASPIRACION_SAL",
+    "NOEL_MDE_MR_HORNO_1-3_ENT", "NOEL_MDE_MR_HORNO_1-3_SAL",
+    "NOEL_MDE_MR_HORNO_1-3_SAL", "NOEL_MDE_MR_HORNO_1-3_ENT",
+    "NOEL_MDE_MR_HORNO_11_ENT", "NOEL_MDE_MR_HORNO_11_SAL",
+    "NOEL_MDE_MR_HORNO_11_SAL", "NOEL_MDE_MR_HORNO_11_ENT",
+    "NOEL_MDE_MR_HORNO_18_ENT", "NOEL_MDE_MR_HORNO_18_SAL",
+    "NOEL_MDE_MR_HORNO_18_SAL", "NOEL_MDE_MR_HORNO_18_ENT",
+    "NOEL_MDE_MR_HORNO_2-12_ENT", "NOEL_MDE_MR_HORNO_2-12_SAL",
+    "NOEL_MDE_MR_HORNO_2-12_SAL", "NOEL_MDE_MR_HORNO_2-12_ENT",
+    "NOEL_MDE_MR_HORNO_2-4-5_SAL", "NOEL_MDE_MR_HORNO_2-4-5_ENT",
+    "NOEL_MDE_MR_HORNO_4-5_ENT", "NOEL_MDE_MR_HORNO_4-5_SAL",
+    "NOEL_MDE_MR_HORNO_4-5_SAL", "NOEL_MDE_MR_HORNO_4-5_ENT",
+    "NOEL_MDE_MR_HORNO_6-8-9_ENT", "NOEL_MDE_MR_HORNO_6-8-9_SAL",
+    "NOEL_MDE_MR_HORNO_6-8-9_SAL", "NOEL_MDE_MR_HORNO_6-8-9_ENT",
+    "NOEL_MDE_MR_HORNO_6-8-9_SAL_2", "NOEL_MDE_MR_HORNO_6-8-9_ENT_2",
+    "NOEL_MDE_MR_HORNO_7-10_ENT", "NOEL_MDE_MR_HORNO_7-10_SAL",
+    "NOEL_MDE_MR_HORNO_7-10_SAL", "NOEL_MDE_MR_HORNO_7-10_ENT",
+    "NOEL_MDE_MR_HORNOS_ENT", "NOEL_MDE_MR_HORNOS_SAL",
+    "NOEL_MDE_MR_HORNOS_SAL", "NOEL_MDE_MR_HORNOS_ENT",
+    "NOEL_MDE_MR_MEZCLAS_ENT", "NOEL_MDE_MR_MEZCLAS_SAL",
+    "NOEL_MDE_MR_MEZCLAS_SAL", "NOEL_MDE_MR_MEZCLAS_ENT",
+    "NOEL_MDE_MR_SERVICIOS_2_ENT", "NOEL_MDE_MR_SERVICIOS_2_SAL",
+    "NOEL_MDE_MR_SERVICIOS_2_SAL", "NOEL_MDE_MR_SERVICIOS_2_ENT",
+    "NOEL_MDE_MR_TUNEL_VIENTO_1_ENT", "NOEL_MDE_MR_TUNEL_VIENTO_1_SAL",
+    "NOEL_MDE_MR_TUNEL_VIENTO_2_ENT", "NOEL_MDE_MR_TUNEL_VIENTO_2_SAL",
+    "NOEL_MDE_MR_WAFER_RCH_CREMAS_ENT", "NOEL_MDE_MR_WAFER_RCH_CREMAS_SAL",
+    "NOEL_MDE_MR_WAFER_RCH_CREMAS_SAL", "NOEL_MDE_MR_WAFER_RCH_CREMAS_ENT",
+    "NOEL_MDE_OFIC_PRODUCCION_ENT", "NOEL_MDE_OFIC_PRODUCCION_SAL",
+    "NOEL_MDE_OFIC_PRODUCCION_SAL", "NOEL_MDE_OFIC_PRODUCCION_ENT",
+    "NOEL_MDE_PRINCIPAL_ENT", "NOEL_MDE_PRINCIPAL_SAL",
+    "NOEL_MDE_PRINCIPAL_SAL", "NOEL_MDE_PRINCIPAL_ENT",
+    "NOEL_MDE_RECURSOS_HUMANOS_ENT", "NOEL_MDE_RECURSOS_HUMANOS_SAL",
+    "NOEL_MDE_RECURSOS_HUMANOS_SAL", "NOEL_MDE_RECURSOS_HUMANOS_ENT",
+    "NOEL_MDE_TORNIQUETE_PATIO_ENT", "NOEL_MDE_TORNIQUETE_PATIO_SAL",
+    "NOEL_MDE_TORNIQUETE_PATIO_SAL", "NOEL_MDE_TORNIQUETE_PATIO_ENT",
+    "NOEL_MDE_TORNIQUETE_SORTER_ENT", "NOEL_MDE_TORNIQUETE_SORTER_SAL",
+    "NOEL_MDE_TORNIQUETE_SORTER_SAL", "NOEL_MDE_TORNIQUETE_SORTER_ENT",
+    
+])
+
+# PRIORITY 2: Porterías
+LUGARES_PORTERIA = CONFIG_REGLAS.get('LUGARES_PORTERIA', [
+    "NOEL_MDE_PORT_2_PEATONAL_1_ENT",
+    "NOEL_MDE_TORN_PORTERIA_3_SAL",
+    "NOEL_MDE_VEHICULAR_PORT_1_ENT",
+    "NOEL_MDE_PORT_2_PEATONAL_1_SAL",
+    "NOEL_MDE_PORT_2_PEATONAL_2_ENT",
+    "NOEL_MDE_VEHICULAR_PORT_1_SAL",
+    "NOEL_MDE_TORN_PORTERIA_3_ENT",
+    "NOEL_MDE_PORT_2_PEATONAL_2_SAL",
+    "NOEL_MDE_PORT_2_PEATONAL_3_SAL",
+    "NOEL_MDE_PORT_2_PEATONAL_3_ENT",
+    "NOEL_MDE_PORT_1_PEATONAL_1_ENT"
+])
+
+# Sin duplicados (LUGARES_PUESTO_TRABAJO repite varios puntos), en el orden original
+LUGARES_PUESTO_TRABAJO_NORMALIZADOS = list(dict.fromkeys(lugar.strip().lower() for lugar in LUGARES_PUESTO_TRABAJO))
+LUGARES_PORTERIA_NORMALIZADOS = list(dict.fromkeys(lugar.strip().lower() for lugar in LUGARES_PORTERIA))
+LUGARES_COMBINADOS_NORMALIZADOS = LUGARES_PUESTO_TRABAJO_NORMALIZADOS + LUGARES_PORTERIA_NORMALIZADOS
+
+
+MAX_EXCESO_SALIDA_HRS = CONFIG_REGLAS.get('MAX_EXCESO_SALIDA_HRS', 3)
+HORA_CORTE_NOCTURNO = leer_hora(CONFIG_REGLAS.get('HORA_CORTE_NOCTURNO', "08:00:00")) # Para Salidas y agrupamiento
+# 05:40:00 - Para Entradas y agrupamiento (inicio del Turno 1 LV, salvo que el archivo de reglas lo indique)
+HORA_INICIO_T1 = leer_hora(CONFIG_REGLAS.get('HORA_INICIO_T1') or TURNOS['LV']['Turno 1 LV']['inicio'])
+# Rango de entradas nocturnas que desplazan al día anterior las entradas de madrugada del día siguiente
+HORA_INICIO_ENTRADA_NOCTURNA = leer_hora(CONFIG_REGLAS.get('HORA_INICIO_ENTRADA_NOCTURNA', "21:00:00"))
+HORA_FIN_ENTRADA_NOCTURNA = leer_hora(CONFIG_REGLAS.get('HORA_FIN_ENTRADA_NOCTURNA', "23:59:59"))
+
+# --- CONSTANTES DE TOLERANCIA ---
+TOLERANCIA_LLEGADA_TARDE_MINUTOS = CONFIG_REGLAS.get('TOLERANCIA_LLEGADA_TARDE_MINUTOS', 40)
+TOLERANCIA_ENTRADA_TEMPRANA_MINUTOS = CONFIG_REGLAS.get('TOLERANCIA_ENTRADA_TEMPRANA_MINUTOS', 180) # 3 horas de adelanto
+TOLERANCIA_ASIGNACION_TARDE_MINUTOS = CONFIG_REGLAS.get('TOLERANCIA_ASIGNACION_TARDE_MINUTOS', 180) # 3 horas de margen para la asignación
+UMBRAL_PAGO_ENTRADA_TEMPRANA_MINUTOS = CONFIG_REGLAS.get('UMBRAL_PAGO_ENTRADA_TEMPRANA_MINUTOS', 30)
+MIN_DURACION_ACEPTABLE_REAL_SALIDA_HRS = CONFIG_REGLAS.get('MIN_DURACION_ACEPTABLE_REAL_SALIDA_HRS', 1)
+UMBRAL_HORAS_EXTRA_RESALTAR = CONFIG_REGLAS.get('UMBRAL_HORAS_EXTRA_RESALTAR', 30 / 60)
+# Marcaciones repetidas en ráfaga (mismo trabajador, tipo y punto, separadas por hasta esta
+# cantidad de segundos) se unifican antes del cálculo; 0 = no unificar
+VENTANA_REPETIDAS_SEGUNDOS = CONFIG_REGLAS.get('VENTANA_REPETIDAS_SEGUNDOS', 60)
+
+# --- MOTOR DE CÁLCULO ---
+# "vectorizado": opera sobre columnas completas con NumPy (por defecto).
+# "iterativo": recorre cada grupo (trabajador, día) con el bucle original; útil para comparar resultados.
+MOTOR_CALCULO = "vectorizado"
+
+# --- EJECUCIÓN PARALELA ---
+# Procesos para calcular turnos y aplicar el filtro de días extremos (1 = en serie).
+# Las marcaciones se reparten por trabajador; el resultado es idéntico al cálculo en serie.
+PROCESOS_CALCULO = 1
+MIN_REGISTROS_PARALELO = 100000 # Con menos marcaciones no compensa repartir el trabajo
+
+
+def calcular_hash_reglas() -> str:
+    """
+    Huella de las reglas que determinan el resultado: turnos, horarios por trabajador, puntos de
+    marcación, trabajadores filtrados y tolerancias (ya con el archivo de reglas aplicado).
+    Si cambia alguna, los resultados en caché dejan de usarse.
+    """
+    reglas = {
+        'TURNOS': TURNOS,
+        'LUGARES_PUESTO_TRABAJO': LUGARES_PUESTO_TRABAJO,
+        'LUGARES_PORTERIA': LUGARES_PORTERIA,
+        'CODIGOS_TRABAJADORES_FILTRO': CODIGOS_TRABAJADORES_FILTRO,
+        'MAX_EXCESO_SALIDA_HRS': MAX_EXCESO_SALIDA_HRS,
+        'HORA_CORTE_NOCTURNO': HORA_CORTE_NOCTURNO,
+        'HORA_INICIO_T1': HORA_INICIO_T1,
+        'HORA_INICIO_ENTRADA_NOCTURNA': HORA_INICIO_ENTRADA_NOCTURNA,
+        'HORA_FIN_ENTRADA_NOCTURNA': HORA_FIN_ENTRADA_NOCTURNA,
+        'TOLERANCIA_LLEGADA_TARDE_MINUTOS': TOLERANCIA_LLEGADA_TARDE_MINUTOS,
+        'TOLERANCIA_ENTRADA_TEMPRANA_MINUTOS': TOLERANCIA_ENTRADA_TEMPRANA_MINUTOS,
+        'TOLERANCIA_ASIGNACION_TARDE_MINUTOS': TOLERANCIA_ASIGNACION_TARDE_MINUTOS,
+        'UMBRAL_PAGO_ENTRADA_TEMPRANA_MINUTOS': UMBRAL_PAGO_ENTRADA_TEMPRANA_MINUTOS,
+        'MIN_DURACION_ACEPTABLE_REAL_SALIDA_HRS': MIN_DURACION_ACEPTABLE_REAL_SALIDA_HRS,
+        'UMBRAL_HORAS_EXTRA_RESALTAR': UMBRAL_HORAS_EXTRA_RESALTAR,
+        'VENTANA_REPETIDAS_SEGUNDOS': VENTANA_REPETIDAS_SEGUNDOS,
+    }
+    # Sin horarios por trabajador la huella no cambia: siguen valiendo los almacenes ya calculados
+    if PATRONES_HORARIO or HORARIO_TRABAJADORES:
+        reglas.update(PATRONES_HORARIO=PATRONES_HORARIO, HORARIO_TRABAJADORES=HORARIO_TRABAJADORES)
+    return hashlib.sha256(json.dumps(reglas, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+# --- RECARGA DEL ARCHIVO DE REGLAS ---
+
+# Módulos del paquete que copian reglas (o valores compilados con ellas) al importarse, cada uno
+# después de los que importa. cache, instrumentacion y trabajos no dependen de las reglas y no
+# se recargan: la caché y el gestor de trabajos de la interfaz sobreviven a la recarga.
+MODULOS_CON_REGLAS = [
+    'reglas', 'turnos', 'lectura', 'sintetico', 'calculo', 'preprocesamiento', 'paralelo', 'resumenes',
+    'reporte', 'explorador', 'exportacion', 'incremental', 'historico', 'ventanas', 'proceso', 'benchmark', 'cli',
+]
+
+
+def reglas_cambiaron() -> bool:
+    """
+    Si el archivo de reglas ya no es el que se cargó (FIRMA_CONFIG_REGLAS). Si no se puede leer
+    (por ejemplo, mientras un editor lo reemplaza) se siguen usando las reglas cargadas.
+    """
+    try:
+        return firma_config_reglas(RUTA_CONFIG_REGLAS) != FIRMA_CONFIG_REGLAS
+    except OSError:
+        return False
+
+
+def recargar_reglas_si_cambiaron() -> bool:
+    """
+    Si el archivo de reglas cambió, vuelve a importar MODULOS_CON_REGLAS (los ya importados) y el
+    paquete, y vacía las lru_cache de lo compilado con las reglas anteriores (calendario de
+    turnos, clases de punto); calcular_hash_reglas() cambia con ellas. Retorna True si recargó.
+    El archivo nuevo se valida antes (cargar_config_reglas): si no es válido lanza ValueError y
+    se siguen usando las reglas anteriores. No debe llamarse con cálculos en curso, porque sus
+    funciones verían las reglas nuevas a mitad del cálculo (ver GestorTrabajos.ejecutar_si_inactivo).
+    """
+    if not reglas_cambiaron():
+        return False
+    if RUTA_CONFIG_REGLAS:
+        cargar_config_reglas(RUTA_CONFIG_REGLAS)
+    paquete = __name__.rpartition('.')[0]
+    for nombre in MODULOS_CON_REGLAS:
+        modulo = sys.modules.get(f"{paquete}.{nombre}")
+        if modulo is None:
+            continue
+        for valor in list(vars(modulo).values()):
+            if callable(getattr(valor, 'cache_clear', None)):
+                valor.cache_clear()
+        importlib.reload(modulo)
+    importlib.reload(sys.modules[paquete])
+    return True
@@ -0,0 +1,248 @@
+"""
+Etapas 2 y 3 del proceso: cálculo del reporte y archivo Excel con formato condicional.
+"""
+import io
+
+import numpy as np
+import pandas as pd
+
+from .calculo import aplicar_filtro_primer_ultimo_dia, calcular_turnos, horas_exactas
+from .instrumentacion import Rendimiento
+from .paralelo import calcular_turnos_paralelo
+from .reglas import (
+    LUGARES_PORTERIA_NORMALIZADOS,
+    LUGARES_PUESTO_TRABAJO_NORMALIZADOS,
+    MIN_REGISTROS_PARALELO,
+    PROCESOS_CALCULO,
+    TOLERANCIA_LLEGADA_TARDE_MINUTOS,
+    UMBRAL_HORAS_EXTRA_RESALTAR,
+)
+from .resumenes import calcular_resumenes
+
+# --- 6. Etapas del proceso: cálculo y reporte ---
+
+COLUMNAS_REPORTE = [
+    'NOMBRE', 'ID_TRABAJADOR', 'FECHA', 'Dia_Semana', 'TURNO', 'Tipo_Marcacion_Priorizada', 
+    'Inicio_Turno_Programado', 'Fin_Turno_Programado', 'Duracion_Turno_Programado_Hrs',
+    'ENTRADA_REAL', 'PORTERIA_ENTRADA', 'SALIDA_REAL', 'PORTERIA_SALIDA',
+    'Horas_Trabajadas_Netas', 'Horas_Extra', 'Horas', 'Minutos', 
+    'Estado_Llegada', 'Estado_Calculo'
+]
+# Resaltados del Excel como columnas (para los formatos sin colores, ver calcular_resaltados)
+COLUMNAS_RESALTADO = ['Resaltado_Asumido', 'Resaltado_Sin_Entrada', 'Resaltado_Llegada_Tarde', 'Resaltado_Horas_Extra']
+# Columnas datetime64 del resultado que se muestran como texto ('N/A' si no hay dato)
+FORMATOS_FECHA_HORA = {
+    'Inicio_Turno_Programado': "%H:%M:%S",
+    'Fin_Turno_Programado': "%H:%M:%S",
+    'ENTRADA_REAL': "%Y-%m-%d %H:%M:%S",
+    'SALIDA_REAL': "%Y-%m-%d %H:%M:%S",
+}
+COLUMNAS_HORAS = ['Horas_Trabajadas_Netas', 'Horas_Extra'] # float32 en el resultado
+
+MUESTRA_ANCHO_COLUMNAS = 2000 # Filas usadas para estimar el ancho de las columnas del Excel
+BLOQUES_AVANCE_CALCULO = 20 # Bloques de trabajadores cuando se informa el avance del cálculo
+
+
+def calcular_turnos_con_avance(df_raw_filtrado: pd.DataFrame, motor: str, rendimiento: Rendimiento) -> pd.DataFrame:
+    """
+    calcular_turnos con las reglas vigentes. Si `rendimiento` informa avance, calcula por bloques
+    de trabajadores consecutivos (en orden de ID) y después de cada bloque informa cuántos
+    trabajadores van procesados. Cada jornada depende solo de su trabajador y el motor entrega
+    las filas en orden de ID, así que el resultado es el mismo que en una sola llamada.
+    """
+    def calcular(df):
+        return calcular_turnos(
+            df, 
+            LUGARES_PUESTO_TRABAJO_NORMALIZADOS, 
+            LUGARES_PORTERIA_NORMALIZADOS, 
+            TOLERANCIA_LLEGADA_TARDE_MINUTOS,
+            motor
+        )
+
+    if rendimiento.al_avanzar is None:
+        return calcular(df_raw_filtrado)
+
+    codigos_id, ids = pd.factorize(df_raw_filtrado['id_trabajador'], sort=True)
+    limites = np.linspace(0, len(ids), min(BLOQUES_AVANCE_CALCULO, len(ids)) + 1).astype(np.int64).tolist()
+    partes = []
+    for inicio, fin in zip(limites[:-1], limites[1:]):
+        parte = calcular(df_raw_filtrado[(codigos_id >= inicio) & (codigos_id < fin)])
+        if not parte.empty:
+            partes.append(parte)
+        rendimiento.avanzar(fin / len(ids), f"{fin} de {len(ids)} trabajadores")
+    return pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
+
+
+def calcular_reporte(df_raw_filtrado: pd.DataFrame, procesos: int = None, motor: str = None,
+                     rendimiento: Rendimiento = None):
+    """
+    Etapa 2: cálculo de turnos, filtro de primer/último día y columnas derivadas del reporte.
+    Retorna (df_resultado_filtrado, hubo_jornadas); hubo_jornadas indica si calcular_turnos
+    encontró jornadas antes de aplicar el filtro de días extremos.
+
+    Con `procesos` > 1 (por defecto PROCESOS_CALCULO) y suficientes marcaciones, el cálculo
+    se reparte por trabajador entre varios procesos (ver calcular_turnos_paralelo).
+    `motor` se pasa a calcular_turnos. Si se entrega `rendimiento`, registra las etapas
+    calculo_turnos y filtro_dias (o calculo_paralelo) y los conteos por Estado_Calculo.
+    """
+    rendimiento = rendimiento or Rendimiento()
+    procesos = procesos or PROCESOS_CALCULO
+    if procesos > 1 and len(df_raw_filtrado) >= MIN_REGISTROS_PARALELO:
+        with rendimiento.etapa('calculo_paralelo', len(df_raw_filtrado)) as medicion:
+            df_resultado, df_resultado_filtrado = calcular_turnos_paralelo(df_raw_filtrado, procesos, motor)
+            medicion['filas_salida'] = len(df_resultado_filtrado)
+        if df_resultado.empty:
+            return df_resultado, False
+    else:
+        with rendimiento.etapa('calculo_turnos', len(df_raw_filtrado)) as medicion:
+            df_resultado = calcular_turnos_con_avance(df_raw_filtrado, motor, rendimiento)
+            medicion['filas_salida'] = len(df_resultado)
+        if df_resultado.empty:
+            return df_resultado, False
+
+        # --- APLICAR EL NUEVO FILTRO DE PRIMER Y ÚLTIMO DÍA ---
+        with rendimiento.etapa('filtro_dias', len(df_resultado)) as medicion:
+            df_resultado_filtrado = aplicar_filtro_primer_ultimo_dia(df_resultado)
+            medicion['filas_salida'] = len(df_resultado_filtrado)
+    rendimiento.registrar_estados(df_resultado_filtrado)
+    if df_resultado_filtrado.empty:
+        return df_resultado_filtrado, True
+    return completar_reporte(df_resultado_filtrado), True
+
+
+def completar_reporte(df_resultado_filtrado: pd.DataFrame) -> pd.DataFrame:
+    """Post-procesamiento para el reporte (in place): Estado_Llegada y orden por NOMBRE, FECHA, ENTRADA_REAL."""
+    df_resultado_filtrado['Estado_Llegada'] = df_resultado_filtrado['Llegada_Tarde_Mas_40_Min'].map({True: 'Tarde', False: 'A tiempo'})
+    df_resultado_filtrado.sort_values(by=['NOMBRE', 'FECHA', 'ENTRADA_REAL'], inplace=True)  
+    return df_resultado_filtrado
+
+
+def formatear_reporte(df_resultado_filtrado: pd.DataFrame, fechas_como_texto: bool = True) -> pd.DataFrame:
+    """
+    COLUMNAS_REPORTE listas para mostrar o exportar (una copia): horas como float64 con 2
+    decimales y, con `fechas_como_texto`, FECHA como date y las columnas de FORMATOS_FECHA_HORA
+    como texto. Se aplica solo a lo que se va a mostrar o escribir (una página, un bloque);
+    el resultado conserva sus tipos nativos.
+    """
+    df = df_resultado_filtrado[COLUMNAS_REPORTE].copy()
+    for col in COLUMNAS_HORAS:
+        df[col] = horas_exactas(df[col])
+    if fechas_como_texto:
+        df['FECHA'] = df['FECHA'].dt.date
+        for col, formato in FORMATOS_FECHA_HORA.items():
+            df[col] = df[col].dt.strftime(formato).where(df[col].notna(), 'N/A')
+    return df
+
+
+def estimar_anchos_columnas(df: pd.DataFrame, tamano_muestra: int = MUESTRA_ANCHO_COLUMNAS) -> list:
+    """
+    Ancho de cada columna (largo del texto más largo + 2), estimado sobre una muestra
+    de filas repartidas uniformemente. Con pocas filas se usan todas.
+    """
+    if len(df) > tamano_muestra:
+        df = df.iloc[np.linspace(0, len(df) - 1, tamano_muestra).astype(np.int64)]
+    return [
+        max(df[col].astype(str).str.len().max() if len(df) else 0, len(col)) + 2
+        for col in df.columns
+    ]
+
+
+def construir_reporte_excel(df_resultado_filtrado: pd.DataFrame, rendimiento: Rendimiento = None,
+                            resumenes: dict = None) -> bytes:
+    """
+    Etapa 3: genera el archivo Excel del reporte con formato condicional y una hoja por resumen
+    (ver calcular_resumenes; se calculan aquí si no se entregan).
+    Si se entrega `rendimiento`, registra las etapas resumenes (si se calculan) y exportacion_excel.
+    """
+    rendimiento = rendimiento or Rendimiento()
+    if resumenes is None:
+        resumenes = calcular_resumenes(df_resultado_filtrado, rendimiento)
+    with rendimiento.etapa('exportacion_excel', len(df_resultado_filtrado)) as medicion:
+        contenido = escribir_reporte_excel(df_resultado_filtrado, resumenes)
+        medicion['filas_salida'] = len(df_resultado_filtrado)
+    return contenido
+
+
+def calcular_resaltados(df_resultado_filtrado: pd.DataFrame) -> dict:
+    """
+    Máscaras de los resaltados del Excel, una por columna de COLUMNAS_RESALTADO: fila amarilla
+    (salida ASUMIDA), fila gris (sin marcaciones válidas o turno no asignado, si no es ASUMIDA),
+    ENTRADA_REAL naranja (llegada tarde) y horas extra en rojo (> UMBRAL_HORAS_EXTRA_RESALTAR).
+    """
+    estado_calculo = df_resultado_filtrado['Estado_Calculo'].astype(str)
+    is_assumed = estado_calculo.str.startswith("ASUMIDO").to_numpy()
+    is_missing_entry = (
+        estado_calculo.str.startswith("Sin Marcaciones Válidas") | estado_calculo.str.startswith("Turno No Asignado")
+    ).to_numpy()
+    return {
+        'Resaltado_Asumido': is_assumed,
+        'Resaltado_Sin_Entrada': is_missing_entry & ~is_assumed,
+        'Resaltado_Llegada_Tarde': df_resultado_filtrado['Llegada_Tarde_Mas_40_Min'].to_numpy(dtype=bool),
+        'Resaltado_Horas_Extra': horas_exactas(df_resultado_filtrado['Horas_Extra']) > UMBRAL_HORAS_EXTRA_RESALTAR,
+    }
+
+
+def escribir_reporte_excel(df_resultado_filtrado: pd.DataFrame, resumenes: dict = None) -> bytes:
+    """
+    Escribe el reporte fila por fila en modo constant_memory de xlsxwriter; los resaltados
+    se calculan antes como máscaras sobre columnas completas. Cada resumen va en su propia
+    hoja ('Resumen <nombre>') después del reporte.
+    """
+    import xlsxwriter # Solo se carga al generar el Excel
+
+    df_to_excel = formatear_reporte(df_resultado_filtrado)
+
+    # --- Máscaras de formato (una evaluación por columna, no por celda) ---
+    resaltados = calcular_resaltados(df_resultado_filtrado)
+    is_late = resaltados['Resaltado_Llegada_Tarde']
+    is_excessive_extra = resaltados['Resaltado_Horas_Extra']
+
+    # Valores nativos de Python por columna, con 'N/A' en lugar de nulos
+    columnas_valores = [
+        df_to_excel[col].astype(object).where(df_to_excel[col].notna(), 'N/A').tolist()
+        for col in COLUMNAS_REPORTE
+    ]
+    col_entrada = COLUMNAS_REPORTE.index('ENTRADA_REAL')
+    cols_extra = [COLUMNAS_REPORTE.index(col) for col in ['Horas_Extra', 'Horas', 'Minutos']]
+
+    buffer_excel = io.BytesIO()
+    workbook = xlsxwriter.Workbook(
+        buffer_excel, {'constant_memory': True, 'strings_to_formulas': False, 'strings_to_urls': False}
+    )
+    worksheet = workbook.add_worksheet('Reporte Horas Extra')
+
+    # Formatos de Excel
+    orange_format = workbook.add_format({'bg_color': '#FFC7CE', 'font_color': '#9C0006'})  
+    gray_format = workbook.add_format({'bg_color': '#D9D9D9'})  
+    yellow_format = workbook.add_format({'bg_color': '#FFF2CC', 'font_color': '#3C3C3C'})  
+    red_extra_format = workbook.add_format({'bg_color': '#F8E8E8', 'font_color': '#D83A56', 'bold': True})
+
+    formatos_base = np.full(len(df_to_excel), None, dtype=object)
+    formatos_base[resaltados['Resaltado_Sin_Entrada']] = gray_format
+    formatos_base[resaltados['Resaltado_Asumido']] = yellow_format
+
+    # Ajustar el ancho de las columnas
+    for i, ancho in enumerate(estimar_anchos_columnas(df_to_excel)):
+        worksheet.set_column(i, i, ancho)
+
+    worksheet.write_row(0, 0, COLUMNAS_REPORTE)
+    for excel_row, (valores, base_format, late, excessive) in enumerate(
+        zip(zip(*columnas_valores), formatos_base, is_late, is_excessive_extra), start=1
+    ):
+        worksheet.write_row(excel_row, 0, valores, base_format)
+        if late:
+            worksheet.write(excel_row, col_entrada, valores[col_entrada], orange_format)
+        if excessive:
+            for col_idx in cols_extra:
+                worksheet.write(excel_row, col_idx, valores[col_idx], red_extra_format)
+
+    for nombre, resumen in (resumenes or {}).items():
+        hoja_resumen = workbook.add_worksheet(f"Resumen {nombre}")
+        for i, ancho in enumerate(estimar_anchos_columnas(resumen)):
+            hoja_resumen.set_column(i, i, ancho)
+        hoja_resumen.write_row(0, 0, list(resumen.columns))
+        for excel_row, valores in enumerate(zip(*(resumen[col].astype(object).tolist() for col in resumen.columns)), start=1):
+            hoja_resumen.write_row(excel_row, 0, valores)
+
+    workbook.close()
+    return buffer_excel.getvalue()
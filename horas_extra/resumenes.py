@@ -0,0 +1,55 @@
+"""
+Resúmenes del reporte (tablas dinámicas precalculadas): totales de horas, llegadas tarde y
+salidas asumidas por trabajador, por trabajador y semana, por trabajador y mes, y por turno.
+"""
+import numpy as np
+import pandas as pd
+
+from .calculo import horas_exactas
+from .instrumentacion import Rendimiento
+
+COLUMNAS_TOTALES = ['Jornadas', 'Horas_Trabajadas_Netas', 'Horas_Extra', 'Llegadas_Tarde', 'Salidas_Asumidas']
+
+# Resumen -> columnas de agrupación. Todos se derivan de un solo agrupamiento por CLAVES_BASE.
+NIVELES_RESUMEN = {
+    'Por trabajador': ['NOMBRE', 'ID_TRABAJADOR'],
+    'Por semana': ['NOMBRE', 'ID_TRABAJADOR', 'Semana'],
+    'Por mes': ['NOMBRE', 'ID_TRABAJADOR', 'Mes'],
+    'Por turno': ['TURNO'],
+}
+CLAVES_BASE = ['NOMBRE', 'ID_TRABAJADOR', 'Semana', 'Mes', 'TURNO']
+
+
+def calcular_resumenes(df_resultado_filtrado: pd.DataFrame, rendimiento: Rendimiento = None) -> dict:
+    """
+    Retorna {nombre del resumen: DataFrame} según NIVELES_RESUMEN, con COLUMNAS_TOTALES.
+    Las filas del reporte se agrupan una sola vez por (trabajador, semana, mes, turno); cada
+    resumen suma ese agrupamiento, que tiene pocas filas. La semana es la fecha de su lunes
+    ('AAAA-MM-DD') y el mes 'AAAA-MM'. Si se entrega `rendimiento`, registra la etapa resumenes.
+    """
+    rendimiento = rendimiento or Rendimiento()
+    with rendimiento.etapa('resumenes', len(df_resultado_filtrado)) as medicion:
+        fechas = df_resultado_filtrado['FECHA'].to_numpy(dtype='datetime64[D]')
+        # 1970-01-01 fue jueves: se corre 3 días para que las semanas empiecen en lunes
+        lunes = ((fechas.astype(np.int64) + 3) // 7 * 7 - 3).astype('datetime64[D]')
+        base = pd.DataFrame({
+            'NOMBRE': df_resultado_filtrado['NOMBRE'].astype(str).to_numpy(),
+            'ID_TRABAJADOR': df_resultado_filtrado['ID_TRABAJADOR'].to_numpy(),
+            'Semana': lunes.astype(str),
+            'Mes': fechas.astype('datetime64[M]').astype(str),
+            'TURNO': df_resultado_filtrado['TURNO'].astype(str).to_numpy(),
+            'Jornadas': 1,
+            'Horas_Trabajadas_Netas': horas_exactas(df_resultado_filtrado['Horas_Trabajadas_Netas']),
+            'Horas_Extra': horas_exactas(df_resultado_filtrado['Horas_Extra']),
+            'Llegadas_Tarde': df_resultado_filtrado['Llegada_Tarde_Mas_40_Min'].to_numpy(dtype=np.int64),
+            'Salidas_Asumidas': df_resultado_filtrado['Estado_Calculo'].astype(str).str.startswith("ASUMIDO").to_numpy(dtype=np.int64),
+        })
+        agrupado = base.groupby(CLAVES_BASE, sort=False)[COLUMNAS_TOTALES].sum()
+
+        resumenes = {}
+        for nombre, claves in NIVELES_RESUMEN.items():
+            resumen = agrupado.groupby(level=claves, sort=True)[COLUMNAS_TOTALES].sum().reset_index()
+            resumen[['Horas_Trabajadas_Netas', 'Horas_Extra']] = resumen[['Horas_Trabajadas_Netas', 'Horas_Extra']].round(2)
+            resumenes[nombre] = resumen
+        medicion['filas_salida'] = sum(len(resumen) for resumen in resumenes.values())
+    return resumenes
@@ -0,0 +1,184 @@
+"""
+Generador de marcaciones sintéticas (sin datos personales) para pruebas de rendimiento.
+
+Produce el mismo formato que la exportación real (hoja 'data') usando los TURNOS, los puntos
+LUGARES_PUESTO_TRABAJO / LUGARES_PORTERIA y los CODIGOS_TRABAJADORES_FILTRO vigentes. La escala
+se obtiene agregando días: cada trabajador marca ~MARCACIONES_POR_JORNADA veces por día.
+"""
+from datetime import date, datetime
+import io
+import math
+
+import numpy as np
+import pandas as pd
+
+from .reglas import CODIGOS_TRABAJADORES_FILTRO, LUGARES_PORTERIA, LUGARES_PUESTO_TRABAJO, TURNOS
+from .turnos import NS_POR_DIA, NS_POR_MINUTO, NS_POR_HORA, TIPOS_DIA_SEMANA
+
+COLUMNAS_EXPORTACION = ['Cc', 'CodTrabajador', 'Nombre', 'Fecha', 'Hora', 'Porteria', 'PuntoMarcacion']
+MAX_FILAS_EXCEL = 1048575 # Filas de datos que caben en una hoja (sin el encabezado)
+FECHA_INICIO_SINTETICA = date(2024, 1, 1)
+MARCACIONES_POR_JORNADA = 3.3 # Promedio aproximado con las probabilidades de abajo
+
+# --- Probabilidades por jornada (trabajador, día) ---
+PROB_AUSENCIA = 0.08
+PROB_LLEGADA_TARDE = 0.05 # Más de TOLERANCIA_LLEGADA_TARDE_MINUTOS
+PROB_ENTRADA_PORTERIA = 0.6 # Marca en portería antes de llegar al puesto
+PROB_SIN_ENTRADA_PUESTO = 0.1 # Solo marca la entrada en portería
+PROB_SIN_SALIDA = 0.06
+PROB_MICRO_JORNADA = 0.02 # Sale pocos minutos después de entrar
+PROB_HORAS_EXTRA = 0.35
+PROB_SALIDA_PORTERIA = 0.5 # Marca también la salida en portería
+# --- Probabilidades por marcación ---
+PROB_DUPLICADO = 0.03 # La misma marcación repetida a los pocos segundos
+PROB_PUNTO_DESCONOCIDO = 0.02 # Cafetería, zonas comunes, etc. (se descartan al leer)
+PUNTOS_DESCONOCIDOS = ['NOEL_MDE_CAFETERIA_ENT', 'NOEL_MDE_ENFERMERIA', 'NOEL_MDE_PARQUEADERO_MOTOS']
+
+
+def _puntos(lugares: list, sufijo: str) -> np.ndarray:
+    """Puntos de la lista cuyo nombre termina en `sufijo` (o todos si ninguno coincide)."""
+    puntos = [lugar for lugar in dict.fromkeys(lugares) if lugar.upper().endswith(sufijo)]
+    return np.array(puntos or list(dict.fromkeys(lugares)), dtype=object)
+
+
+def _horario_turnos():
+    """(inicio_ns, duracion_ns) por [tipo de día, turno]; tipos en el orden LV, SAB, DOM."""
+    tipos = list(dict.fromkeys(TIPOS_DIA_SEMANA))
+    inicio = np.zeros((len(tipos), 3), dtype=np.int64)
+    duracion = np.zeros((len(tipos), 3), dtype=np.int64)
+    for i, tipo in enumerate(tipos):
+        for j, info in enumerate(list(TURNOS[tipo].values())[:3]):
+            hora = datetime.strptime(info["inicio"], "%H:%M:%S")
+            inicio[i, j] = (hora.hour * 3600 + hora.minute * 60 + hora.second) * 10**9
+            duracion[i, j] = int(info["duracion_hrs"] * NS_POR_HORA)
+    indice_tipo = np.array([tipos.index(tipo) for tipo in TIPOS_DIA_SEMANA])
+    return inicio, duracion, indice_tipo
+
+
+def _generar_jornadas(rng, trabajadores: np.ndarray, dias: int, fecha_inicio: date):
+    """Marcaciones de todas las jornadas como arreglos (trabajador, tiempo_ns, punto, es_entrada)."""
+    inicio_turnos, duracion_turnos, indice_tipo = _horario_turnos()
+    puntos_ent_puesto = _puntos(LUGARES_PUESTO_TRABAJO, 'ENT')
+    puntos_sal_puesto = _puntos(LUGARES_PUESTO_TRABAJO, 'SAL')
+    puntos_ent_porteria = _puntos(LUGARES_PORTERIA, 'ENT')
+    puntos_sal_porteria = _puntos(LUGARES_PORTERIA, 'SAL')
+
+    # Una fila por jornada (trabajador, día); cada trabajador rota de turno cada semana
+    posicion = np.repeat(np.arange(len(trabajadores)), dias)
+    dia = np.tile(np.arange(dias), len(trabajadores))
+    trabajador = trabajadores[posicion]
+    dia_ns = np.datetime64(fecha_inicio, 'ns').astype(np.int64) + dia * NS_POR_DIA
+    tipo = indice_tipo[(fecha_inicio.weekday() + dia) % 7]
+    turno = (posicion + dia // 7) % 3
+    inicio = dia_ns + inicio_turnos[tipo, turno]
+    n = len(inicio)
+
+    trabaja = rng.random(n) >= PROB_AUSENCIA
+    retraso = np.where(
+        rng.random(n) < PROB_LLEGADA_TARDE,
+        rng.uniform(45, 150, n),
+        rng.normal(-10, 12, n),
+    )
+    entrada = inicio + (retraso * NS_POR_MINUTO).astype(np.int64)
+    extra = np.where(rng.random(n) < PROB_HORAS_EXTRA, rng.exponential(90, n), rng.normal(5, 5, n))
+    salida = np.where(
+        rng.random(n) < PROB_MICRO_JORNADA,
+        entrada + (rng.uniform(5, 50, n) * NS_POR_MINUTO).astype(np.int64),
+        inicio + duracion_turnos[tipo, turno] + (extra * NS_POR_MINUTO).astype(np.int64),
+    )
+
+    partes = []
+    def agregar(mascara, tiempos, puntos, es_entrada):
+        partes.append((
+            trabajador[mascara], tiempos[mascara],
+            puntos[rng.integers(0, len(puntos), int(mascara.sum()))],
+            np.full(int(mascara.sum()), es_entrada),
+        ))
+
+    porteria_antes = trabaja & (rng.random(n) < PROB_ENTRADA_PORTERIA)
+    antes_ns = (rng.uniform(3, 15, n) * NS_POR_MINUTO).astype(np.int64)
+    agregar(porteria_antes, entrada - antes_ns, puntos_ent_porteria, True)
+    agregar(trabaja & ~(porteria_antes & (rng.random(n) < PROB_SIN_ENTRADA_PUESTO)), entrada, puntos_ent_puesto, True)
+    con_salida = trabaja & (rng.random(n) >= PROB_SIN_SALIDA)
+    agregar(con_salida, salida, puntos_sal_puesto, False)
+    despues_ns = (rng.uniform(2, 10, n) * NS_POR_MINUTO).astype(np.int64)
+    agregar(con_salida & (rng.random(n) < PROB_SALIDA_PORTERIA), salida + despues_ns, puntos_sal_porteria, False)
+
+    return tuple(np.concatenate(columna) for columna in zip(*partes))
+
+
+def generar_marcaciones(n_marcaciones: int, semilla: int = 0, fecha_inicio: date = FECHA_INICIO_SINTETICA,
+                        trabajadores: list = None) -> pd.DataFrame:
+    """
+    Genera exactamente `n_marcaciones` marcaciones con las columnas de la exportación
+    (COLUMNAS_EXPORTACION), ordenadas por fecha y hora. Incluye turnos nocturnos que cruzan
+    la medianoche, llegadas tarde, horas extra, salidas faltantes, micro-jornadas,
+    marcaciones duplicadas y marcaciones en puntos desconocidos. Hora es texto 'HH:MM:SS'.
+    """
+    rng = np.random.default_rng(semilla)
+    trabajadores = np.asarray(trabajadores if trabajadores is not None else CODIGOS_TRABAJADORES_FILTRO, dtype=np.int64)
+    dias = max(1, math.ceil(n_marcaciones / (len(trabajadores) * MARCACIONES_POR_JORNADA) * 1.1))
+
+    while True:
+        trabajador, tiempo, punto, es_entrada = _generar_jornadas(rng, trabajadores, dias, fecha_inicio)
+
+        # Duplicados y puntos desconocidos
+        duplicar = rng.random(len(tiempo)) < PROB_DUPLICADO
+        segundos = rng.integers(1, 30, int(duplicar.sum())) * 10**9
+        desconocido = rng.random(len(tiempo)) < PROB_PUNTO_DESCONOCIDO
+        punto = punto.copy()
+        punto[desconocido] = np.array(PUNTOS_DESCONOCIDOS, dtype=object)[rng.integers(0, len(PUNTOS_DESCONOCIDOS), int(desconocido.sum()))]
+        trabajador = np.concatenate([trabajador, trabajador[duplicar]])
+        tiempo = np.concatenate([tiempo, tiempo[duplicar] + segundos])
+        punto = np.concatenate([punto, punto[duplicar]])
+        es_entrada = np.concatenate([es_entrada, es_entrada[duplicar]])
+
+        if len(tiempo) >= n_marcaciones:
+            break
+        dias = math.ceil(dias * 1.2) + 1
+
+    orden = np.lexsort((trabajador, tiempo))[:n_marcaciones]
+    trabajador, tiempo, punto, es_entrada = trabajador[orden], tiempo[orden], punto[orden], es_entrada[orden]
+
+    dia_ns = tiempo - tiempo % NS_POR_DIA
+    segundos_dia = (tiempo - dia_ns) // 10**9
+    textos_hora = np.array([f"{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}" for s in range(86400)], dtype=object)
+    codigos_trabajador, unicos_trabajador = pd.factorize(trabajador)
+    nombres = np.array([f"TRABAJADOR {codigo}" for codigo in unicos_trabajador], dtype=object)
+
+    return pd.DataFrame({
+        'Cc': 1000 + trabajador % 17,
+        'CodTrabajador': trabajador,
+        'Nombre': nombres[codigos_trabajador],
+        'Fecha': dia_ns.view('datetime64[ns]'),
+        'Hora': textos_hora[segundos_dia],
+        'Porteria': punto,
+        'PuntoMarcacion': np.where(es_entrada, 'Entrada', 'Salida').astype(object),
+    })
+
+
+def escribir_libro_marcaciones(df: pd.DataFrame, destino=None, hoja: str = 'data') -> bytes:
+    """
+    Escribe las marcaciones como libro .xlsx (una hoja, como la exportación real).
+    Si `destino` es None retorna los bytes; si no, escribe en esa ruta o buffer.
+    """
+    import xlsxwriter # Solo se carga al escribir el libro
+
+    if len(df) > MAX_FILAS_EXCEL:
+        raise ValueError(f"{len(df)} filas no caben en una hoja de Excel (máximo {MAX_FILAS_EXCEL})")
+
+    salida = io.BytesIO() if destino is None else destino
+    workbook = xlsxwriter.Workbook(salida, {'constant_memory': True, 'strings_to_numbers': False,
+                                            'strings_to_formulas': False, 'strings_to_urls': False})
+    worksheet = workbook.add_worksheet(hoja)
+    formato_fecha = workbook.add_format({'num_format': 'yyyy-mm-dd'})
+    worksheet.write_row(0, 0, list(df.columns))
+
+    columnas = [df[col].tolist() for col in df.columns]
+    col_fecha = list(df.columns).index('Fecha') if 'Fecha' in df.columns else -1
+    for fila, valores in enumerate(zip(*columnas), start=1):
+        worksheet.write_row(fila, 0, valores)
+        if col_fecha >= 0:
+            worksheet.write_datetime(fila, col_fecha, valores[col_fecha], formato_fecha)
+    workbook.close()
+    return salida.getvalue() if destino is None else None
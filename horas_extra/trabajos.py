@@ -0,0 +1,173 @@
+"""
+Cálculos en segundo plano para la interfaz: un grupo acotado de hilos compartido por todas
+las sesiones, con avance por etapa, cancelación y un solo trabajo por clave (archivo + reglas).
+Las sesiones que comparten un trabajo son sus suscriptores: una sesión que cancela solo se retira,
+y el trabajo se detiene cuando se retira el último.
+"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from .instrumentacion import Rendimiento
+
+MAX_TRABAJOS_SIMULTANEOS = 2 # Cálculos a la vez; los demás esperan en cola
+MAX_TRABAJOS_TERMINADOS = 8 # Trabajos terminados que se conservan para las sesiones que los esperan
+
+EN_COLA = 'en_cola'
+EN_CURSO = 'en_curso'
+TERMINADO = 'terminado'
+ERROR = 'error'
+CANCELADO = 'cancelado'
+
+
+class TrabajoCancelado(Exception):
+    """Se lanza en el hilo del trabajo, en el siguiente punto de avance después de cancelar()."""
+
+
+class Trabajo:
+    """
+    Un cálculo enviado a GestorTrabajos. La función del trabajo recibe el Trabajo y debe medir
+    sus etapas con `trabajo.rendimiento`: cada avance actualiza `avance` y `etapa`, y es el
+    punto donde se atiende una cancelación. `etapas` es la lista de etapas esperadas, en orden,
+    con la que se calcula el avance total (las etapas no listadas no lo mueven).
+    `suscriptores` son las sesiones que esperan el resultado (ver cancelar()).
+    """
+
+    def __init__(self, clave, etapas: list):
+        self.clave = clave
+        self.etapas = list(etapas)
+        self.estado = EN_COLA
+        self.etapa = None
+        self.detalle = None
+        self.avance = 0.0
+        self.resultado = None
+        self.error = None
+        self.rendimiento = Rendimiento(al_avanzar=self.informar)
+        self.suscriptores = set()
+        self._lock = threading.Lock()
+        self._cancelar = threading.Event()
+        self._terminado = threading.Event()
+
+    def informar(self, etapa: str, fraccion: float, detalle: str = None):
+        if self._cancelar.is_set():
+            raise TrabajoCancelado(f"Trabajo {self.clave} cancelado")
+        self.etapa, self.detalle = etapa, detalle
+        if etapa in self.etapas:
+            self.avance = (self.etapas.index(etapa) + min(max(fraccion, 0.0), 1.0)) / len(self.etapas)
+
+    def suscribir(self, suscriptor):
+        """Registra una sesión que espera el resultado (repetirlo con el mismo suscriptor no cambia nada)."""
+        with self._lock:
+            self.suscriptores.add(suscriptor)
+
+    def cancelar(self, suscriptor=None) -> bool:
+        """
+        Retira a `suscriptor` y, si no queda ningún otro, pide detener el trabajo: se detiene en su
+        siguiente punto de avance. Sin `suscriptor`, lo detiene siempre. Retorna True si se pidió
+        detenerlo (False: otras sesiones lo siguen esperando y el trabajo continúa).
+        """
+        with self._lock:
+            self.suscriptores.discard(suscriptor)
+            if suscriptor is not None and self.suscriptores:
+                return False
+            self._cancelar.set()
+            return True
+
+    @property
+    def cancelado(self) -> bool:
+        """True si se pidió detenerlo, aunque todavía no llegue a su siguiente punto de avance."""
+        return self._cancelar.is_set()
+
+    def esperar(self, segundos: float = None) -> bool:
+        """Espera a que termine (con o sin error) hasta `segundos`; retorna True si terminó."""
+        return self._terminado.wait(segundos)
+
+    @property
+    def terminado(self) -> bool:
+        return self._terminado.is_set()
+
+    @property
+    def descripcion(self) -> str:
+        if self.estado == EN_COLA:
+            return "En cola: esperando a que termine otro cálculo..."
+        texto = f"Etapa: {self.etapa}" if self.etapa else "Iniciando..."
+        return f"{texto} ({self.detalle})" if self.detalle else texto
+
+    def obtener_resultado(self):
+        """Resultado del trabajo terminado; relanza su excepción si falló o fue cancelado."""
+        if self.error is not None:
+            raise self.error
+        return self.resultado
+
+    def _ejecutar(self, funcion):
+        try:
+            if self._cancelar.is_set():
+                raise TrabajoCancelado(f"Trabajo {self.clave} cancelado")
+            self.estado = EN_CURSO
+            self.resultado = funcion(self)
+            self.estado, self.avance = TERMINADO, 1.0
+        except TrabajoCancelado as e:
+            self.estado, self.error = CANCELADO, e
+        except Exception as e:
+            self.estado, self.error = ERROR, e
+        finally:
+            self._terminado.set()
+
+
+class GestorTrabajos:
+    """
+    Ejecuta trabajos en un ThreadPoolExecutor de `max_simultaneos` hilos. enviar() con la clave
+    de un trabajo en cola, en curso o terminado con éxito entrega ese mismo trabajo, así varias
+    sesiones que suben el mismo archivo comparten un solo cálculo; cada envío con `suscriptor` lo
+    suscribe al trabajo entregado. Los trabajos cancelados (o por cancelar) o con error se
+    reemplazan en el siguiente envío. Es seguro entre hilos.
+    """
+
+    def __init__(self, max_simultaneos: int = MAX_TRABAJOS_SIMULTANEOS, max_terminados: int = MAX_TRABAJOS_TERMINADOS):
+        self.max_terminados = max_terminados
+        self._pool = ThreadPoolExecutor(max_workers=max_simultaneos, thread_name_prefix="horas_extra")
+        self._trabajos = OrderedDict() # clave -> Trabajo, en orden de envío
+        self._lock = threading.Lock()
+
+    def enviar(self, clave, funcion, etapas: list, suscriptor=None) -> Trabajo:
+        with self._lock:
+            trabajo = self._trabajos.get(clave)
+            vigente = trabajo is not None and (
+                trabajo.estado == TERMINADO or (trabajo.estado not in (CANCELADO, ERROR) and not trabajo.cancelado)
+            )
+            if vigente:
+                if suscriptor is not None:
+                    trabajo.suscribir(suscriptor)
+                return trabajo
+            trabajo = Trabajo(clave, etapas)
+            if suscriptor is not None:
+                trabajo.suscribir(suscriptor)
+            self._trabajos.pop(clave, None)
+            self._trabajos[clave] = trabajo
+            self._descartar_terminados()
+            self._pool.submit(trabajo._ejecutar, funcion)
+        return trabajo
+
+    def obtener(self, clave):
+        with self._lock:
+            return self._trabajos.get(clave)
+
+    def ejecutar_si_inactivo(self, funcion):
+        """
+        Ejecuta `funcion()` solo si no hay trabajos en cola ni en curso, sin dejar enviar otros
+        mientras tanto (por ejemplo, para recargar las reglas). Retorna su resultado, o None si
+        había trabajos activos.
+        """
+        with self._lock:
+            if any(not trabajo.terminado for trabajo in self._trabajos.values()):
+                return None
+            return funcion()
+
+    def _descartar_terminados(self):
+        """Olvida los trabajos terminados más antiguos por encima de max_terminados."""
+        terminados = [clave for clave, trabajo in self._trabajos.items() if trabajo.terminado]
+        for clave in terminados[:max(0, len(terminados) - self.max_terminados)]:
+            del self._trabajos[clave]
+
+    def __len__(self):
+        return len(self._trabajos)
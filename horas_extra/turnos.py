@@ -0,0 +1,353 @@
+"""
+Búsqueda del turno programado para una marcación, uno a uno o en lote con el calendario compilado.
+Los trabajadores con horario (HORARIO_TRABAJADORES) solo se comparan con los turnos de su patrón.
+"""
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+
+from .reglas import (
+    HORA_CORTE_NOCTURNO,
+    HORARIO_TRABAJADORES,
+    PATRONES_HORARIO,
+    TOLERANCIA_ASIGNACION_TARDE_MINUTOS,
+    TOLERANCIA_ENTRADA_TEMPRANA_MINUTOS,
+    TURNOS,
+)
+
+# --- 3. Obtener turno basado en fecha y hora ---
+
+# Horas de TURNOS convertidas una sola vez (evita llamar a strptime en cada búsqueda)
+TURNOS_COMPILADOS = {
+    tipo_dia: [
+        (
+            nombre_turno,
+            info_turno,
+            datetime.strptime(info_turno["inicio"], "%H:%M:%S").time(),
+            datetime.strptime(info_turno["fin"], "%H:%M:%S").time(),
+            info_turno.get("nocturno", False),
+        )
+        for nombre_turno, info_turno in turnos_tipo_dia.items()
+    ]
+    for tipo_dia, turnos_tipo_dia in TURNOS.items()
+}
+TIPOS_DIA_SEMANA = ["LV", "LV", "LV", "LV", "LV", "SAB", "DOM"] # weekday() -> tipo de día
+
+def buscar_turnos_posibles(fecha_clave: datetime.date, nombres_permitidos: frozenset = None):
+    """
+    Genera una lista de (nombre_turno, info, inicio_dt, fin_dt, fecha_clave_asignada) para un día,
+    solo con los turnos de `nombres_permitidos` si se entrega (turnos_del_horario).
+    """
+    tipo_dia = TIPOS_DIA_SEMANA[fecha_clave.weekday()]
+
+    turnos_dia = []
+    if tipo_dia in TURNOS_COMPILADOS:
+        for nombre_turno, info_turno, hora_inicio, hora_fin, es_nocturno in TURNOS_COMPILADOS[tipo_dia]:
+            if nombres_permitidos is not None and nombre_turno not in nombres_permitidos:
+                continue
+
+            inicio_posible_turno = datetime.combine(fecha_clave, hora_inicio)
+
+            if es_nocturno:
+                fin_posible_turno = datetime.combine(fecha_clave + timedelta(days=1), hora_fin)
+            else:
+                fin_posible_turno = datetime.combine(fecha_clave, hora_fin)
+
+            turnos_dia.append((nombre_turno, info_turno, inicio_posible_turno, fin_posible_turno, fecha_clave))
+            
+    return turnos_dia
+
+def obtener_turno_para_registro(fecha_hora_evento: datetime, fecha_clave_turno_reporte: datetime.date, id_trabajador=None):
+    """
+    Busca el turno programado más cercano a la marcación de entrada (T1, T2, T3).
+    Usa la menor distancia absoluta a la hora de inicio programada. Con `id_trabajador`, solo
+    se generan los turnos que permite su horario en cada día (turnos_del_horario).
+    
+    Retorna: (nombre, info, inicio_turno, fin_turno, fecha_clave_final)
+    """
+    
+    mejor_turno_data_general = (None, None, None, None, None) 
+    mejor_distancia_general = timedelta.max
+    
+    # --- 1. Generar Candidatos de Turno (Día X y Día X-1) ---
+    turnos_candidatos = buscar_turnos_posibles(
+        fecha_clave_turno_reporte, turnos_del_horario(id_trabajador, fecha_clave_turno_reporte)
+    )
+    hora_evento = fecha_hora_evento.time()
+    
+    # Si la hora de la marcación es antes del corte nocturno (08:00:00 AM), 
+    # también considera los turnos del día anterior para el T3 nocturno.
+    if hora_evento < HORA_CORTE_NOCTURNO:
+        fecha_clave_anterior = fecha_clave_turno_reporte - timedelta(days=1)
+        turnos_candidatos.extend(buscar_turnos_posibles(
+            fecha_clave_anterior, turnos_del_horario(id_trabajador, fecha_clave_anterior)
+        ))
+
+    # --- 2. Iterar y Evaluar ---
+    for nombre_turno, info_turno, inicio_posible_turno, fin_posible_turno, fecha_clave_asignada in turnos_candidatos:
+
+        # 2.1. Definir rango de ventana de marcación
+        rango_inicio_temprano = inicio_posible_turno - timedelta(minutes=TOLERANCIA_ENTRADA_TEMPRANA_MINUTOS)
+        # Se usa la tolerancia general para todos los turnos.
+        rango_fin_tarde = inicio_posible_turno + timedelta(minutes=TOLERANCIA_ASIGNACION_TARDE_MINUTOS + 5) 
+
+        # 2.2. Validar si la marcación cae en la ventana
+        if fecha_hora_evento >= rango_inicio_temprano and fecha_hora_evento <= rango_fin_tarde:
+            
+            distancia_a_inicio = abs(fecha_hora_evento - inicio_posible_turno)
+            current_turno_data = (nombre_turno, info_turno, inicio_posible_turno, fin_posible_turno, fecha_clave_asignada)
+
+            # Almacenar el mejor turno encontrado (el más cercano)
+            if mejor_turno_data_general[0] is None or distancia_a_inicio < mejor_distancia_general:
+                mejor_distancia_general = distancia_a_inicio
+                mejor_turno_data_general = current_turno_data
+
+
+    # --- 3. Decisión Final: Retornar el mejor (único grupo) ---
+    if mejor_turno_data_general[0] is not None:
+        return mejor_turno_data_general
+            
+    return (None, None, None, None, None)
+
+# --- 3.1 Calendario de turnos precompilado (asignación en lote) ---
+
+# Tabla plana de turnos: permite identificar cada turno con un índice entero.
+TABLA_TURNOS = [
+    (tipo_dia, nombre_turno, info_turno, hora_inicio, hora_fin, es_nocturno)
+    for tipo_dia, turnos_tipo_dia in TURNOS_COMPILADOS.items()
+    for nombre_turno, info_turno, hora_inicio, hora_fin, es_nocturno in turnos_tipo_dia
+]
+
+NS_POR_MINUTO = 60 * 10**9
+NS_POR_HORA = 60 * NS_POR_MINUTO
+NS_POR_DIA = 24 * NS_POR_HORA
+
+
+def hora_a_ns(hora) -> int:
+    """Convierte un datetime.time en nanosegundos desde la medianoche."""
+    return ((hora.hour * 60 + hora.minute) * 60 + hora.second) * 10**9 + hora.microsecond * 1000
+
+
+@lru_cache(maxsize=64)
+def compilar_calendario_turnos(fecha_min, fecha_max) -> dict:
+    """
+    Compila TURNOS en un calendario con un registro por turno y día entre fecha_min y fecha_max.
+    Retorna un dict de arreglos NumPy ordenados por inicio de ventana de marcación:
+    ventana_inicio, ventana_fin, inicio, fin, fecha_clave (ns), turno (índice en TABLA_TURNOS),
+    nombre, duracion_hrs, nocturno y orden (posición del turno dentro de su día).
+    Cada rango se compila una vez y se reutiliza entre cálculos: los arreglos no deben modificarse.
+    """
+    dias = np.arange(np.datetime64(fecha_min, 'D'), np.datetime64(fecha_max, 'D') + 1)
+    # 1970-01-01 fue jueves (weekday 3)
+    dia_semana = (dias.astype(np.int64) + 3) % 7
+    tipo_por_dia = np.array(TIPOS_DIA_SEMANA)[dia_semana]
+    dias_ns = dias.astype('datetime64[ns]').view(np.int64)
+
+    columnas = {
+        'inicio': [], 'fin': [], 'fecha_clave': [], 'turno': [], 'orden': [],
+    }
+    orden_en_dia = {}
+    for indice, (tipo_dia, _, _, hora_inicio, hora_fin, es_nocturno) in enumerate(TABLA_TURNOS):
+        orden = orden_en_dia.get(tipo_dia, 0)
+        orden_en_dia[tipo_dia] = orden + 1
+        base = dias_ns[tipo_por_dia == tipo_dia]
+        columnas['inicio'].append(base + hora_a_ns(hora_inicio))
+        columnas['fin'].append(base + hora_a_ns(hora_fin) + (NS_POR_DIA if es_nocturno else 0))
+        columnas['fecha_clave'].append(base)
+        columnas['turno'].append(np.full(len(base), indice, dtype=np.int64))
+        columnas['orden'].append(np.full(len(base), orden, dtype=np.int64))
+
+    calendario = {
+        nombre: np.concatenate(valores) if valores else np.empty(0, dtype=np.int64)
+        for nombre, valores in columnas.items()
+    }
+    calendario['ventana_inicio'] = calendario['inicio'] - TOLERANCIA_ENTRADA_TEMPRANA_MINUTOS * NS_POR_MINUTO
+    calendario['ventana_fin'] = calendario['inicio'] + (TOLERANCIA_ASIGNACION_TARDE_MINUTOS + 5) * NS_POR_MINUTO
+
+    orden = np.argsort(calendario['ventana_inicio'], kind='stable')
+    calendario = {nombre: valores[orden] for nombre, valores in calendario.items()}
+    calendario['nombre'] = np.array([turno[1] for turno in TABLA_TURNOS], dtype=object)[calendario['turno']]
+    calendario['duracion_hrs'] = np.array([turno[2]["duracion_hrs"] for turno in TABLA_TURNOS])[calendario['turno']]
+    calendario['nocturno'] = np.array([turno[5] for turno in TABLA_TURNOS], dtype=bool)[calendario['turno']]
+    return calendario
+
+
+def asignar_turnos_calendario(fechas_hora_ns: np.ndarray, fechas_clave_ns: np.ndarray, calendario: dict,
+                              patrones: np.ndarray = None):
+    """
+    Equivalente en lote de obtener_turno_para_registro: busca por searchsorted las ventanas
+    que contienen cada marcación y elige el turno con inicio más cercano. Los empates se
+    resuelven como en el original (turnos del día clave antes que los del día anterior,
+    y dentro de cada día en el orden de TURNOS). `patrones` es el patrón de horario de cada
+    marcación (patrones_de_trabajadores; None = todos sin patrón): las marcaciones de cada
+    patrón se buscan solo en su calendario (calendario_de_patron).
+
+    Retorna: (indice_turno, inicio_ns, fin_ns, fecha_clave_final_ns); indice_turno = -1 si no hay turno.
+    """
+    fechas_hora_ns = np.asarray(fechas_hora_ns, dtype=np.int64)
+    fechas_clave_ns = np.asarray(fechas_clave_ns, dtype=np.int64)
+    n = len(fechas_hora_ns)
+    if n == 0 or len(calendario['ventana_inicio']) == 0:
+        return np.full(n, -1, dtype=np.int64), np.zeros(n, dtype=np.int64), np.zeros(n, dtype=np.int64), fechas_clave_ns.copy()
+    # Prioridad de los empates según la posición en el día de TURNOS, aunque el patrón tenga menos turnos
+    num_turnos_dia = int(calendario['orden'].max()) + 1
+    if patrones is None or (patrones < 0).all():
+        return buscar_en_calendario(fechas_hora_ns, fechas_clave_ns, calendario, num_turnos_dia)
+
+    resultado = (
+        np.full(n, -1, dtype=np.int64), np.zeros(n, dtype=np.int64), np.zeros(n, dtype=np.int64), fechas_clave_ns.copy()
+    )
+    for patron in np.unique(patrones):
+        filas = np.flatnonzero(patrones == patron)
+        parcial = buscar_en_calendario(
+            fechas_hora_ns[filas], fechas_clave_ns[filas],
+            calendario if patron < 0 else calendario_de_patron(calendario, patron), num_turnos_dia,
+        )
+        for total, valores in zip(resultado, parcial):
+            total[filas] = valores
+    return resultado
+
+
+def calendario_de_patron(calendario: dict, patron: int) -> dict:
+    """
+    Ventanas de `calendario` que permite el patrón de horario `patron`: en cada día, solo los
+    turnos de su paso vigente (turnos_permitidos con la fecha clave de la ventana).
+    """
+    turnos = calendario['turno']
+    permitidas = turnos_permitidos(np.full(len(turnos), patron, dtype=np.int64), calendario['fecha_clave'], turnos)
+    return {nombre: valores[permitidas] for nombre, valores in calendario.items()}
+
+
+def buscar_en_calendario(fechas_hora_ns: np.ndarray, fechas_clave_ns: np.ndarray, calendario: dict,
+                         num_turnos_dia: int):
+    """Búsqueda de asignar_turnos_calendario en todas las ventanas de `calendario` (mismo retorno)."""
+    n = len(fechas_hora_ns)
+    ventana_inicio = calendario['ventana_inicio']
+    mejor = np.full(n, -1, dtype=np.int64)
+    if n == 0 or len(ventana_inicio) == 0:
+        return mejor, np.zeros(n, dtype=np.int64), np.zeros(n, dtype=np.int64), fechas_clave_ns.copy()
+
+    ancho_max = (calendario['ventana_fin'] - ventana_inicio).max()
+    hasta = np.searchsorted(ventana_inicio, fechas_hora_ns, side='right')
+    desde = np.searchsorted(ventana_inicio, fechas_hora_ns - ancho_max, side='left')
+    antes_corte = np.mod(fechas_hora_ns, NS_POR_DIA) < hora_a_ns(HORA_CORTE_NOCTURNO)
+
+    mejor_distancia = np.full(n, np.iinfo(np.int64).max, dtype=np.int64)
+    mejor_prioridad = np.full(n, np.iinfo(np.int64).max, dtype=np.int64)
+    # Solo unas pocas ventanas se solapan: se evalúan de la más reciente hacia atrás
+    for desplazamiento in range(int((hasta - desde).max())):
+        indice = hasta - 1 - desplazamiento
+        en_rango = indice >= desde
+        indice = np.where(en_rango, indice, 0)
+
+        fecha_clave_turno = calendario['fecha_clave'][indice]
+        mismo_dia = fecha_clave_turno == fechas_clave_ns
+        dia_anterior = (fecha_clave_turno == fechas_clave_ns - NS_POR_DIA) & antes_corte
+        elegible = (
+            en_rango & (mismo_dia | dia_anterior)
+            & (fechas_hora_ns >= ventana_inicio[indice])
+            & (fechas_hora_ns <= calendario['ventana_fin'][indice])
+        )
+        distancia = np.abs(fechas_hora_ns - calendario['inicio'][indice])
+        prioridad = np.where(mismo_dia, 0, num_turnos_dia) + calendario['orden'][indice]
+
+        mejora = elegible & (
+            (distancia < mejor_distancia)
+            | ((distancia == mejor_distancia) & (prioridad < mejor_prioridad))
+        )
+        mejor[mejora] = indice[mejora]
+        mejor_distancia[mejora] = distancia[mejora]
+        mejor_prioridad[mejora] = prioridad[mejora]
+
+    asignados = mejor >= 0
+    seleccion = np.where(asignados, mejor, 0)
+    indice_turno = np.where(asignados, calendario['turno'][seleccion], -1)
+    inicio_ns = np.where(asignados, calendario['inicio'][seleccion], 0)
+    fin_ns = np.where(asignados, calendario['fin'][seleccion], 0)
+    fecha_clave_final_ns = np.where(asignados, calendario['fecha_clave'][seleccion], fechas_clave_ns)
+    return indice_turno, inicio_ns, fin_ns, fecha_clave_final_ns
+
+
+# --- 3.2 Horarios por trabajador (fijos o rotativos) ---
+
+def compilar_horarios(patrones: dict, horario_trabajadores: dict) -> dict:
+    """
+    Compila PATRONES_HORARIO y HORARIO_TRABAJADORES para filtrar turnos candidatos en lote:
+    'patron_por_trabajador' ({ID: índice del patrón}), 'permitidos' (una fila por paso de cada
+    patrón y una columna por turno de TABLA_TURNOS), 'nombres_permitidos' (los mismos pasos como
+    conjuntos de nombres) y, por patrón, 'primera_fila', 'pasos', 'inicio' y 'duracion_paso' (ns).
+    Un patrón fijo es una rotación de un solo paso. Lanza ValueError si un patrón nombra un turno
+    que no existe, si una rotación no indica su inicio o si un trabajador tiene un patrón desconocido.
+    """
+    nombres_turno = [turno[1] for turno in TABLA_TURNOS]
+    nombres_patron = list(patrones)
+    filas, primera_fila, pasos, inicio, duracion_paso = [], [], [], [], []
+    for nombre_patron in nombres_patron:
+        patron = patrones[nombre_patron]
+        rotacion = patron.get('rotacion') or [patron.get('turnos', [])]
+        desconocidos = sorted({turno for paso in rotacion for turno in paso} - set(nombres_turno))
+        if desconocidos:
+            raise ValueError(f"Patrón de horario {nombre_patron!r}: turnos desconocidos {desconocidos}")
+        if len(rotacion) > 1 and 'inicio' not in patron:
+            raise ValueError(f"Patrón de horario {nombre_patron!r}: una rotación debe indicar 'inicio' (AAAA-MM-DD)")
+        primera_fila.append(len(filas))
+        pasos.append(len(rotacion))
+        filas.extend(frozenset(paso) for paso in rotacion)
+        inicio.append(np.datetime64(patron.get('inicio', '1970-01-01'), 'ns').astype(np.int64))
+        duracion_paso.append(patron.get('dias_por_paso', 7) * NS_POR_DIA)
+
+    desconocidos = sorted(set(horario_trabajadores.values()) - set(nombres_patron), key=str)
+    if desconocidos:
+        raise ValueError(f"HORARIO_TRABAJADORES: patrones desconocidos {desconocidos}")
+    return {
+        'patron_por_trabajador': {
+            id_trabajador: nombres_patron.index(patron) for id_trabajador, patron in horario_trabajadores.items()
+        },
+        'permitidos': np.array([[nombre in fila for nombre in nombres_turno] for fila in filas], dtype=bool).reshape(len(filas), len(nombres_turno)),
+        'nombres_permitidos': filas,
+        'primera_fila': np.array(primera_fila, dtype=np.int64),
+        'pasos': np.array(pasos, dtype=np.int64),
+        'inicio': np.array(inicio, dtype=np.int64),
+        'duracion_paso': np.array(duracion_paso, dtype=np.int64),
+    }
+
+
+HORARIOS_COMPILADOS = compilar_horarios(PATRONES_HORARIO, HORARIO_TRABAJADORES)
+
+
+def patrones_de_trabajadores(ids) -> np.ndarray:
+    """Índice del patrón de horario de cada ID (-1 = sin horario: se compara con todos los turnos)."""
+    patron_por_trabajador = HORARIOS_COMPILADOS['patron_por_trabajador']
+    return np.array([patron_por_trabajador.get(id_trabajador, -1) for id_trabajador in ids], dtype=np.int64)
+
+
+def fila_horario(patrones: np.ndarray, fechas_clave_ns: np.ndarray) -> np.ndarray:
+    """Fila de 'permitidos' del paso vigente de cada patrón (>= 0) en cada fecha clave (ns)."""
+    desde_inicio = fechas_clave_ns - HORARIOS_COMPILADOS['inicio'][patrones]
+    paso = desde_inicio // HORARIOS_COMPILADOS['duracion_paso'][patrones] % HORARIOS_COMPILADOS['pasos'][patrones]
+    return HORARIOS_COMPILADOS['primera_fila'][patrones] + paso
+
+
+def turnos_permitidos(patrones: np.ndarray, fechas_clave_ns: np.ndarray, turnos: np.ndarray) -> np.ndarray:
+    """
+    Si el horario de cada marcación (patrones, -1 = sin horario) permite el turno `turnos`
+    (índice en TABLA_TURNOS) del día `fechas_clave_ns`.
+    """
+    sin_patron = patrones < 0
+    if sin_patron.all():
+        return np.ones(len(patrones), dtype=bool)
+    fila = fila_horario(np.where(sin_patron, 0, patrones), fechas_clave_ns)
+    return sin_patron | HORARIOS_COMPILADOS['permitidos'][fila, turnos]
+
+
+def turnos_del_horario(id_trabajador, fecha_clave) -> frozenset:
+    """
+    Nombres de los turnos del paso vigente del horario de `id_trabajador` en `fecha_clave`, o None
+    si no tiene horario (motor iterativo: solo se generan esos turnos candidatos).
+    """
+    patron = HORARIOS_COMPILADOS['patron_por_trabajador'].get(id_trabajador)
+    if patron is None:
+        return None
+    fecha_clave_ns = np.datetime64(fecha_clave, 'ns').astype(np.int64)
+    return HORARIOS_COMPILADOS['nombres_permitidos'][fila_horario(np.array([patron]), np.array([fecha_clave_ns]))[0]]
@@ -0,0 +1,136 @@
+"""
+Cálculo por ventanas de fechas: el reporte de un rango largo del histórico se calcula una
+ventana (por defecto una semana) a la vez, como una cadena de generadores:
+
+    ventanas de fechas -> calcular_turnos por ventana -> filtro de primer/último día -> reporte
+
+Cada ventana lee además un día antes y uno después (ver calcular_turnos_historico), así que
+las entradas nocturnas del día anterior y las salidas antes de HORA_CORTE_NOCTURNO quedan en
+la jornada correcta en los bordes. La memoria depende del tamaño de la ventana, no del rango.
+"""
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from .calculo import aplicar_filtro_primer_ultimo_dia
+from .historico import calcular_turnos_historico
+from .instrumentacion import Rendimiento
+from .reporte import completar_reporte
+
+DIAS_VENTANA = 7 # Días de FECHA_CLAVE_TURNO por ventana
+# La FECHA de una jornada puede ser hasta un día antes de su FECHA_CLAVE_TURNO (turno T3 del día anterior)
+DIAS_DESPLAZAMIENTO_FECHA = 1
+
+
+def iterar_ventanas(fecha_inicio: date, fecha_fin: date, dias_ventana: int = DIAS_VENTANA):
+    """Genera (inicio, fin) consecutivos, inclusive, que cubren fecha_inicio..fecha_fin."""
+    inicio = fecha_inicio
+    while inicio <= fecha_fin:
+        fin = min(inicio + timedelta(days=dias_ventana - 1), fecha_fin)
+        yield inicio, fin
+        inicio = fin + timedelta(days=1)
+
+
+def iterar_turnos_por_ventanas(historico, fecha_inicio: date, fecha_fin: date, trabajadores: list = None,
+                               dias_ventana: int = DIAS_VENTANA, motor: str = None, rendimiento: Rendimiento = None):
+    """
+    Genera (fin_ventana, df_resultado) por ventana: el resultado de calcular_turnos de las
+    jornadas con FECHA_CLAVE_TURNO dentro de la ventana.
+    """
+    for inicio, fin in iterar_ventanas(fecha_inicio, fecha_fin, dias_ventana):
+        yield fin, calcular_turnos_historico(historico, inicio, fin, trabajadores, motor, rendimiento)
+
+
+def filtrar_primer_ultimo_dia_por_ventanas(resultados_por_ventana):
+    """
+    Aplica aplicar_filtro_primer_ultimo_dia sobre resultados que llegan por ventanas en orden
+    de fecha, con el mismo resultado que sobre todo el rango. Genera los DataFrames filtrados a
+    medida que los días quedan resueltos:
+
+    - Un día de un trabajador queda resuelto cuando ninguna ventana posterior puede traer
+      jornadas de ese día (es anterior a la menor FECHA posible en la ventana siguiente) y ya
+      se vio un día posterior del trabajador (no es su último día).
+    - El primer día de cada trabajador ya es definitivo cuando su día queda resuelto.
+    - Al terminar las ventanas, los días pendientes (los últimos de cada trabajador) se filtran
+      con el último día conocido.
+    """
+    pendientes = pd.DataFrame()
+    extremos = pd.DataFrame(columns=['primero', 'ultimo'], dtype='datetime64[ns]')
+    for fin, df_resultado in resultados_por_ventana:
+        if not df_resultado.empty:
+            dias = pd.DataFrame({
+                'ID_TRABAJADOR': df_resultado['ID_TRABAJADOR'].to_numpy(),
+                'DIA': df_resultado['FECHA'].to_numpy(dtype='datetime64[ns]'),
+            }).groupby('ID_TRABAJADOR')['DIA'].agg(primero='min', ultimo='max')
+            extremos = dias if extremos.empty else pd.concat([extremos, dias]).groupby(level=0).agg(
+                primero=('primero', 'min'), ultimo=('ultimo', 'max')
+            )
+            pendientes = df_resultado if pendientes.empty else pd.concat([pendientes, df_resultado], ignore_index=True)
+        if pendientes.empty:
+            continue
+
+        dia = pendientes['FECHA'].to_numpy(dtype='datetime64[ns]')
+        limite = np.datetime64(fin + timedelta(days=1 - DIAS_DESPLAZAMIENTO_FECHA), 'ns')
+        ultimo_visto = extremos['ultimo'].reindex(pendientes['ID_TRABAJADOR']).to_numpy(dtype='datetime64[ns]')
+        resuelto = (dia < limite) & (dia < ultimo_visto)
+        if resuelto.any():
+            yield aplicar_filtro_primer_ultimo_dia(pendientes[resuelto], extremos.assign(ultimo=pd.NaT))
+            pendientes = pendientes[~resuelto].reset_index(drop=True)
+
+    if not pendientes.empty:
+        yield aplicar_filtro_primer_ultimo_dia(pendientes, extremos)
+
+
+def iterar_jornadas_por_ventanas(historico, fecha_inicio: date, fecha_fin: date, trabajadores: list = None,
+                                 dias_ventana: int = DIAS_VENTANA, filtrar_extremos: bool = True,
+                                 motor: str = None, rendimiento: Rendimiento = None):
+    """
+    Genera, por partes, las jornadas del reporte (sin Es_Nocturno ni FECHA_CLAVE_TURNO, antes de
+    completar_reporte), cada parte ordenada por ID_TRABAJADOR y FECHA. Con `filtrar_extremos`
+    se aplica el filtro de primer/último día como en procesar_marcaciones (algunas jornadas salen
+    con una ventana de retraso); sin él, las jornadas de los extremos se reportan completas como
+    en calcular_reporte_historico.
+    """
+    rendimiento = rendimiento or Rendimiento()
+    resultados = iterar_turnos_por_ventanas(historico, fecha_inicio, fecha_fin, trabajadores, dias_ventana, motor, rendimiento)
+    if filtrar_extremos:
+        partes = filtrar_primer_ultimo_dia_por_ventanas(resultados)
+    else:
+        partes = (df_resultado.drop(columns=['Es_Nocturno', 'FECHA_CLAVE_TURNO'], errors='ignore') for _, df_resultado in resultados)
+    for df_parte in partes:
+        if not df_parte.empty:
+            rendimiento.registrar_estados(df_parte, acumular=True)
+            yield df_parte
+
+
+def iterar_reporte_por_ventanas(historico, fecha_inicio: date, fecha_fin: date, trabajadores: list = None,
+                                dias_ventana: int = DIAS_VENTANA, filtrar_extremos: bool = True,
+                                motor: str = None, rendimiento: Rendimiento = None):
+    """
+    Genera el reporte del histórico entre fecha_inicio y fecha_fin (FECHA_CLAVE_TURNO) por
+    partes, ventana a ventana, con las columnas de procesar_marcaciones; cada parte viene
+    ordenada por NOMBRE, FECHA y ENTRADA_REAL. Ver iterar_jornadas_por_ventanas.
+    """
+    for df_parte in iterar_jornadas_por_ventanas(
+        historico, fecha_inicio, fecha_fin, trabajadores, dias_ventana, filtrar_extremos, motor, rendimiento
+    ):
+        yield completar_reporte(df_parte)
+
+
+def calcular_reporte_por_ventanas(historico, fecha_inicio: date, fecha_fin: date, trabajadores: list = None,
+                                  dias_ventana: int = DIAS_VENTANA, filtrar_extremos: bool = True,
+                                  motor: str = None, rendimiento: Rendimiento = None) -> pd.DataFrame:
+    """
+    Une las partes de iterar_jornadas_por_ventanas en un solo reporte, con las mismas filas y el
+    mismo orden que el cálculo de todo el rango de una vez; el índice queda 0..n-1.
+    """
+    partes = list(iterar_jornadas_por_ventanas(
+        historico, fecha_inicio, fecha_fin, trabajadores, dias_ventana, filtrar_extremos, motor, rendimiento
+    ))
+    if not partes:
+        return pd.DataFrame()
+    # Mismo orden de entrada a completar_reporte que en el cálculo completo: por trabajador y día, estable
+    df_resultado = pd.concat(partes, ignore_index=True)
+    orden = np.lexsort((df_resultado['FECHA'].to_numpy(), df_resultado['ID_TRABAJADOR'].to_numpy()))
+    return completar_reporte(df_resultado.iloc[orden].reset_index(drop=True)).reset_index(drop=True)
@@ -0,0 +1,34 @@
+"""
+Datos y ayudas comunes de las pruebas: marcaciones sintéticas (sintetico.generar_marcaciones)
+leídas desde un .xlsx y el reporte por lotes (calcular_reporte con el motor vectorizado, en un
+solo proceso) contra el que se comparan los caminos alternativos del cálculo.
+"""
+import io
+
+import pandas as pd
+import pytest
+
+from horas_extra import calcular_reporte, preprocesar_marcaciones, sintetico
+
+N_MARCACIONES = 6000 # Unos 37 días: cruza un cambio de mes y cabe en varias ventanas
+SEMILLAS = [0, 1]
+
+
+def preprocesar(marcaciones: pd.DataFrame) -> pd.DataFrame:
+    df_raw_filtrado, _ = preprocesar_marcaciones(io.BytesIO(sintetico.escribir_libro_marcaciones(marcaciones)))
+    return df_raw_filtrado
+
+
+def calcular_lote(df_raw_filtrado: pd.DataFrame, motor: str = 'vectorizado') -> pd.DataFrame:
+    df_reporte, _ = calcular_reporte(df_raw_filtrado.copy(), procesos=1, motor=motor)
+    return df_reporte
+
+
+@pytest.fixture(scope='module', params=SEMILLAS)
+def marcaciones(request) -> pd.DataFrame:
+    return sintetico.generar_marcaciones(N_MARCACIONES, semilla=request.param)
+
+
+@pytest.fixture(scope='module')
+def df_raw_filtrado(marcaciones) -> pd.DataFrame:
+    return preprocesar(marcaciones)
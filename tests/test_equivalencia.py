@@ -0,0 +1,57 @@
+"""
+El motor iterativo (la implementación original) y el vectorizado deben dar el mismo reporte, y
+descartar las marcaciones repetidas en ráfaga no debe cambiarlo.
+"""
+import numpy as np
+import pandas as pd
+
+from conftest import calcular_lote, preprocesar
+from horas_extra import preprocesamiento, sintetico
+from horas_extra.reglas import VENTANA_REPETIDAS_SEGUNDOS
+
+PROPORCION_RAFAGAS = 0.3 # Marcaciones que se repiten en ráfaga
+
+
+def test_motor_iterativo_igual_a_vectorizado(df_raw_filtrado):
+    pd.testing.assert_frame_equal(calcular_lote(df_raw_filtrado, 'iterativo'), calcular_lote(df_raw_filtrado))
+
+
+def agregar_rafagas(marcaciones: pd.DataFrame, semilla: int = 0) -> pd.DataFrame:
+    """
+    Repite PROPORCION_RAFAGAS de las marcaciones de 1 a 3 veces, cada repetición unos segundos
+    después de la anterior (a veces más que VENTANA_REPETIDAS_SEGUNDOS). Las repeticiones del
+    primer trabajador llevan su nombre escrito de otra forma, así que en sus ráfagas se mezclan
+    las dos.
+    """
+    rng = np.random.default_rng(semilla)
+    repetir = marcaciones[rng.random(len(marcaciones)) < PROPORCION_RAFAGAS]
+    repetir = repetir.loc[repetir.index.repeat(rng.integers(1, 4, len(repetir)))]
+    segundos = repetir.groupby(level=0).cumcount().to_numpy() + 1
+    segundos *= rng.integers(1, VENTANA_REPETIDAS_SEGUNDOS + 20, len(repetir))
+    fecha_hora = repetir['Fecha'] + pd.to_timedelta(repetir['Hora']) + pd.to_timedelta(segundos, unit='s')
+    repetir = repetir.assign(Fecha=fecha_hora.dt.normalize(), Hora=fecha_hora.dt.strftime('%H:%M:%S').astype(object))
+    del_primero = repetir['CodTrabajador'] == sintetico.CODIGOS_TRABAJADORES_FILTRO[0]
+    repetir.loc[del_primero, 'Nombre'] = repetir.loc[del_primero, 'Nombre'].str.title()
+
+    return pd.concat([marcaciones, repetir]).sort_values(['Fecha', 'Hora'], kind='stable', ignore_index=True)
+
+
+def test_rafagas_igual_sin_descartar_repetidas(marcaciones, monkeypatch):
+    con_rafagas = agregar_rafagas(marcaciones)
+    df_raw_filtrado = preprocesar(con_rafagas)
+
+    descartar_original = preprocesamiento.descartar_marcaciones_repetidas
+    monkeypatch.setattr(
+        preprocesamiento, 'descartar_marcaciones_repetidas',
+        lambda df_raw: descartar_original(df_raw, ventana_segundos=0),
+    )
+    df_raw_sin_descartar = preprocesar(con_rafagas)
+
+    # Se descartan ráfagas, pero ninguna marcación del trabajador con dos nombres
+    assert len(df_raw_filtrado) < len(df_raw_sin_descartar)
+    del_primero = [
+        int((df['id_trabajador'] == sintetico.CODIGOS_TRABAJADORES_FILTRO[0]).sum())
+        for df in (df_raw_filtrado, df_raw_sin_descartar)
+    ]
+    assert del_primero[0] == del_primero[1] > 0
+    pd.testing.assert_frame_equal(calcular_lote(df_raw_filtrado), calcular_lote(df_raw_sin_descartar))
@@ -0,0 +1,103 @@
+"""
+Horarios por trabajador (PATRONES_HORARIO, HORARIO_TRABAJADORES): un trabajador con patrón solo se
+asigna a los turnos de su paso vigente, igual con los dos motores, y el resto del reporte no cambia.
+También la recarga del archivo de reglas que los define (recargar_reglas_si_cambiaron).
+"""
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import calcular_lote, preprocesar
+from horas_extra import reglas, sintetico, turnos
+
+TRABAJADOR = sintetico.CODIGOS_TRABAJADORES_FILTRO[0]
+MANANA = ['Turno 1 LV', 'Turno 1 SAB', 'Turno 1 DOM']
+TARDE = ['Turno 2 LV', 'Turno 2 SAB', 'Turno 2 DOM']
+NOCHE = ['Turno 3 LV', 'Turno 3 SAB', 'Turno 3 DOM']
+DIAS_POR_PASO = 3 # Varios cambios de paso en los días de las marcaciones sintéticas
+
+
+@pytest.fixture(scope='module')
+def df_raw_filtrado() -> pd.DataFrame:
+    # Marcaciones fijas, generadas con las reglas del módulo: sintetico.generar_marcaciones depende de TURNOS
+    return preprocesar(sintetico.generar_marcaciones(3000))
+
+
+def turnos_esperados(df_reporte: pd.DataFrame, rotacion: list, inicio: str) -> pd.Series:
+    """Turnos del paso vigente de `rotacion` en la FECHA de cada jornada."""
+    dias = (df_reporte['FECHA'] - pd.Timestamp(inicio)).dt.days
+    return (dias // DIAS_POR_PASO % len(rotacion)).map(lambda paso: rotacion[paso])
+
+
+@pytest.mark.parametrize('rotacion', [[MANANA], [MANANA, TARDE, NOCHE]], ids=['fijo', 'rotativo'])
+def test_horario_restringe_turnos(df_raw_filtrado, monkeypatch, rotacion):
+    df_sin_horario = calcular_lote(df_raw_filtrado)
+    inicio = str(sintetico.FECHA_INICIO_SINTETICA)
+    patron = {'turnos': rotacion[0]} if len(rotacion) == 1 else {
+        'rotacion': rotacion, 'inicio': inicio, 'dias_por_paso': DIAS_POR_PASO,
+    }
+    monkeypatch.setattr(turnos, 'HORARIOS_COMPILADOS', turnos.compilar_horarios({'patron': patron}, {TRABAJADOR: 'patron'}))
+
+    df_reporte = calcular_lote(df_raw_filtrado)
+    pd.testing.assert_frame_equal(calcular_lote(df_raw_filtrado, 'iterativo'), df_reporte)
+
+    del_trabajador = df_reporte[df_reporte['ID_TRABAJADOR'] == TRABAJADOR]
+    asignados = del_trabajador[del_trabajador['TURNO'] != 'N/A']
+    assert len(asignados) > 0
+    esperados = turnos_esperados(asignados, rotacion, inicio)
+    assert all(turno in permitidos for turno, permitidos in zip(asignados['TURNO'], esperados))
+
+    # Los demás trabajadores no cambian
+    otros = df_sin_horario[df_sin_horario['ID_TRABAJADOR'] != TRABAJADOR].reset_index(drop=True)
+    pd.testing.assert_frame_equal(df_reporte[df_reporte['ID_TRABAJADOR'] != TRABAJADOR].reset_index(drop=True), otros)
+
+
+@pytest.fixture
+def archivo_reglas(tmp_path, monkeypatch):
+    """Archivo de reglas (HORAS_EXTRA_REGLAS) vacío; al terminar se vuelve a las reglas del módulo."""
+    ruta = tmp_path / 'reglas.json'
+    ruta.write_text(json.dumps({'version': reglas.VERSION_CONFIG_REGLAS}), encoding='utf-8')
+    monkeypatch.setenv('HORAS_EXTRA_REGLAS', str(ruta))
+    reglas.RUTA_CONFIG_REGLAS = str(ruta)
+    yield ruta
+    monkeypatch.delenv('HORAS_EXTRA_REGLAS')
+    reglas.RUTA_CONFIG_REGLAS = None
+    reglas.recargar_reglas_si_cambiaron()
+
+
+def test_recargar_reglas_con_horario(df_raw_filtrado, archivo_reglas):
+    assert reglas.recargar_reglas_si_cambiaron()
+    df_sin_horario = calcular_lote(df_raw_filtrado)
+    hash_sin_horario = reglas.calcular_hash_reglas()
+    assert not reglas.recargar_reglas_si_cambiaron()
+
+    archivo_reglas.write_text(json.dumps({
+        'version': reglas.VERSION_CONFIG_REGLAS,
+        'PATRONES_HORARIO': {'manana': {'turnos': MANANA}},
+        'HORARIO_TRABAJADORES': {str(TRABAJADOR): 'manana'},
+    }), encoding='utf-8')
+    assert reglas.recargar_reglas_si_cambiaron()
+    assert reglas.calcular_hash_reglas() != hash_sin_horario
+    df_reporte = calcular_lote(df_raw_filtrado)
+    turnos_trabajador = df_reporte.loc[df_reporte['ID_TRABAJADOR'] == TRABAJADOR, 'TURNO']
+    assert np.isin(turnos_trabajador, MANANA + ['N/A']).all()
+    assert not df_reporte.equals(df_sin_horario)
+
+    # Un archivo inválido no se aplica: siguen las reglas cargadas
+    texto_valido = archivo_reglas.read_text(encoding='utf-8')
+    archivo_reglas.write_text(json.dumps({'version': 0}), encoding='utf-8')
+    with pytest.raises(ValueError):
+        reglas.recargar_reglas_si_cambiaron()
+    pd.testing.assert_frame_equal(calcular_lote(df_raw_filtrado), df_reporte)
+
+    archivo_reglas.write_text(texto_valido.replace(json.dumps(MANANA), json.dumps(MANANA + TARDE)), encoding='utf-8')
+    assert reglas.recargar_reglas_si_cambiaron()
+    turnos_trabajador = calcular_lote(df_raw_filtrado).loc[lambda df: df['ID_TRABAJADOR'] == TRABAJADOR, 'TURNO']
+    assert np.isin(turnos_trabajador, MANANA + TARDE + ['N/A']).all()
+
+    archivo_reglas.write_text(json.dumps({'version': reglas.VERSION_CONFIG_REGLAS}), encoding='utf-8')
+    assert reglas.recargar_reglas_si_cambiaron()
+    assert reglas.calcular_hash_reglas() == hash_sin_horario
+    pd.testing.assert_frame_equal(calcular_lote(df_raw_filtrado), df_sin_horario)
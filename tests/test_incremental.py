@@ -0,0 +1,55 @@
+"""
+El modo incremental debe dar el mismo reporte que recalcular todas las jornadas.
+"""
+import pandas as pd
+
+from conftest import calcular_lote, preprocesar
+from horas_extra import calcular_reporte_incremental, incremental
+
+
+def test_incremental_igual_a_lote(marcaciones, tmp_path):
+    """El almacén se reutiliza mientras la entrada crece, cambia a mitad del rango y se achica."""
+    ruta_almacen = tmp_path / 'almacen.sqlite'
+    dias = marcaciones['Fecha'].sort_values().unique()
+    mitad = len(dias) // 2
+    cargas = [
+        marcaciones[marcaciones['Fecha'] <= dias[mitad - 1]],
+        marcaciones[marcaciones['Fecha'] <= dias[mitad]],
+        marcaciones,
+        marcaciones.drop(marcaciones.index[::50]), # Marcaciones corregidas en días ya calculados
+        marcaciones[marcaciones['Fecha'] <= dias[mitad]],
+    ]
+    for carga in cargas:
+        df_raw_filtrado = preprocesar(carga)
+        df_reporte, _ = calcular_reporte_incremental(df_raw_filtrado.copy(), ruta_almacen)
+        pd.testing.assert_frame_equal(df_reporte, calcular_lote(df_raw_filtrado))
+    # Con el motor iterativo se recalculan las jornadas que cambiaron respecto de la última carga
+    df_raw_filtrado = preprocesar(marcaciones)
+    df_reporte, _ = calcular_reporte_incremental(df_raw_filtrado.copy(), ruta_almacen, 'iterativo')
+    pd.testing.assert_frame_equal(df_reporte, calcular_lote(df_raw_filtrado))
+
+
+def test_incremental_con_otra_sesion_guardando(marcaciones, tmp_path, monkeypatch):
+    """
+    Otra sesión guarda jornadas distintas en el mismo almacén mientras esta calcula: el reporte
+    no debe incluir resultados de la otra sesión.
+    """
+    ruta_almacen = tmp_path / 'almacen.sqlite'
+    dias = marcaciones['Fecha'].sort_values().unique()
+    propia = preprocesar(marcaciones)
+    calcular_reporte_incremental(propia.copy(), ruta_almacen)
+    # Esta sesión cambia solo el último día; la otra, marcaciones de todo el rango
+    propia = preprocesar(marcaciones.drop(marcaciones.index[(marcaciones['Fecha'] == dias[-1]).to_numpy()][::3]))
+    otra = preprocesar(marcaciones.drop(marcaciones.index[::7]))
+
+    calcular_turnos_original = incremental.calcular_turnos_con_avance
+    def calcular_turnos_con_otra_sesion(*args, **kwargs):
+        monkeypatch.setattr(incremental, 'calcular_turnos_con_avance', calcular_turnos_original)
+        calcular_reporte_incremental(otra.copy(), ruta_almacen)
+        return calcular_turnos_original(*args, **kwargs)
+    monkeypatch.setattr(incremental, 'calcular_turnos_con_avance', calcular_turnos_con_otra_sesion)
+
+    df_reporte, _ = calcular_reporte_incremental(propia.copy(), ruta_almacen)
+    pd.testing.assert_frame_equal(df_reporte, calcular_lote(propia))
+    df_reporte, _ = calcular_reporte_incremental(otra.copy(), ruta_almacen)
+    pd.testing.assert_frame_equal(df_reporte, calcular_lote(otra))
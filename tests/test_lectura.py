@@ -0,0 +1,122 @@
+"""
+Lectura de marcaciones: conversión de la hora y de la fecha y lectura de los archivos subidos.
+"""
+from datetime import time
+import io
+
+from openpyxl import Workbook
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from horas_extra import preprocesar_marcaciones, sintetico
+from horas_extra.lectura import cargar_marcaciones, combinar_fecha_hora, convertir_horas_a_ns
+
+NS_POR_SEGUNDO = 10**9
+TRABAJADOR = sintetico.CODIGOS_TRABAJADORES_FILTRO[0]
+PUESTO_ENTRADA, PUESTO_SALIDA = "NOEL_MDE_PRINCIPAL_ENT", "NOEL_MDE_PRINCIPAL_SAL"
+
+
+def marcaciones_de_prueba(filas: list) -> pd.DataFrame:
+    """(Fecha, Hora, Porteria, PuntoMarcacion) de TRABAJADOR -> marcaciones con COLUMNAS_EXPORTACION."""
+    return pd.DataFrame([
+        {'Cc': 1000, 'CodTrabajador': TRABAJADOR, 'Nombre': 'TRABAJADOR PRUEBA', 'Fecha': fecha, 'Hora': hora,
+         'Porteria': porteria, 'PuntoMarcacion': punto}
+        for fecha, hora, porteria, punto in filas
+    ], columns=sintetico.COLUMNAS_EXPORTACION)
+
+
+def libro_de_prueba(marcaciones: pd.DataFrame) -> io.BytesIO:
+    """Libro .xlsx (hoja 'data') con las celdas tal cual, incluidas las vacías (None)."""
+    libro = Workbook()
+    hoja = libro.active
+    hoja.title = 'data'
+    hoja.append(list(marcaciones.columns))
+    for fila in marcaciones.itertuples(index=False):
+        hoja.append([None if pd.isna(valor) else valor for valor in fila])
+    archivo = io.BytesIO()
+    libro.save(archivo)
+    archivo.seek(0)
+    return archivo
+
+
+def test_convertir_horas_formatos_mezclados():
+    horas = pd.Series([None, 'basura', 0.5, time(6, 30, 15), '6:5', '23:59:59.5', 1.5, '24:00'], dtype=object)
+    esperado = [-1, -1, 12 * 3600, 6 * 3600 + 30 * 60 + 15, 6 * 3600 + 5 * 60, 86399.5, -1, -1]
+    np.testing.assert_array_equal(
+        convertir_horas_a_ns(horas), [-1 if s == -1 else int(s * NS_POR_SEGUNDO) for s in esperado]
+    )
+
+    fecha_hora, rechazadas = combinar_fecha_hora(pd.Series(pd.to_datetime(['2024-03-05'] * len(horas))), horas)
+    assert rechazadas == 4
+    assert fecha_hora.isna().sum() == 4
+    assert fecha_hora[3] == pd.Timestamp('2024-03-05 06:30:15')
+
+
+def test_convertir_horas_todas_nulas():
+    np.testing.assert_array_equal(convertir_horas_a_ns(pd.Series([None, None], dtype=object)), [-1, -1])
+    np.testing.assert_array_equal(convertir_horas_a_ns(pd.Series([np.nan, np.nan])), [-1, -1])
+
+
+def test_entrada_sin_hora_en_punto_desconocido():
+    """Una entrada en un punto desconocido y sin hora no debe impedir leer el archivo."""
+    marcaciones = marcaciones_de_prueba([
+        ('2024-03-05', '06:00:00', PUESTO_ENTRADA, 'Entrada'),
+        ('2024-03-05', '14:00:00', PUESTO_SALIDA, 'Salida'),
+        ('2024-03-05', None, 'PUNTO_DESCONOCIDO', 'Entrada'),
+    ])
+    marcaciones['Fecha'] = pd.to_datetime(marcaciones['Fecha'])
+    df_raw_filtrado, resumen = preprocesar_marcaciones(libro_de_prueba(marcaciones))
+    assert resumen['registros_leidos'] == 2
+    assert len(df_raw_filtrado) == 2
+
+
+def fechas_de_prueba() -> pd.DataFrame:
+    """Marcaciones con fechas ISO, día/mes/año (día <= 12 y > 12) y no reconocidas."""
+    return marcaciones_de_prueba([
+        ('2024-03-04', '06:00:00', PUESTO_ENTRADA, 'Entrada'),
+        ('05/03/2024', '06:00:00', PUESTO_ENTRADA, 'Entrada'),
+        ('15/03/2024', '06:00:00', PUESTO_ENTRADA, 'Entrada'),
+        ('2024-03-16 00:00:00', '06:00:00', PUESTO_ENTRADA, 'Entrada'),
+        ('03/15/2024', '06:00:00', PUESTO_ENTRADA, 'Entrada'),
+        ('basura', '06:00:00', PUESTO_ENTRADA, 'Entrada'),
+        (None, '06:00:00', PUESTO_ENTRADA, 'Entrada'),
+    ])
+
+
+FECHAS_ESPERADAS = pd.to_datetime(['2024-03-04', '2024-03-05', '2024-03-15', '2024-03-16', None, None, None])
+
+
+@pytest.mark.parametrize('separador', [',', ';'])
+def test_csv_fechas_dia_mes(separador):
+    archivo = io.BytesIO(fechas_de_prueba().to_csv(index=False, sep=separador).encode('utf-8'))
+    df_raw = cargar_marcaciones(archivo)
+    pd.testing.assert_series_equal(
+        df_raw['fecha'], pd.Series(FECHAS_ESPERADAS, name='fecha').astype(df_raw['fecha'].dtype)
+    )
+
+    archivo.seek(0)
+    _, resumen = preprocesar_marcaciones(archivo)
+    assert resumen['registros_fecha_invalida'] == 3
+    assert resumen['registros_hora_invalida'] == 0
+
+
+@pytest.mark.parametrize('tipo_fecha', ['texto', 'fecha'])
+def test_parquet_fechas(tipo_fecha):
+    marcaciones = fechas_de_prueba()
+    if tipo_fecha == 'fecha':
+        marcaciones['Fecha'] = pd.Series(FECHAS_ESPERADAS).dt.date
+    archivo = io.BytesIO()
+    pq.write_table(pa.Table.from_pandas(marcaciones, preserve_index=False), archivo)
+
+    archivo.seek(0)
+    df_raw = cargar_marcaciones(archivo)
+    pd.testing.assert_series_equal(
+        df_raw['fecha'], pd.Series(FECHAS_ESPERADAS, name='fecha').astype(df_raw['fecha'].dtype)
+    )
+
+    archivo.seek(0)
+    _, resumen = preprocesar_marcaciones(archivo)
+    assert resumen['registros_fecha_invalida'] == 3
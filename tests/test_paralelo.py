@@ -0,0 +1,13 @@
+"""
+El cálculo repartido por trabajador en varios procesos debe dar el mismo reporte que en serie.
+"""
+import pandas as pd
+
+from conftest import calcular_lote
+from horas_extra import calcular_reporte, reporte
+
+
+def test_paralelo_igual_a_lote(df_raw_filtrado, monkeypatch):
+    monkeypatch.setattr(reporte, 'MIN_REGISTROS_PARALELO', 0)
+    df_reporte, _ = calcular_reporte(df_raw_filtrado.copy(), procesos=2)
+    pd.testing.assert_frame_equal(df_reporte, calcular_lote(df_raw_filtrado))
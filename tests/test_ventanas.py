@@ -0,0 +1,35 @@
+"""
+El reporte del histórico calculado por ventanas de fechas debe ser el mismo que el cálculo por
+lotes del archivo completo (y, sin el filtro de días extremos, que el del histórico de una vez).
+"""
+from datetime import timedelta
+import io
+
+import pandas as pd
+import pytest
+
+from conftest import calcular_lote
+from horas_extra import historico, sintetico, ventanas
+
+
+@pytest.fixture(scope='module')
+def ruta_historico(marcaciones, tmp_path_factory):
+    ruta = tmp_path_factory.mktemp('historico')
+    historico.archivar_archivo(io.BytesIO(sintetico.escribir_libro_marcaciones(marcaciones)), ruta)
+    return ruta
+
+
+@pytest.mark.parametrize('dias_ventana', [1, 3, 7, 30])
+def test_ventanas_igual_a_lote(ruta_historico, df_raw_filtrado, dias_ventana):
+    fechas_hora = df_raw_filtrado['FECHA_HORA']
+    fecha_inicio, fecha_fin = fechas_hora.min().date() - timedelta(days=1), fechas_hora.max().date()
+
+    df_reporte = ventanas.calcular_reporte_por_ventanas(ruta_historico, fecha_inicio, fecha_fin, dias_ventana=dias_ventana)
+    pd.testing.assert_frame_equal(df_reporte, calcular_lote(df_raw_filtrado).reset_index(drop=True))
+
+    # Sin el filtro de días extremos, igual al reporte del histórico calculado de una vez
+    df_reporte = ventanas.calcular_reporte_por_ventanas(
+        ruta_historico, fecha_inicio, fecha_fin, dias_ventana=dias_ventana, filtrar_extremos=False
+    )
+    df_historico = historico.calcular_reporte_historico(ruta_historico, fecha_inicio, fecha_fin)
+    pd.testing.assert_frame_equal(df_reporte, df_historico.reset_index(drop=True))